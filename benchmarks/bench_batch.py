@@ -0,0 +1,157 @@
+r'''
+-----------------------------------------------------------------------------
+    bench_batch | end-to-end benchmark for making batches of quizzes
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+
+    Usage: python3 benchmarks/bench_batch.py [options]
+
+    Runs webquiz.py on a batch of quizzes using the stand-in make4ht and
+    kpsewhich in benchmarks/fake-texlive, so that no TeX is needed, for each
+    of the --jobs values. For each value the batch is made twice: first from
+    scratch, which measures the batch scheduling, moving the images and
+    cleaning up, and then again when all of the quizzes are up to date,
+    which measures the build cache. The stand-in make4ht sleeps for --delay
+    seconds for each quiz, to simulate TeX, so the results are reproducible.
+'''
+
+# -*- encoding: utf-8 -*-
+
+import argparse
+import glob
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import standins
+
+fake_texlive = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'fake-texlive')
+webquiz_py = os.path.join(standins.repository, 'webquiz', 'webquiz.py')
+
+quiz_source = r'''\documentclass{{webquiz}}
+\begin{{document}}
+{questions}
+\end{{document}}
+'''
+
+def write_quizzes(quizzes, questions):
+    r'''
+    Write the quiz files for the batch in the current directory and return
+    their names
+    '''
+    quiz_files = []
+    for quiz in range(quizzes):
+        quiz_files.append('quiz{}.tex'.format(quiz))
+        with open(quiz_files[-1], 'w') as tex:
+            tex.write(quiz_source.format(questions='\n'.join(
+                r'\begin{{question}}Question {}\end{{question}}'.format(q) for q in range(questions))))
+    return quiz_files
+
+def remove_outputs(quiz_files):
+    r'''
+    Remove the web pages and quiz directories made from `quiz_files`
+    '''
+    for quiz_file in quiz_files:
+        quiz_name = quiz_file[:-4]
+        if os.path.isdir(quiz_name):
+            shutil.rmtree(quiz_name)
+        if os.path.isfile(quiz_name + '.html'):
+            os.remove(quiz_name + '.html')
+
+def make_batch(quiz_files, jobs, environment, webquiz_options):
+    r'''
+    Make the quizzes using `jobs` jobs and return the time taken
+    '''
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, webquiz_py, '-qqq', '--no-format', '-j', str(jobs)]
+                                 + webquiz_options + quiz_files,
+                             env=environment, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        print(process.stdout.decode('utf8', errors='replace'))
+        sys.exit('webquiz failed with exit code {}'.format(process.returncode))
+    return seconds
+
+def check_outputs(quiz_files, images, responsive=False):
+    r'''
+    Check that each quiz has a web page, with its images in the quiz
+    directory, and that the auxiliary files have been removed. With
+    `responsive`, check that every png img tag, which make4ht splits over
+    several lines, has been given a width and height by --responsive-images.
+    '''
+    for quiz_file in quiz_files:
+        quiz_name = quiz_file[:-4]
+        if not os.path.isfile(quiz_name + '.html'):
+            sys.exit('{}.html was not made'.format(quiz_name))
+        if responsive:
+            with open(quiz_name + '.html', encoding='utf8') as html:
+                png_tags = re.findall(r'<img\b[^>]*\.png"[^>]*>', html.read())
+            if any(' width=' not in tag for tag in png_tags):
+                sys.exit('the png images in {} were not given a size by --responsive-images'.format(quiz_name))
+        if len(glob.glob(os.path.join(quiz_name, quiz_name + '*x.*'))) != images:
+            sys.exit('the images for {} were not moved'.format(quiz_name))
+    left_over = [file for file in os.listdir('.') if file.endswith(('.log', '.dvi', '.4ct', '.png', '.svg'))]
+    if left_over:
+        sys.exit('files were not cleaned up: {}'.format(', '.join(sorted(left_over)[:5])))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark making batches of quizzes with a stand-in make4ht')
+    parser.add_argument('-n', '--quizzes', type=int, default=16, help='number of quizzes in the batch')
+    parser.add_argument('-q', '--questions', type=int, default=50, help='number of questions in each quiz')
+    parser.add_argument('-j', '--jobs', type=int, nargs='+', default=[1, 2, 4], help='values of --jobs to benchmark')
+    parser.add_argument('-d', '--delay', type=float, default=0.5, help='seconds that make4ht takes for each quiz')
+    parser.add_argument('-g', '--images', type=int, default=2, help='number of images in each question')
+    parser.add_argument('-s', '--image-size', type=int, default=4096, help='size of each image in bytes')
+    parser.add_argument('--keep', action='store_true', help='keep the quiz directory and print its name')
+    parser.add_argument('webquiz_options', nargs=argparse.REMAINDER,
+                        help='options for webquiz.py, after --, such as --trace trace.json')
+    args = parser.parse_args()
+    webquiz_options = [option for option in args.webquiz_options if option != '--']
+
+    environment = dict(os.environ,
+        PATH=os.path.join(fake_texlive, 'bin') + os.pathsep + os.environ.get('PATH', ''),
+        FAKE_MAKE4HT_DELAY=str(args.delay),
+        FAKE_MAKE4HT_IMAGES=str(args.images),
+        FAKE_MAKE4HT_IMAGE_SIZE=str(args.image_size),
+    )
+    environment.pop('WEBQUIZ_MAKE4HT', None)
+
+    batch_directory = tempfile.mkdtemp(prefix='webquiz-batch-')
+    cwd = os.getcwd()
+    os.chdir(batch_directory)
+    environment['WEBQUIZ_CACHE'] = os.path.join(batch_directory, 'cache')
+    try:
+        quiz_files = write_quizzes(args.quizzes, args.questions)
+        print('{} quizzes with {} questions, make4ht delay {}s, {} images of {} bytes per question'.format(
+                  args.quizzes, args.questions, args.delay, args.images, args.image_size))
+        print('{:>6}  {:>10}  {:>8}  {:>10}'.format('jobs', 'made (s)', 'speedup', 'cached (s)'))
+        serial = None
+        for jobs in args.jobs:
+            remove_outputs(quiz_files)
+            shutil.rmtree(environment['WEBQUIZ_CACHE'], ignore_errors=True)
+            made = make_batch(quiz_files, jobs, environment, webquiz_options)
+            check_outputs(quiz_files, args.questions*args.images, '--responsive-images' in webquiz_options)
+            cached = make_batch(quiz_files, jobs, environment, webquiz_options)
+            if serial is None:
+                serial = made
+            print('{:>6}  {:>10.2f}  {:>7.2f}x  {:>10.2f}'.format(jobs, made, serial/made, cached))
+
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print('The quizzes are in {}'.format(batch_directory))
+        else:
+            shutil.rmtree(batch_directory, ignore_errors=True)
@@ -0,0 +1,153 @@
+r'''
+-----------------------------------------------------------------------------
+    bench_pipeline | benchmark for turning the webquiz xml into a web page
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+
+    Usage: python3 benchmarks/bench_pipeline.py [options] [config ...]
+
+    Makes web pages from synthetic xml quizzes, without using TeX, and prints
+    the time taken by each step: reading the xml file, each of the add_*
+    methods of MakeWebQuiz and writing the web page using webquiz_layout.
+    The steps are timed using the same trace spans as webquiz --trace, and
+    the best time from --repeat runs is reported.
+
+    The results can be saved as json using --output and compared with a
+    previous run using --baseline, in which case any step that is more than
+    --threshold slower than the baseline is reported as a regression and the
+    exit code is 1. For example:
+
+        python3 benchmarks/bench_pipeline.py --output baseline.json
+        ... change the code ...
+        python3 benchmarks/bench_pipeline.py --baseline baseline.json
+'''
+
+# -*- encoding: utf-8 -*-
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+
+import standins
+import webquiz_trace
+from synthetic_quiz import synthetic_quiz
+
+# the quiz configurations: the keyword arguments for synthetic_quiz
+configs = dict(
+    small=dict(questions=20),
+    paged=dict(questions=2000),
+    one_page=dict(questions=2000, one_page=True),
+    choices=dict(questions=1000, items=12),
+    feedback=dict(questions=1000, feedback=50),
+    mathml=dict(questions=500, math_terms=500),
+    discussions=dict(questions=200, discussions=200, feedback=20),
+)
+
+# the steps of making the web page that are reported
+steps = ['read_xml_file', 'read_language_file', 'add_meta_data', 'add_question_javascript',
+         'add_side_menu', 'add_quiz_header_and_questions', 'add_breadcrumbs', 'write_web_page']
+
+def make_page(config, repeat):
+    r'''
+    Make the web page for a synthetic quiz with the given `config` `repeat`
+    times and return a dictionary of the best time for each step
+    '''
+    times = {}
+    with tempfile.TemporaryDirectory() as quiz_directory:
+        cwd = os.getcwd()
+        os.chdir(quiz_directory)
+        try:
+            with open('synthetic.xml', 'w', encoding='utf8') as xml_file:
+                xml_file.writelines(synthetic_quiz(**config))
+
+            for run in range(repeat):
+                webquiz_trace.start_tracing()
+                standins.MakeWebQuiz('synthetic.xml', 'synthetic.xml', standins.options(), standins.settings(), standins.metadata)
+                for event in webquiz_trace.events:
+                    if event['name'] in steps:
+                        seconds = event['dur'] / 1e6
+                        times[event['name']] = min(times.get(event['name'], seconds), seconds)
+
+        finally:
+            webquiz_trace.events = None
+            os.chdir(cwd)
+
+    times['total'] = sum(times.values())
+    return times
+
+def compare(results, baseline, threshold, noise=0.002):
+    r'''
+    Print the results next to the `baseline` and return a list of the steps
+    that are more than `threshold` slower. Differences of less than `noise`
+    seconds are ignored.
+    '''
+    regressions = []
+    for name in results['configs']:
+        if name not in baseline['configs']:
+            continue
+        print('\n{} (baseline -> now)'.format(name))
+        times = results['configs'][name]['times']
+        baseline_times = baseline['configs'][name]['times']
+        for step in steps + ['total']:
+            if step in times and step in baseline_times:
+                change = times[step]/baseline_times[step] - 1 if baseline_times[step] > 0 else 0
+                slower = change > threshold and times[step] - baseline_times[step] > noise
+                if slower:
+                    regressions.append((name, step))
+                print('  {:<32} {:>9.4f}s -> {:>9.4f}s  {:+6.1%}{}'.format(
+                          step, baseline_times[step], times[step], change, '  REGRESSION' if slower else ''))
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark making web pages from webquiz xml files')
+    parser.add_argument('config', nargs='*',
+                        help='quiz configurations to benchmark: {} (default: all)'.format(', '.join(sorted(configs))))
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='number of times to make each quiz')
+    parser.add_argument('-o', '--output', default=None, help='save the results as json in this file')
+    parser.add_argument('-b', '--baseline', default=None, help='compare the results with this json file')
+    parser.add_argument('-t', '--threshold', type=float, default=0.2,
+                        help='report steps that are this much slower than the baseline (default 0.2 = 20%%)')
+    parser.add_argument('-q', '--questions', type=int, default=None, help='override the number of questions')
+    args = parser.parse_args()
+    for name in args.config:
+        if name not in configs:
+            parser.error('unknown configuration {}'.format(name))
+
+    results = dict(python=platform.python_version(), machine=platform.machine(), configs={})
+    for name in args.config or sorted(configs):
+        config = dict(configs[name])
+        if args.questions is not None:
+            config['questions'] = args.questions
+        times = make_page(config, args.repeat)
+        results['configs'][name] = dict(config=config, times=times)
+
+    # print a table of the times with a column for each configuration
+    names = list(results['configs'])
+    print('{:<32}{}'.format('seconds', ''.join('{:>12}'.format(name) for name in names)))
+    for step in steps + ['total']:
+        print('{:<32}{}'.format(step, ''.join('{:>12.4f}'.format(results['configs'][name]['times'].get(step, 0))
+                                             for name in names)))
+
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.threshold)
+        if regressions:
+            print('\n{} regressions: {}'.format(len(regressions),
+                       ', '.join('{} {}'.format(name, step) for (name, step) in regressions)))
+            sys.exit(1)
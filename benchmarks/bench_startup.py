@@ -0,0 +1,137 @@
+r'''
+-----------------------------------------------------------------------------
+    bench_startup | benchmark for the start up time of the webquiz commands
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+
+    Usage: python3 benchmarks/bench_startup.py [options] [command ...]
+
+    Prints the wall time taken by webquiz.py for commands that do not make a
+    quiz, such as --version and --settings webquiz-url, which editors run
+    very often, and for making a quiz that is already up to date. The stand-in
+    kpsewhich and make4ht in benchmarks/fake-texlive are used so that no TeX
+    is needed. Each command is run once to fill the webquiz caches and then
+    the best and median times from --repeat runs are reported, together with
+    the time taken to start python.
+
+    As with bench_pipeline.py, the results can be saved using --output and
+    compared with a previous run using --baseline.
+'''
+
+# -*- encoding: utf-8 -*-
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import standins
+
+fake_texlive = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'fake-texlive')
+webquiz_py = os.path.join(standins.repository, 'webquiz', 'webquiz.py')
+
+# the commands that are timed: the arguments for webquiz.py
+commands = dict(
+    version=['--version'],
+    help=['--help'],
+    settings=['--settings'],
+    setting=['--settings', 'webquiz-url'],
+    up_to_date=['-qqq', '--no-format', 'quiz.tex'],
+)
+
+quiz_source = r'''\documentclass{webquiz}
+\begin{document}
+\begin{question}Question\end{question}
+\end{document}
+'''
+
+def time_command(arguments, environment, repeat):
+    r'''
+    Run webquiz.py with `arguments` `repeat` times, after one untimed run,
+    and return the best and median times in milliseconds
+    '''
+    times = []
+    for run in range(repeat + 1):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable] + arguments, env=environment,
+                                 stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        times.append(1000*(time.perf_counter() - start))
+        if process.returncode != 0:
+            print(process.stdout.decode('utf8', errors='replace'))
+            sys.exit('{} failed with exit code {}'.format(' '.join(arguments), process.returncode))
+    return dict(best=min(times[1:]), median=statistics.median(times[1:]))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the start up time of the webquiz commands')
+    parser.add_argument('command', nargs='*',
+                        help='commands to benchmark: {} (default: all)'.format(', '.join(commands)))
+    parser.add_argument('-r', '--repeat', type=int, default=10, help='number of times to run each command')
+    parser.add_argument('-o', '--output', default=None, help='save the results as json in this file')
+    parser.add_argument('-b', '--baseline', default=None, help='compare the results with this json file')
+    parser.add_argument('-t', '--threshold', type=float, default=0.2,
+                        help='report commands that are this much slower than the baseline (default 0.2 = 20%%)')
+    args = parser.parse_args()
+    for name in args.command:
+        if name not in commands:
+            parser.error('unknown command {}'.format(name))
+
+    directory = tempfile.mkdtemp(prefix='webquiz-startup-')
+    environment = dict(os.environ,
+        PATH=os.path.join(fake_texlive, 'bin') + os.pathsep + os.environ.get('PATH', ''),
+        FAKE_MAKE4HT_IMAGES='0',
+        WEBQUIZ_CACHE=os.path.join(directory, 'cache'),
+    )
+    environment.pop('WEBQUIZ_MAKE4HT', None)
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        with open('quiz.tex', 'w') as quiz:
+            quiz.write(quiz_source)
+
+        results = dict(python=platform.python_version(), machine=platform.machine(), commands={})
+        results['commands']['python'] = time_command(['-c', 'pass'], environment, args.repeat)
+        for name in args.command or commands:
+            results['commands'][name] = time_command([webquiz_py] + commands[name], environment, args.repeat)
+
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print('{:<12} {:>10} {:>10}  {}'.format('command', 'best (ms)', 'median', 'arguments'))
+    for name, times in results['commands'].items():
+        print('{:<12} {:>10.1f} {:>10.1f}  {}'.format(name, times['best'], times['median'],
+                  ' '.join(commands.get(name, ['python -c pass']))))
+
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as baseline:
+            baseline = json.load(baseline)['commands']
+        regressions = [name for name in results['commands']
+                        if name in baseline and name != 'python'
+                        and results['commands'][name]['best'] > (1 + args.threshold)*baseline[name]['best']]
+        print('\n{:<12} {:>10} {:>10}'.format('command', 'baseline', 'now'))
+        for name in results['commands']:
+            if name in baseline:
+                print('{:<12} {:>10.1f} {:>10.1f}{}'.format(name, baseline[name]['best'],
+                          results['commands'][name]['best'], '  REGRESSION' if name in regressions else ''))
+        if regressions:
+            print('\n{} regressions: {}'.format(len(regressions), ', '.join(regressions)))
+            sys.exit(1)
@@ -0,0 +1,70 @@
+r'''
+-----------------------------------------------------------------------------
+    bench_xml | benchmark for reading the webquiz xml file
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+
+    Usage: python3 benchmarks/bench_xml.py [--questions N] [--repeat R] [--backend B]
+
+    Reads a synthetic quiz using webquiz_xml.ReadWebQuizXmlFile and prints
+    the best time and the peak memory used, as measured by tracemalloc, for
+    each of the available xml backends.
+'''
+
+# -*- encoding: utf-8 -*-
+
+import argparse
+import time
+import tracemalloc
+
+import standins
+import webquiz_xml
+from synthetic_quiz import synthetic_quiz
+
+defaults = standins.settings()
+
+def read_quiz(xml, backend='auto'):
+    return webquiz_xml.ReadWebQuizXmlFile(xml, defaults, backend)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the webquiz xml reader')
+    parser.add_argument('-q', '--questions', type=int, default=5000, help='number of questions')
+    parser.add_argument('-m', '--math-terms', type=int, default=20, help='number of terms in each formula')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='number of times to read the quiz')
+    parser.add_argument('-b', '--backend', action='append', choices=sorted(webquiz_xml.xml_backends),
+                        help='xml backend to benchmark (default: all available backends)')
+    args = parser.parse_args()
+    if args.backend is None:
+        args.backend = [backend for backend in sorted(webquiz_xml.xml_backends)
+                                if backend != 'lxml' or webquiz_xml.lxml is not None]
+
+    xml = list(synthetic_quiz(args.questions, args.math_terms))
+    print('Reading a synthetic quiz with {} questions ({:.1f} MB)'.format(
+              args.questions, sum(len(line) for line in xml)/1e6))
+
+    for backend in args.backend:
+        times = []
+        for repeat in range(args.repeat):
+            start = time.perf_counter()
+            quiz = read_quiz(xml, backend)
+            times.append(time.perf_counter() - start)
+        assert len(quiz.question_list) == args.questions
+        del quiz
+
+        tracemalloc.start()
+        quiz = read_quiz(xml, backend)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del quiz
+
+        print('  {:<6} time: {:.3f}s (best of {})  peak memory: {:.1f} MB  quiz memory: {:.1f} MB'.format(
+                  backend, min(times), args.repeat, peak/1e6, current/1e6))
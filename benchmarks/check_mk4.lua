@@ -0,0 +1,220 @@
+-- -----------------------------------------------------------------------
+--   check_mk4.lua | checks of the image conversion in latex/webquiz.mk4
+-- -----------------------------------------------------------------------
+--
+--   Copyright (C) Andrew Mathas, University of Sydney
+--
+--   Distributed under the terms of the GNU General Public License (GPL)
+--               http://www.gnu.org/licenses/
+--
+--   This file is part of the WebQuiz system.
+--
+--   <Andrew.Mathas@sydney.edu.au>
+-- ----------------------------------------------------------------------
+--
+-- Run using:  texlua benchmarks/check_mk4.lua
+--
+-- TeX is not needed. The checks write synthetic idv and lg files into a
+-- temporary directory and then load webquiz.mk4 with a stand-in for the Make
+-- object of make4ht. The commands that the build file runs are caught by a
+-- stand-in for os.execute that writes the files that dvisvgm, dvips and gs
+-- would write, using the same names. An image that is made by the per-image
+-- fallback, rather than by a batch, means that the idv file was not parsed
+-- or that the batch files were misnamed, so this is an error.
+
+local mk4 = (arg and arg[0] or ""):gsub("[^/\\]*$", "") .. "../latex/webquiz.mk4"
+local failures = 0
+
+local function check(ok, message)
+  if not ok then
+    failures = failures + 1
+    print("FAIL: " .. message)
+  end
+end
+
+local function write_file(name, data)
+  local file = assert(io.open(name, "wb"))
+  file:write(data)
+  file:close()
+end
+
+local function file_exists(name)
+  local file = io.open(name, "r")
+  if file then file:close() end
+  return file ~= nil
+end
+
+-- a dvi file with `pages` pages that define and select fonts, typeset a
+-- character and, on some pages, use specials
+local function dvi_file(pages)
+  local u4 = function(n) return string.pack(">I4", n) end
+  local font_definition = function(k)
+    return string.char(243, k) .. u4(0x12345678) .. u4(655360) .. u4(655360) .. string.char(0, 5) .. "cmr10"
+  end
+  local parts = {string.char(247, 2) .. u4(25400000) .. u4(473628672) .. u4(1000) .. string.char(0)}
+  local length, last_bop = #parts[1], 0xFFFFFFFF
+  for page = 1, pages do
+    local commands = {string.char(139)}
+    for count = 0, 9 do table.insert(commands, u4(count == 0 and page or 0)) end
+    table.insert(commands, u4(last_bop))
+    if page == 1 then table.insert(commands, font_definition(0)) end
+    if page == 2 then table.insert(commands, font_definition(1)) end
+    table.insert(commands, page % 2 == 0 and string.char(235, 1) or string.char(171))
+    if page % 3 == 0 then
+      local special = "color push Black"
+      table.insert(commands, string.char(239, #special) .. special)
+    end
+    table.insert(commands, string.char(65 + page % 26, 140))
+    last_bop = length
+    local data = table.concat(commands)
+    table.insert(parts, data)
+    length = length + #data
+  end
+  local post = length
+  table.insert(parts, string.char(248) .. u4(last_bop) .. u4(25400000) .. u4(473628672) .. u4(1000)
+                      .. u4(0) .. u4(0) .. string.pack(">I2I2", 1, pages)
+                      .. font_definition(0) .. font_definition(1)
+                      .. string.char(249) .. u4(post) .. string.char(2, 223, 223, 223, 223))
+  return table.concat(parts)
+end
+
+-- stand-ins for dvisvgm, dvips and gs, which record the commands that are run
+local page_counts, commands = {}, {}
+
+local function page_numbers(ranges)
+  local numbers = {}
+  for range in ranges:gmatch("[^,]+") do
+    local first, last = range:match("^(%d+)%-(%d+)$")
+    first, last = tonumber(first or range), tonumber(last or range)
+    for page = first, last do table.insert(numbers, page) end
+  end
+  return numbers
+end
+
+local function run_tool(command)
+  table.insert(commands, command)
+  local ranges, pattern, source = command:match("^dvisvgm %-n %-p (%S+) %-o (%S+) (%S+)$")
+  if ranges then
+    -- dvisvgm pads %p to the number of digits in the number of pages
+    local digits = #tostring(page_counts[source])
+    for _, page in ipairs(page_numbers(ranges)) do
+      write_file(pattern:gsub("%%p", string.format("%0" .. digits .. "d", page)), "svg")
+    end
+    return true
+  end
+  local output = command:match("^dvisvgm %-n %-o (%S+)")
+  if output then
+    write_file(output, "svg")
+    return true
+  end
+  local dvips_ranges, ps_file = command:match("^dvips %-E %-i %-S 1 .* %-pp (%S+) %S+ %-o (%S+)$")
+  if dvips_ranges then
+    -- dvips -i writes an empty file and then one file for each section
+    write_file(ps_file, "")
+    for n, _ in ipairs(page_numbers(dvips_ranges)) do
+      write_file(ps_file:gsub("%.ps$", "") .. string.format(".%03d", n), "eps")
+    end
+    return true
+  end
+  local png_pattern, eps_files = command:match("^gs .* %-sOutputFile=(%S+) (.*)$")
+  if png_pattern then
+    local n = 0
+    for _ in eps_files:gmatch("%S+") do
+      n = n + 1
+      write_file(png_pattern:gsub("%%d", tostring(n)), "png")
+    end
+    return true
+  end
+  return false
+end
+
+os.execute = function(command)
+  if command:match("&") then
+    -- the commands run in the background, as ( command ) & ( command ) & wait
+    for background in command:gmatch("%( (.-) %) &") do
+      for part in (background .. " && "):gmatch("(.-) && ") do run_tool(part) end
+    end
+  else
+    for part in (command .. " && "):gmatch("(.-) && ") do run_tool(part) end
+  end
+  return true
+end
+
+-- load webquiz.mk4, with a stand-in for the Make object of make4ht, and
+-- convert the images in the lg file for `input` as make4ht would
+local function make_images(input)
+  Make = {images = {}}
+  function Make:image(pattern, command) table.insert(self.images, {pattern = pattern, command = command}) end
+  getmetatable("").__mod = function(text, fields)
+    return (text:gsub("%${(.-)}", function(field) return tostring(fields[field]) end))
+  end
+  local quiet = print
+  print = function() end
+  dofile(mk4)
+  local lg = assert(io.open(input .. ".lg", "r"))
+  for line in lg:lines() do
+    local source, page, output = line:match("^%-%-%- needs %-%-%- (.-)%[(%d+)%] ==> (.-) %-%-%-")
+    if source then
+      for _, image in ipairs(Make.images) do
+        if output:match(image.pattern) then
+          image.command({input = input, source = source, page = page, output = output})
+          break
+        end
+      end
+    end
+  end
+  lg:close()
+  print = quiet
+end
+
+-- make the images for a quiz with `pages` pages in its idv file
+local function check_images(input, pages, needed, extension)
+  page_counts[input .. ".idv"] = pages
+  commands = {}
+  write_file(input .. ".idv", dvi_file(pages))
+  local lines, outputs = {}, {}
+  for n, page in ipairs(needed) do
+    outputs[n] = input .. page .. "x." .. extension
+    table.insert(lines, string.format("--- needs --- %s.idv[%d] ==> %s ---", input, page, outputs[n]))
+  end
+  write_file(input .. ".lg", table.concat(lines, "\n") .. "\n")
+  make_images(input)
+
+  for _, output in ipairs(outputs) do
+    check(file_exists(output), input .. ": " .. output .. " was not made")
+  end
+  for _, command in ipairs(commands) do
+    check(not command:match("^dvisvgm %-n %-o") and not command:match("^dvips %-E %-q"),
+          input .. ": an image was converted on its own: " .. command)
+  end
+  if lfs then
+    for file in lfs.dir(".") do
+      check(file:sub(1, 2 + #input) ~= "zz" .. input, input .. ": the batch file " .. file .. " was not removed")
+    end
+  end
+  for _, file in ipairs(outputs) do os.remove(file) end
+  os.remove(input .. ".idv")
+  os.remove(input .. ".lg")
+end
+
+assert(lfs, "check_mk4.lua needs the lfs library of texlua")
+mk4 = mk4:match("^[/\\]") and mk4 or lfs.currentdir() .. "/" .. mk4
+local directory = os.tmpname()
+os.remove(directory)
+assert(lfs.mkdir(directory) and lfs.chdir(directory), "unable to make a temporary directory")
+
+check_images("few", 9, {2, 3, 4, 8}, "svg")
+check_images("many", 12, {3, 10, 11, 12}, "svg")
+check_images("lots", 105, {1, 2, 9, 50, 99, 100, 105}, "svg")
+check_images("png", 12, {1, 2, 3, 11}, "png")
+
+for file in lfs.dir(".") do
+  if file ~= "." and file ~= ".." then os.remove(file) end
+end
+lfs.chdir("..")
+lfs.rmdir(directory)
+if failures > 0 then
+  print(string.format("check_mk4: %d checks failed", failures))
+  os.exit(1)
+end
+print("check_mk4: all checks passed")
@@ -0,0 +1,91 @@
+r'''
+-----------------------------------------------------------------------------
+    standins | stand-ins for the webquiz settings and options that allow
+             | the webquiz python code to be benchmarked without TeX
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+'''
+
+# -*- encoding: utf-8 -*-
+
+import argparse
+import os
+import sys
+
+repository = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+latex_directory = os.path.join(repository, 'latex')
+sys.path.insert(0, os.path.join(repository, 'webquiz'))
+
+import webquiz_layout
+import webquiz_makequiz
+import webquiz_settings
+import webquiz_util
+
+# the default webquiz settings, as in webquiz_settings.WebQuizSettings
+default_settings = dict(
+    webquiz_url='/WebQuiz',
+    webquiz_www='',
+    language='english',
+    engine='latex',
+    theme='default',
+    breadcrumbs='',
+    department='School of Mathematics and Statistics',
+    department_url='/',
+    institution='University of Sydney',
+    institution_url='/',
+    hide_side_menu='false',
+    one_page='false',
+    random_order='false',
+    webquiz_layout='webquiz_layout',
+    make4ht='',
+    mathjax='https://cdnjs.cloudflare.com/ajax/libs/mathjax/2.7.1/MathJax.js',
+)
+
+def settings(**changes):
+    r'''
+    Return the default settings, updated by `changes`, without reading the
+    webquizrc files
+    '''
+    return webquiz_settings.QuizSettings([('default', default_settings), ('changes', changes)])
+
+def options(**changes):
+    r'''
+    Return the command line options for quietly making a quiz, updated by
+    `changes`
+    '''
+    return argparse.Namespace(**dict(dict(
+        debugging=False,
+        draft=False,
+        engine='latex',
+        force=True,
+        make4ht_options='',
+        quiet=2,
+        run=lambda cmd: webquiz_util.shell_command(cmd),
+        shell_escape=False,
+        talk=lambda msg: None,
+        tex_format=None,
+        stream_web_page=webquiz_layout.stream_web_page,
+        write_web_page=webquiz_layout.write_web_page,
+        xml_backend='auto',
+    ), **changes))
+
+metadata = webquiz_util.MetaData(os.path.join(latex_directory, 'webquiz.ini'), debugging=False)
+
+class MakeWebQuiz(webquiz_makequiz.MakeWebQuiz):
+    r'''
+    MakeWebQuiz with the language files read from the latex directory of the
+    repository, rather than using kpsewhich, so that TeX is not needed.
+    '''
+    def read_language_file(self):
+        self.language = webquiz_util.MetaData(
+            os.path.join(latex_directory, 'webquiz-{}.lang'.format(self.quiz.language))
+        )
@@ -0,0 +1,146 @@
+r'''
+-----------------------------------------------------------------------------
+    synthetic_quiz | generate synthetic webquiz xml files for benchmarking
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+'''
+
+# -*- encoding: utf-8 -*-
+
+import argparse
+import sys
+
+quiz_head = '''<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<!DOCTYPE webquiz SYSTEM "webquiz.dtd">
+<webquiz debugging="false" hide_side_menu="false" language="DeFaUlT" one_page="{one_page}" pst2pdf="false" random_order="false" src="{quiz_name}.tex" theme="DeFaUlT">
+<title>Synthetic quiz</title>
+<breadcrumb breadcrumbs="DeFaUlT">Synthetic</breadcrumb>
+<unit_name url="/MATH1001" quizzes_url="DeFaUlT">Synthetic mathematics</unit_name>
+<unit_code>MATH1001</unit_code>
+<department url="DeFaUlT">DeFaUlT</department>
+<institution url="DeFaUlT">DeFaUlT</institution>
+'''
+
+discussion = '''<discussion>
+<short_heading>Discussion {dnum}</short_heading>
+<heading>Discussion {dnum}</heading>
+<text><![CDATA[<p>Discussion {dnum} of a synthetic quiz.</p>
+{paragraphs}]]></text>
+</discussion>
+'''
+
+# tex4ht writes MathML one element per line
+math_term = '''<mrow>
+<msup><mrow><mi>x</mi></mrow><mrow><mn>{power}</mn></mrow></msup>
+<mo>+</mo>
+</mrow>
+'''
+
+input_question = '''<answer prompt="true" comparison="number">
+<text><![CDATA[{answer}]]></text>
+</answer>
+<text><![CDATA[ units]]></text>
+<when type="right"><text><![CDATA[<p>Correct: {answer}</p>
+{feedback}]]></text>
+</when>
+<when type="wrong"><text><![CDATA[<p>Try again</p>]]></text>
+</when>
+'''
+
+choice_item = '''<item correct="{correct}" symbol="{symbol}"><text><![CDATA[Item {item} for question {qnum}]]></text>
+<feedback><text><![CDATA[<p>Feedback {item} for question {qnum}</p>
+{feedback}]]></text>
+</feedback>
+</item>
+'''
+
+def paragraphs(length):
+    r'''
+    Return `length` lines of filler text
+    '''
+    return ''.join('<p>Line {} of some text that explains the answer.</p>\n'.format(line) for line in range(length))
+
+def image_names(quiz_name, qnum, images):
+    r'''
+    Return the names of the `images` images in question `qnum`. As with
+    make4ht, the images are numbered consecutively through the quiz and
+    alternate between svg and png files.
+    '''
+    return ['{}{}x.{}'.format(quiz_name, image, 'svg' if image % 2 == 0 else 'png')
+               for image in range(qnum*images, (qnum+1)*images)]
+
+def image_tag(image):
+    r'''
+    Return the img tag for `image`. The png images are split over several
+    lines, as tex4ht does, and the svg images are on one line.
+    '''
+    if image.endswith('.png'):
+        return '<img \nsrc="{}" alt="PIC"  \n/>\n'.format(image)
+    return '<img src="{}" alt="PIC" />\n'.format(image)
+
+def question_text(qnum, math_terms, images=[]):
+    r'''
+    Return the text of question `qnum`, which contains a MathML formula with
+    `math_terms` terms and links to the `images`.
+    '''
+    return '<text><![CDATA[<p>Question {qnum}: simplify\n<math display="block">\n{math}<mn>{qnum}</mn>\n</math>\n{images}</p>]]></text>\n'.format(
+               qnum=qnum,
+               math=''.join(math_term.format(power=term) for term in range(math_terms)),
+               images=''.join(image_tag(image) for image in images)
+    )
+
+def synthetic_quiz(questions=5000, math_terms=20, items=4, one_page=False, feedback=0, discussions=1,
+                   images=0, quiz_name='synthetic'):
+    r'''
+    A generator that yields the lines of a synthetic webquiz xml file with
+    `questions` questions, a third of which are input questions and the rest
+    are single and multiple choice questions with `items` items. The text of
+    each question contains a MathML formula with `math_terms` terms and
+    `images` images, and the feedback for each item, or answer, has
+    `feedback` extra lines of text. The quiz starts with `discussions`
+    discussions.
+    '''
+    yield from quiz_head.format(one_page='true' if one_page else 'false', quiz_name=quiz_name).splitlines(True)
+    for dnum in range(discussions):
+        yield from discussion.format(dnum=dnum+1, paragraphs=paragraphs(feedback)).splitlines(True)
+    feedback = paragraphs(feedback)
+    for qnum in range(questions):
+        question = ['<question>', question_text(qnum, math_terms, image_names(quiz_name, qnum, images))]
+        if qnum % 3 == 0:
+            question.append(input_question.format(answer=qnum, feedback=feedback))
+        else:
+            choice = 'single' if qnum % 3 == 1 else 'multiple'
+            question.append('<choice type="{}" columns="2">\n'.format(choice))
+            for item in range(items):
+                correct = item == 1 or (choice == 'multiple' and item == items - 1)
+                question.append(choice_item.format(correct='true' if correct else 'false',
+                                                   symbol=chr(ord('a') + item),
+                                                   item=item,
+                                                   qnum=qnum,
+                                                   feedback=feedback))
+            question.append('</choice>')
+        question.append('</question>\n')
+        yield from ''.join(question).splitlines(True)
+    yield '</webquiz>\n'
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic webquiz xml file to stdout')
+    parser.add_argument('-q', '--questions', type=int, default=5000, help='number of questions')
+    parser.add_argument('-m', '--math-terms', type=int, default=20, help='number of terms in each formula')
+    parser.add_argument('-i', '--items', type=int, default=4, help='number of items in choice questions')
+    parser.add_argument('-f', '--feedback', type=int, default=0, help='number of extra lines of feedback')
+    parser.add_argument('-d', '--discussions', type=int, default=1, help='number of discussions')
+    parser.add_argument('-g', '--images', type=int, default=0, help='number of images in each question')
+    parser.add_argument('-o', '--one-page', action='store_true', help='one page quiz')
+    args = parser.parse_args()
+    sys.stdout.writelines(synthetic_quiz(args.questions, args.math_terms, args.items, args.one_page,
+                                         args.feedback, args.discussions, args.images))
@@ -136,6 +136,36 @@ function toggle_side_menu() {
     }
 }
 
+// The contents of the hidden questions, and of the feedback, are inside
+// template elements so that their images and math are only loaded, and
+// typeset by MathJax, when they are shown. Nested templates, such as the
+// feedback inside a question, stay put until they are shown.
+function showLazyContent(element) {
+    var i, child, templates = [];
+    for (i = 0; i < element.children.length; i++) {
+        child = element.children[i];
+        if (child.tagName == "TEMPLATE" && child.classList.contains("webquiz-lazy")) {
+            templates.push(child);
+        }
+    }
+    for (i = 0; i < templates.length; i++) {
+        child = templates[i];
+        if ("content" in child) {
+            element.replaceChild(document.importNode(child.content, true), child);
+        } else { // browsers without template support
+            while (child.firstChild) {
+                element.insertBefore(child.firstChild, child);
+            }
+            element.removeChild(child);
+        }
+    }
+    // MathJax typesets the whole page when it starts, so the new content only
+    // needs to be typeset if MathJax has already been loaded
+    if (templates.length > 0 && window.MathJax && MathJax.Hub && MathJax.Hub.Queue) {
+        MathJax.Hub.Queue(["Typeset", MathJax.Hub, element]);
+    }
+}
+
 // Code to hide/show questions
 function showQuestion(newB, newQ) { // newQ is an integer which is always in the correct range
     // alert('showing newB='+newB+', newQ='+newQ+', currentQ='+currentQ+'.');
@@ -148,7 +178,9 @@ function showQuestion(newB, newQ) { // newQ is an integer which is always in the
             currentB.classList.remove("button-selected");
       }
       // display the new question
-      document.getElementById("question" + newQ).style.display = "table";
+      var question = document.getElementById("question" + newQ);
+      showLazyContent(question);
+      question.style.display = "table";
 
       // update the question/discussion header and select question button
       if (newQ > 0) {
@@ -179,6 +211,7 @@ function showFeedback(tag) {
     // alert('Showing feedback for '+tag+'.');
     hideFeedback(); // hide current feedback
     currentFeedback = document.getElementById(tag);
+    showLazyContent(currentFeedback);
     currentFeedback.style.display = "block";
 }
 
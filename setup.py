@@ -262,6 +262,7 @@ class WebQuizCtan(Command):
                 ('latex/webquiz.c*',              'latex'),
                 ('latex/webquiz-*.code.tex',      'latex'),
                 ('latex/webquiz.ini',             'latex'),
+                ('latex/webquiz.mk4',             'latex'),
                 ('latex/webquiz-*.lang',          'latex'),
                 ('latex/pgfsys-dvisvgm4ht.def',   'latex'),
                 ('CHANGES.rst',                   'scripts'),
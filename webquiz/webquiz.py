@@ -18,32 +18,36 @@ r'''
 
 import argparse
 import codecs
+import collections
+import contextlib
 import errno
 import glob
+import io
+import json
 import os
 import re
 import shutil
 import signal
 import subprocess
 import sys
-
-# imports of webquiz code
-import webquiz_makequiz
+import tempfile
+import time
+import traceback
+
+# imports of webquiz code: the modules that are only needed for making quizzes
+# are imported in the main program below, once we know that they are needed,
+# so that webquiz --version, --settings, ... start quickly
+import webquiz_settings
 import webquiz_templates
+import webquiz_trace
 import webquiz_util
 
 #################################################################################
-# read in basic meta data such as author, version, ... and set debugging=False
-try:
-    metadata = webquiz_util.MetaData(webquiz_util.kpsewhich('webquiz.ini'), debugging=False)
-except subprocess.CalledProcessError:
-    # check to see if we are running from the zip file
-    ini_file = os.path.join(webquiz_util.webquiz_file(''), '..', 'latex', 'webquiz.ini')
-    try:
-        metadata = webquiz_util.MetaData(ini_file, debugging=False)
-    except (FileNotFoundError, subprocess.CalledProcessError):
-        print('webquiz installation error: unable to find webquiz.ini -> {}'.format(ini_file))
-        sys.exit(1)
+# basic meta data such as author, version, ..., which is only read when it is first used
+metadata = webquiz_settings.metadata
+
+# the reports on the quizzes that have been made, for --report
+quiz_reports = []
 
 # ---------------------------------------------------------------------------------------
 def graceful_exit(sig, frame):
@@ -74,9 +78,9 @@ def preprocess_with_pst2pdf(options, quiz_file):
         options.run(cmd)
     except OSError as err:
         if err.errno == errno.ENOENT:
-            webquiz_util.webquiz_error(options.debugging, 'pst2pdf not found. You need to install pst2pdf to use the pst2pdf option', err)
+            raise webquiz_util.WebQuizError('pst2pdf not found. You need to install pst2pdf to use the pst2pdf option', err)
         else:
-            webquiz_util.webquiz_error(options.debugging, 'error running pst2pdf on {}'.format(quiz_file), err)
+            raise webquiz_util.WebQuizError('error running pst2pdf on {}'.format(quiz_file), err)
 
     # match \includegraphics commands
     fix_svg = re.compile(r'(\\includegraphics\[scale=1\])\{('+quiz_file+r'-fig-[0-9]*)\}')
@@ -88,706 +92,314 @@ def preprocess_with_pst2pdf(options, quiz_file):
                 for line in pst_file:
                     pst_fixed.write(fix_svg.sub(r'\1{%s/\2.svg}' % quiz_file, line))
     except OSError as err:
-        webquiz_util.webquiz_error(options.debugging,
-            'there was an problem running pst2pdf for {}'.format(quiz_file),
-            err
-        )
+        raise webquiz_util.WebQuizError('there was an problem running pst2pdf for {}'.format(quiz_file), err)
 
-class WebQuizSettings:
+#################################################################################
+def set_run_and_talk(options, capture=False):
     r'''
-    Class for initialising webquiz. This covers both reading and writing the
-    webquizrc file and copying files into the web directories during
-    initialisation. The settings themselves are stored in the attribute
-    settings, which is a dictionary. The class reads and writes the settings to
-    the webquizrc file and the values of the settings are available as items:
-        >>> wq = WebQuizSettings()
-        >>> wq['webquiz_url']
-        ... /WebQuiz
-        >>> wq['webquiz_url'] = '/new_url'
+    Set the `options.run()` and `options.talk()` short-cuts:
+        - options.run() executes system commands depending on the quietness.
+          We need to use shell=True because otherwise pst2pdf gives an error.
+          Keyword arguments, such as cwd, are passed on to subprocess
+        - options.talk() is a shorthand for letting the user know what is happening
+    The commands run by options.run() are recorded when --trace or
+    --memory-report are used.
+    If `capture` is `True` then the output of the system commands is written
+    to `sys.stdout`, rather than directly to the terminal, so that it can be
+    collected by the worker processes used by --jobs. In this case the
+    commands cannot read from the terminal, so TeX stops on errors rather
+    than waiting for input.
     '''
-
-    # default of settings for the webquizrc file - a dictionary of dictionaries
-    # the 'help' field is for printing descriptions of the settings to help the
-    # user - they are also printed in the webquizrc file
-    settings = dict(
-        webquiz_url={
-            'default': '',
-            'advanced': False,
-            'help': 'Relative URL for the webquiz web directory',
-        },
-        webquiz_www={
-            'default': '',
-            'advanced': False,
-            'help': 'Full path to WebQuiz web directory',
-        },
-        language={
-            'default': 'english',
-            'advanced': False,
-            'help': 'Default language used on web pages'
-        },
-        engine = {
-            'default': 'latex',
-            'advanced': False,
-            'help': 'Default TeX engine used to compile web pages',
-            'values': dict(latex='', lua='--lua', xelatex='--xetex')
-        },
-        theme={
-            'default': 'default',
-            'advanced': False,
-            'help': 'Default colour theme used on web pages'
-        },
-        breadcrumbs={
-            'default': '',
-            'advanced': False,
-            'help': 'Breadcrumbs at the top of quiz page',
-        },
-        department={
-            'default': '',
-            'advanced': False,
-            'help': 'Name of department',
-        },
-        department_url={
-            'default': '/',
-            'advanced': False,
-            'help': 'URL for department',
-        },
-        institution={
-            'default': '',
-            'advanced': False,
-            'help': 'Institution or university',
-        },
-        institution_url={
-            'default': '/',
-            'advanced': False,
-            'help': 'URL for institution or university',
-        },
-        hide_side_menu={
-            'default': 'false',
-            'advanced': False,
-            'help': 'Do not display the side menu at start of quiz',
-        },
-        one_page={
-            'default': 'false',
-            'advanced': False,
-            'help': 'Display questions on one page',
-        },
-        random_order={
-            'default': 'false',
-            'advanced': False,
-            'help': 'Randomly order the quiz questions',
-        },
-        webquiz_layout={
-            'default': 'webquiz_layout',
-            'advanced': True,
-            'help': 'Name of python module that formats the quizzes',
-        },
-        make4ht={
-            'default': '',
-            'advanced': True,
-            'help': 'Build file for make4ht',
-        },
-        mathjax={
-            'default':
-            'https://cdnjs.cloudflare.com/ajax/libs/mathjax/2.7.1/MathJax.js',
-            'advanced':
-            True,
-            'help':
-            'URL for mathjax',
-        },
-        version={
-            'advanced': False,
-            'help': 'WebQuiz version number for webquizrc settings',
-        })
-
-    # by default we assume we don't need to print a initialisation warning
-    initialise_warning = ''
-
-    # turn debugging on by default because any error message that we hit before
-    # we process the command line options really should not happen
-    debugging = True
-
-    # keep track of whether we have initialised
-    have_initialised = False
-
-    def __init__(self):
-        '''
-        First read the system webquizrc file and then read the
-        to use some system settings and to override others.
-
-        By default, there is no webquiz initialisation file. We first
-        look for webquizrc in the webquiz source directory and then
-        for .webquizrc file in the users home directory.
-        '''
-        self.settings['version']['default'] = metadata.version
-        for key in self.settings:
-            self.settings[key]['value'] = self.settings[key]['default']
-            if not 'editable' in self.settings[key]:
-                self.settings[key]['editable'] = False
-
-        # define user and system rc file and load the ones that exist
-
-        self.system_rcfile = os.path.join(webquiz_util.kpsewhich('-var-value TEXMFLOCAL'),
-                                           'tex',
-                                           'latex',
-                                           'webquiz',
-                                           'webquizrc'
-        )
-        self.read_webquizrc(self.system_rcfile)
-
-        # the user rc file defaults to:
-        #   ~/.dotfiles/config/webquizrc if .dotfiles/config exists
-        #   ~/.config/webquizrc if .config exists
-        # and otherwise to ~/.webquizrc
-        if os.path.isdir(os.path.join(os.path.expanduser('~'), '.dotfiles', 'config')):
-            self.user_rcfile = os.path.join(os.path.expanduser('~'), '.dotfiles', 'config', 'webquizrc')
-        elif os.path.isdir(os.path.join(os.path.expanduser('~'), '.config')):
-            self.user_rcfile = os.path.join(os.path.expanduser('~'), '.config', 'webquizrc')
-        else:
-            self.user_rcfile = os.path.join(os.path.expanduser('~'), '.webquizrc')
-
-        self.read_webquizrc(self.user_rcfile)
-
-    def webquiz_debug(self, msg):
-        r'''
-            Customised debugging message for the MakeSettings module
-        '''
-        webquiz_util.webquiz_debug(self.debugging, 'main: '+msg)
-
-    def webquiz_error(self, msg, err=None):
-        r'''
-            Customised error messages for the Module
-        '''
-        webquiz_util.webquiz_error(self.debugging, 'settings: '+msg, err)
-
-    def __getitem__(self, key):
-        r'''
-        Return the value of the corresponding setting. That is, it returns
-            self.settings[key]['value']
-        and an error if the key is unknown.
-        '''
-        if key in self.settings:
-            return self.settings[key]['value']
-
-        self.webquiz_error('getitem: unknown setting "{}" in webquizrc.'.format(key))
-
-    def __setitem__(self, key, value):
-        r'''
-        Set the value of the corresponding setting. This is the equivalent of
-            self.settings[key]['value'] = value
-        and an error if the key is unknown.
-        '''
-        if key in self.settings:
-            self.settings[key]['value'] = value
+    if not capture:
+        if options.quiet == 0:
+            options.run = lambda cmd, **kwargs: webquiz_trace.call(cmd, **kwargs)
+        elif options.quiet == 1:
+            options.run  = lambda cmd, **kwargs: webquiz_trace.call(cmd, stdout=subprocess.DEVNULL, **kwargs)
         else:
-            self.webquiz_error('setitem: unknown setting "{}" in webquizrc'.format(key))
-
-    def read_webquizrc(self, rcfile, must_exist=False):
-        r'''
-        Read the settings from the specified webquizrc file - if it exists, in
-        which case set self.rcfile equal to this directory. If the file does
-        not exist then return without changing the current settings.
-        '''
-        if os.path.isfile(rcfile):
-            try:
-                with codecs.open(rcfile, 'r', encoding='utf8') as webquizrc:
-                    for line in webquizrc:
-                        if '#' in line:  # remove comments
-                            line = line[:line.index('#')]
-                        if '=' in line:
-                            key, value = line.split('=')
-                            key = key.strip().lower().replace('-','_')
-                            value = value.strip()
-                            if key in self.settings:
-                                if value != self[key]:
-                                    self[key] = value
-                            elif key != '':
-                                self.webquiz_error('unknown setting "{}" in {}'.format(key, rcfile))
-
-                # record the rcfile for later use
-                self.rcfile = rcfile
-
-            except OSError as err:
-                self.webquiz_error('there was a problem reading the rc-file {}'.format(rcfile), err)
-
-            except Exception as err:
-                self.webquiz_error('there was an error reading the webquizrc file,', err)
-
-        elif must_exist:
-            # this is only an error if we have been asked to read this file
-            self.webquiz_error('the rc-file "{}" does not exist'.format(rcfile))
-
-    def keys(self):
-        r'''
-        Return a list of keys for all settings, ordered alphabetically with the
-        advanced options last/
-        '''
-        return sorted(self.settings.keys(), key=lambda k: '{}{}'.format(self.settings[k]['advanced'], k))
-
-    def write_webquizrc(self):
-        r'''
-        Write the settings to the webquizrc file, defaulting to the user
-        rcfile if unable to write to the system rcfile
-        '''
-        if not hasattr(self, 'rcfile'):
-            # when initialising an rcfile will not exist yet
-            self.rcfile = self.system_rcfile
-
-        file_not_written = True
-        while file_not_written:
-            try:
-                dire = os.path.dirname(self.rcfile)
-                if dire != '' and not os.path.isdir(dire):
-                    os.makedirs(dire, exist_ok=True)
-                with codecs.open(self.rcfile, 'w', encoding='utf8') as rcfile:
-                    for key in self.keys():
-                        # Only save settings in the rcfile if they have changed
-                        # Note that changed means changed from the last read
-                        # rcfile rather than from the default (of course, the
-                        # defaults serve as the "initial rcfile")
-                        if key == 'version' or self.settings[key]['default']!=self[key]:
-                            rcfile.write('# {}\n{:<17} = {}\n'.format(
-                                           self.settings[key]['help'],
-                                           key.replace('_','-'),
-                                           self[key])
-                            )
-
-                print('\nWebQuiz settings saved in {}\n'.format( self.rcfile))
-                input('Press RETURN to continue... ')
-                file_not_written = False
-
-            except (OSError, PermissionError) as err:
-                # if writing to the system_rcfile then try to write to user_rcfile
-                alt_rcfile = self.user_rcfile if self.rcfile != self.user_rcfile else self.system_rcfile
-                response = input(
-                    webquiz_templates.rc_permission_error.format(
-                        error=err,
-                        rcfile=self.rcfile,
-                        alt_rcfile=alt_rcfile))
-                if response.startswith('2'):
-                    self.rcfile = alt_rcfile
-                elif response.startswith('3'):
-                    rcfile = input('WebQuiz rc-file: ')
-                    print('\nTo access this rc-file you will need to use: webquiz --rcfile {} ...'.format(rcfile))
-                    self.rcfile = os.path.expanduser(rcfile)
-                elif not response.startswith('1'):
-                    print('exiting...')
-                    sys.exit(1)
-
-    def list_settings(self, setting='all'):
-        r'''
-        Print the non-default settings for webquiz from the webquizrc
-        '''
-        if not hasattr(self, 'rcfile'):
-            print(
-                'Please initialise WebQuiz using the command: webquiz --initialise\n'
-            )
-
-        if setting not in ['all', 'verbose', 'help']:
-            setting = setting.replace('-', '_')
-            if setting in self.settings:
-                print(self.settings[setting]['value'])
-            else:
-                self.webquiz_error('{} is an invalid setting'.format(setting))
-
-        elif setting=='all':
-            dash = '-'*len('WebQuiz rc-file: {}'.format(self.rcfile))
-            print('{dash}\nWebQuiz rc-file: {rcfile}\n{dash}'.format(rcfile=self.rcfile, dash=dash))
-            for key in self.keys():
-                print('{:<17} = {}'.format(key.replace('_', '-'), self[key]))
-            print('{dash}'.format(dash=dash))
+            options.run  = lambda cmd, **kwargs: webquiz_trace.call(cmd, stdout=subprocess.DEVNULL,
+                                                                    stderr=subprocess.DEVNULL, **kwargs)
 
-        elif setting=='help':
-            for key in self.keys():
-                print('{:<17} {}'.format(key.replace('_', '-'), self.settings[key]['help'].lower()))
-
-        else:
-            print('WebQuiz settings from {}'.format(self.rcfile))
-            for key in self.keys():
-                print('# {}{}\n{:<17} = {:<17}  {}'.format(
-                        self.settings[key]['help'],
-                        ' (advanced)' if self.settings[key]['advanced'] else '',
-                        key.replace('_', '-'),
-                        self[key],
-                        '(default)' if self[key]==self.settings[key]['default'] else ''
-                        )
+    else:
+        def run(cmd, **kwargs):
+            with tempfile.TemporaryFile() as output:
+                returncode = webquiz_trace.call(cmd, **kwargs,
+                    stdin=subprocess.DEVNULL,
+                    stdout=output if options.quiet == 0 else subprocess.DEVNULL,
+                    stderr=subprocess.STDOUT if options.quiet == 0
+                           else output if options.quiet == 1
+                           else subprocess.DEVNULL
                 )
+                output.seek(0)
+                sys.stdout.write(output.read().decode('utf8', errors='replace'))
+            return returncode
 
-    def initialise_webquiz(self, need_to_initialise=False, developer=False):
-        r'''
-        Set the root for the WebQuiz web directory and copy the www files into
-        this directory. Once this is done save the settings to webquizrc.
-        This method should only be used when WebQuiz is being set up.
-
-        If `need_to_initialise` is `True` then this is a forced initialisation.
-        '''
-
-        # keep track of whether we have initialised
-        self.have_initialised = True
-
-        if need_to_initialise:
-            self.initialise_warning = webquiz_templates.web_initialise_warning
-            initialise = input(webquiz_templates.initialise_invite)
-            if initialise!='' and initialise.strip().lower()[0]!='y':
-                self['webquiz_url'] = 'http://www.maths.usyd.edu.au/u/mathas/WebQuiz'
-                return
-
-        if self['webquiz_url']=='':
-            self['webquiz_url'] = '/WebQuiz'
-
-        # prompt for directory and copy files - are these reasonable defaults
-        # for each OS?
-        if sys.platform == 'darwin':
-            default_root = '/Library/WebServer/Documents/WebQuiz'
-            platform = 'Mac OSX'
-        elif sys.platform.startswith('win'):
-            default_root = ' c:\inetpub\wwwroot\WebQuiz'
-            platform = 'Windows'
-        else:
-            default_root = '/var/www/html/WebQuiz'
-            platform = sys.platform.capitalize()
-
-        if self['webquiz_www'] != '':
-            webquiz_root = self['webquiz_www']
-        else:
-            webquiz_root = default_root
-
-        print(webquiz_templates.initialise_introduction)
-        input('Press RETURN to continue... ')
-
-        print(webquiz_templates.webroot_request.format(
-                platform=platform,
-                webquiz_dir = webquiz_root)
-        )
-        input('Press RETURN to continue... ')
-
-        files_copied = False
-        while not files_copied:
-            web_dir = input('\nWebQuiz web directory:\n[{}] '.format(webquiz_root))
-            if web_dir == '':
-                web_dir = webquiz_root
-            else:
-                web_dir = os.path.expanduser(web_dir)
-
-            print('Web directory set to {}'.format(web_dir))
-            if web_dir=='SMS':
-                # undocumented: allow links to SMS web pages
-                self['webquiz_www'] = 'SMS'
-                self['webquiz_url'] = 'http://www.maths.usyd.edu.au/u/mathas/WebQuiz'
+        options.run = run
 
-            else:
-                try:
-                    # ...remove the doc directory
-                    web_doc = os.path.join(web_dir, 'doc')
-                    if os.path.isfile(web_doc) or os.path.islink(web_doc):
-                        os.remove(web_doc)
-                    elif os.path.isdir(web_doc):
-                        shutil.rmtree(web_doc)
-
-                    # Need to locate the www directory, which should be a subdirectory
-                    # of the webquiz doc directory. First try using texdoc
-                    webquiz_doc = ''
-                    try:
-                        webquiz_pdf = webquiz_util.shell_command('texdoc --list --machine webquiz.pdf').split()[-1]
-                        if webquiz_pdf.endswith('webquiz.pdf'):
-                            webquiz_doc = os.path.dirname(webquiz_pdf)
-                    except subprocess.CalledProcessError:
-                        pass
-
-                    # if texdoc failed then try using TEXMFMAIN
-                    if webquiz_doc=='':
-                        try:
-                            webquiz_doc = os.path.join(webquiz_util.kpsewhich('-var-value TEXMFMAIN'), 'doc','latex', 'webquiz')
-                        except subprocess.CalledProcessError:
-                            pass
-
-                    # if we still don't have webquiz_doc then try working backwards from webquiz.cls
-                    # unlikely to work if TEXMFMAIN doesn't
-                    if not os.path.isdir(webquiz_doc):
-                        parent = os.path.dirname
-                        try:
-                            texdist_dir = parent(parent(parent(parent(parent(webquiz_util.kpsewhich('webquiz.cls'))))))
-                        except subprocess.CalledProcessError:
-                            print(webquiz_templates.not_installed.format(metadata.repository))
-                            sys.exit(1)
-
-                        webquiz_doc = os.path.join(texdist_dir, 'doc', 'latex', 'webquiz')
-
-                    # get the root directory of the source code for developer
-                    # mode and just in case webquiz_www still does not exist
-                    webquiz_src = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
-
-                    webquiz_www = os.path.join(webquiz_doc, 'www')
-                    if not os.path.isdir(webquiz_www):
-                        webquiz_www = os.path.join(webquiz_src, 'doc', 'www')
-
-                    if developer and os.path.isdir(os.path.join(webquiz_src, 'doc')):
-                        # this is a development version so add links from the
-                        # web directory to the css,doc and js directories
-                        print('\nInstalling files for development version')
-                        print('Linking web files {} -> {} ...\n'.format(web_dir, webquiz_src))
-                        if not os.path.exists(web_dir):
-                            os.makedirs(web_dir)
-
-                        for (src, target) in [('javascript', 'js'), ('css', 'css'), ('doc', 'doc')]:
-                            newlink = os.path.join(web_dir, target)
-                            try:
-                                os.remove(newlink)
-                            except FileNotFoundError:
-                                pass
-                            try:
-                                os.symlink(os.path.join(webquiz_src,src), newlink)
-                            except OSError as err:
-                                print('There was a problem linking {}: {}'.format(newlink, err))
-
-                    else:
-                        # loop until we find some files to install or exit
-                        while not os.path.isdir(webquiz_www) or webquiz_www=='':
-                            print('\nUnable to find the WebQuiz web files')
-                            webquiz_www = input('Please enter the location of the WebQuiz www directory\nor press RETURN to exit: ')
-                            webquiz_www = os.path.expanduser(webquiz_www)
-                            if webquiz_www=='':
-                                sys.exit()
-                            if not (webquiz_www.endswith('www/') or webquiz_www.endswith('www')):
-                                print('\nThe webquiz web directory is called www, so\n  {}\ncannot be the right directory.'.format(
-                                      webquiz_www)
-                                )
-                                webquiz_www = False
-
-
-                        # the www directory exists so we copy it to web_dir
-                        print('\nCopying web files to {} ...'.format(web_dir))
-                        webquiz_util.copytree(webquiz_www, web_dir)
-
-                    self['webquiz_www'] = web_dir
-                    files_copied = True
-
-                except PermissionError:
-                    print(webquiz_templates.permission_error.format(web_dir))
-
-                except OSError as err:
-                    print(webquiz_templates.oserror_copying.format(web_dir=web_dir, err=err))
-
-        if self['webquiz_www']!='SMS':
-            # now prompt for the relative url
-            webquiz_url = input(webquiz_templates.webquiz_url_message.format(self['webquiz_url']))
-            if webquiz_url != '':
-                # removing trailing slashes from webquiz_url
-                while webquiz_url[-1] == '/':
-                    webquiz_url = webquiz_url[:len(webquiz_url) - 1]
-
-                if webquiz_url[0] != '/':  # force URL to start with /
-                    webquiz_url = '/' + webquiz_url
-
-                if not web_dir.endswith(webquiz_url):
-                    print(webquiz_templates.webquiz_url_warning)
-                    input('Press RETURN to continue... ')
-
-                self['webquiz_url'] = webquiz_url
-
-        # save the settings and exit
-        self.write_webquizrc()
-        print(webquiz_templates.initialise_ending.format(web_dir=self['webquiz_www']))
-
-    def edit_settings(self):
-        r'''
-        Change current default values for the WebQuiz settings
-        '''
-        advanced_not_started = True
-        for key in self.keys():
-            if key not in ['webquiz_www', 'version']:
-                if advanced_not_started and self.settings[key]['advanced']:
-                    print(webquiz_templates.advanced_settings)
-                    advanced_not_started = False
-
-                skey = '{}'.format(self[key])
-                setting = input('{}{}[{}]: '.format(
-                                    self.settings[key]['help'],
-                                    ' ' if len(skey)<40 else '\n',
-                                    skey
-                          )
-                ).strip()
-                if setting != '':
-                    if key == 'webquiz_url' and setting[0] != '/':
-                        print("  ** prepending '/' to webquiz_url **")
-                        setting = '/' + setting
-
-                    elif key == 'webquiz_layout':
-                        setting = os.path.expanduser(setting)
-                        if setting.endswith('.py'):
-                            print("  ** removing .py extension from webquiz_layout **")
-                            setting = setting[:-3]
-
-                    elif key == 'engine' and setting not in self.settings['engine'].values:
-                        print('setting not changed: {} is not a valid TeX engine'.format(setting))
-                        setting = self['engine']
-
-                    elif key in ['hide_side_menu', 'random_order']:
-                        setting = setting.lower()
-                        if setting not in ['true', 'false']:
-                            print('setting not changed: {} must be True or False'.format(key))
-                            setting = self[key]
-
-                    elif setting=='NONE':
-                        setting = ''
-
-                    self[key] = setting
-
-        # save the settings, print them and exit
-        self.write_webquizrc()
-        self.list_settings()
-
-    def tex_install(self):
-        r'''
-        Install the tex files into the standard locations in TEXMFMAIN:
-            scripts -> TEXMFMAIN/scripts/webquiz
-            doc     -> TEXMFMAIN/doc/latex/webquiz
-            latex   -> TEXMFMAIN/tex/latex/webquiz
-        It is assumed that this is run from the zipfile installation. There
-        is little in the way of error checking or debugging.
-
-        Undocumented feature - useful for debugging initialisation routine
-        '''
-        webquiz_top = os.path.abspath(webquiz_util.webquiz_file('..'))
-        texmf = webquiz_util.kpsewhich('-var-value TEXMFMAIN')
-        for (src, target) in [('scripts', 'scripts'),
-                         ('latex', 'tex/latex'),
-                         ('doc', 'doc/latex')]:
-            try:
-                webquiz_util.copytree(os.path.join(webquiz_top,src), os.path.join(texmf, target, 'webquiz'))
+    options.run = webquiz_trace.traced_command(options.run)
 
-            except (FileExistsError,FileNotFoundError):
-                continue
+    if options.quiet < 2:
+        options.talk = lambda msg: print(msg)
+    else:
+        options.talk = lambda msg: None
 
-            except PermissionError as err:
-                print(webquiz_templates.insufficient_permissions.format(err))
-                sys.exit(1)
 
+def make_quiz(options, settings, quiz_file, record=True):
+    r'''
+    Make the web page for `quiz_file`, preprocessing with pst2pdf when
+    necessary, and then clean up the auxiliary files that are created.
+    Return a report on making the quiz, which is also added to
+    `quiz_reports` if `record` is `True`. The report is a dictionary that gives the quiz file,
+    its status, which is 'made', 'up to date' or 'failed', the phase of
+    making the quiz that failed and the error message, if the quiz failed,
+    and the time taken. When there is an error webquiz exits unless
+    --keep-going is used, in which case the error is printed and webquiz
+    goes on to the next quiz.
+    '''
+    report = dict(quiz=quiz_file, status='failed', phase=None, message=None, seconds=0)
+    if record:
+        quiz_reports.append(report)
+    start = time.time()
+    with webquiz_trace.span('make quiz', quiz_file=quiz_file):
         try:
+            report['status'] = make_one_quiz(options, settings, quiz_file, report)
 
-            # add a link to webquiz.py
-            texbin = os.path.dirname(webquiz_util.shell_command('which pdflatex').split()[-1])
-            os.symlink(os.path.join(texmf,'scripts','webquiz','webquiz.py'), os.path.join(texbin, 'webquiz'))
-            subprocess.call('mktexlsr', shell=True)
-
-        except (FileExistsError,FileNotFoundError):
-            pass
-
-        except PermissionError as err:
-            print(webquiz_templates.insufficient_permissions.format(err))
-            sys.exit(1)
-
-        except subprocess.CalledProcessError as err:
-            print('There was a problem running mktexlsr')
-            sys.exit(1)
-
-    def tex_uninstall(self):
-        r'''
-        UnInstall the tex files into TEXMFMAIN. It is assumed that the files
-        are installed in the natural locations in the TEXMFMAIN tree, namely:
-            scripts -> TEXMFMAIN/scripts/webquiz
-            doc     -> TEXMFMAIN/doc/latex/webquiz
-            latex   -> TEXMFMAIN/tex/latex/webquiz
-        There is little in the way of error checking or debugging.
-
-        Undocumented feature - useful for debugging initialisation routine
-        '''
-        webquiz_top = os.path.abspath(webquiz_util.webquiz_file('..'))
-        texmf = webquiz_util.kpsewhich('-var-value TEXMFMAIN')
-        for target in ['scripts', 'tex/latex', 'doc/latex']:
-            try:
-                shutil.rmtree(os.path.join(texmf, target, 'webquiz'))
-
-            except (FileExistsError,FileNotFoundError):
-                pass
+        except webquiz_util.WebQuizError as err:
+            report.update(phase=err.phase,
+                          message=err.message if err.err is None else '{}: {}'.format(err.message, err.err))
+            if not options.keep_going:
+                webquiz_util.webquiz_error(settings.debugging, err.message, err.err)
+            webquiz_util.print_error(err.message, err.err)
 
-            except PermissionError as err:
-                print(webquiz_templates.insufficient_permissions.format(err))
-                sys.exit(1)
-
-        try:
-            # remove link from texbin to webquiz.py
-            texbin = os.path.dirname(webquiz_util.shell_command('which pdflatex').split()[-1])
-            os.remove(os.path.join(texbin, 'webquiz'))
+        except Exception as err:
+            if not options.keep_going:
+                raise
+            report.update(phase=getattr(err, 'phase', None), message='{}: {}'.format(type(err).__name__, err))
+            webquiz_util.print_error('unknown problem making {}'.format(quiz_file), err)
 
-        except (FileExistsError,FileNotFoundError):
-            pass
+        finally:
+            report['seconds'] = round(time.time() - start, 3)
 
-        except PermissionError as err:
-            print(webquiz_templates.insufficient_permissions.format(err))
-            sys.exit(1)
+    return report
 
-        # remove any rcfiles that exist in obvious places
-        try:
-            if os.path.isfile(self.system_rcfile):
-                os.remove(self.system_rcfile)
-            if os.path.isfile(self.user_rcfile):
-                os.remove(self.user_rcfile)
-            if os.path.isfile(self.rcfile):
-                os.remove(self.rcfile)
-        except PermissionError:
-            print(webquiz_templates.insufficient_permissions.format(err))
-            sys.exit(1)
-
-        # remove link to webquiz.py
-        texbin = os.path.dirname(webquiz_util.shell_command('which pdflatex').split()[-1])
-        webquiz = os.path.join(texbin,'webquiz')
+def make_one_quiz(options, settings, quiz_file, report):
+    r'''
+    Make the web page for `quiz_file` and return the status of the quiz:
+    see `make_quiz`. If the quiz file cannot be read then this is recorded
+    in `report`.
+    '''
+    import webquiz_api
+    import webquiz_cache
+    import webquiz_makequiz
+
+    if len(options.quiz_file) > 1 and options.quiet < 3:
+        print('Making web page for {}'.format(quiz_file))
+    # quiz_file is assumed to be a tex file if no extension is given
+    if not '.' in quiz_file:
+        quiz_file += '.tex'
+
+    if not os.path.isfile(quiz_file):
+        print('WebQuiz error: cannot read file {}'.format(quiz_file))
+        report.update(phase='read quiz file', message='cannot read file {}'.format(quiz_file))
+        return 'failed'
+
+    # skip the quiz if it is unchanged since it was last made
+    with webquiz_trace.phase('check build cache'):
+        build_cache = webquiz_cache.BuildCache(quiz_file, options, settings, metadata)
+        up_to_date = not options.force and build_cache.up_to_date()
+    if up_to_date:
+        if options.quiet < 2:
+            print('WebQuiz: {} is up to date'.format(quiz_file))
+        return 'up to date'
+
+    # the quiz name and the quiz_file will be if pst2pdf is used
+    quiz_name = quiz_file
+    if options.quiet < 2:
+        print('WebQuiz generating web page for {}'.format(quiz_file))
+
+    # If the pst2podf option is used then we need to preprocess
+    # the latex file BEFORE passing it to MakeWebQuiz. Set
+    # options.pst2pdf = True if pst2pdf is given as an option to
+    # the webquiz documentclass
+    options.pst2pdf = quiz_file.endswith('.tex') and webquiz_api.uses_pst2pdf(quiz_file)
+    if options.pst2pdf:
+        with webquiz_trace.phase('pst2pdf'):
+            preprocess_with_pst2pdf(options, quiz_file[:-4])
+        # now run webquiz on the modified tex file
+        quiz_file = quiz_file[:-4] + '-pdf-fixed.tex'
+
+    # the file exists and is readable so make the quiz
+    quiz = webquiz_makequiz.MakeWebQuiz(quiz_name, quiz_file, options, settings, metadata)
+    if options.optimise_images:
+        report['image_bytes_saved'] = quiz.image_bytes_saved
+
+    quiz_name = quiz_name[:quiz_name.index('.')]  # remove the extension
+
+    with webquiz_trace.phase('clean up'):
+        # move the css file into the directory for the quiz
+        css_file = os.path.join(quiz_name, quiz_name + '.css')
+        if os.path.isfile(quiz_name + '.css'):
+            if os.path.isfile(css_file):
+                os.remove(css_file)
+            shutil.move(quiz_name + '.css', css_file)
+
+        # now clean up unless debugging
+        if not options.debugging:
+            for ext in ['4ct', '4tc', 'dvi', 'idv', 'lg', 'log',
+                'ps', 'pdf', 'tmp', 'xml', 'xref'
+            ]:
+                if os.path.isfile(quiz_name + '.' + ext):
+                    os.remove(quiz_name + '.' + ext)
+
+            # files created when using pst2pdf
+            if options.pst2pdf:
+                for file in glob.glob(quiz_name + '-pdf.*'):
+                    os.remove(file)
+                for file in glob.glob(quiz_name + '-pdf-fixed.*'):
+                    os.remove(file)
+                for extention in ['.preamble', '.plog', '-tmp.tex',
+                        '-pst.tex', '-fig.tex'
+                ]:
+                    if os.path.isfile(quiz_name + extention):
+                        os.remove(quiz_name + extention)
+                if os.path.isdir(os.path.join(quiz_name, quiz_name)):
+                    shutil.rmtree(os.path.join(quiz_name, quiz_name))
+
+    # record the build so that the quiz is not rebuilt unless it changes
+    with webquiz_trace.phase('save build cache'):
+        build_cache.save()
+
+    return 'made'
+
+
+def make_quiz_in_worker(quiz_file, force=None):
+    r'''
+    Make a quiz inside one of the worker processes used by --jobs and
+    --serve. The worker processes are forked from the main process so they
+    inherit `options` and `settings`. All of the output for the quiz is
+    collected and returned to the main process, together with the exit
+    status, the time taken, the trace and memory records and the report on
+    making the quiz, so that the output for each quiz is printed together.
+    If `force` is not `None` then it overrides --force.
+    '''
+    webquiz_trace.start_worker()
+    if force is not None:
+        options.force = force
+    # errors are reported to the main process, which decides whether to stop
+    options.keep_going = True
+    start = time.time()
+    output = io.StringIO()
+    status = 0
+    report = dict(quiz=quiz_file, status='failed', phase=None, message=None, seconds=0)
+    with contextlib.redirect_stdout(output):
+        set_run_and_talk(options, capture=True)
         try:
-            target = os.readlink(webquiz)
-            if target==os.path.join(texmf,'scripts','webquiz','webquiz.py'):
-                os.remove(webquiz)
+            # the report is returned rather than recorded because the
+            # workers for --serve make quizzes until the server stops
+            report = make_quiz(options, settings, quiz_file, record=False)
+            if report['status'] == 'failed':
+                status = 1
 
-        except (FileExistsError,FileNotFoundError):
-            pass
+        except SystemExit as err:
+            # webquiz_error() exits after printing the error message
+            status = err.code if isinstance(err.code, int) else 1
+            report['message'] = 'webquiz exited with status {}'.format(err.code)
 
-        except OSError as err:
-            print('There was a problem removing the link to webquiz: {}'.format(err))
+        except Exception as err:
+            status = 1
+            report['message'] = '{}: {}'.format(type(err).__name__, err)
+            print('WebQuiz error: {}\n{}'.format(err, traceback.format_exc()))
 
-    def uninstall_webquiz(self):
-        r'''
-        Remove all of the webquiz files from the webserver
-        '''
+    return (output.getvalue(), status, time.time() - start, webquiz_trace.worker_records(), report)
 
-        if os.path.isdir(self['webquiz_www']):
-            remove = input('Do you really want to remove the WebQuiz from your web server [N/yes]? ')
-            if remove != 'yes':
-                print('WebQuiz unistall aborted!')
-                return
 
+def make_quizzes_in_parallel(options, settings, quiz_files):
+    r'''
+    Make the quizzes in `quiz_files` using a pool of `options.jobs` worker
+    processes. The output for each quiz is printed when the quiz is finished,
+    followed by a summary of the time taken to make each quiz. A quiz that
+    fails does not stop the other quizzes from being made. Return the
+    reports on making the quizzes, which are also added to `quiz_reports`.
+    '''
+    import concurrent.futures
+    import multiprocessing
+
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        print('WebQuiz: --jobs is not supported on this platform so the quizzes will be made one at a time')
+        return [make_quiz(options, settings, quiz_file) for quiz_file in quiz_files]
+
+    jobs = options.jobs if options.jobs > 0 else os.cpu_count()
+    # the workers already run in parallel, so make4ht converts the images
+    # for each quiz using one process unless WEBQUIZ_IMAGE_JOBS is set
+    os.environ.setdefault('WEBQUIZ_IMAGE_JOBS', '1')
+    start = time.time()
+    reports = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs,
+                    mp_context=multiprocessing.get_context('fork')) as pool:
+        quizzes = {pool.submit(make_quiz_in_worker, quiz_file): quiz_file for quiz_file in quiz_files}
+        for quiz in concurrent.futures.as_completed(quizzes):
             try:
-                shutil.rmtree(self['webquiz_www'])
-                print('WebQuiz files successfully removed from {}'.format(self['webquiz_www']))
-
-            except PermissionError as err:
-                print(webquiz_templates.insufficient_permissions.format(err))
-                sys.exit(1)
-
-            except OSError as err:
-                self.webquiz_error('There was a problem removing webquiz files from {}'.format(self['webquiz_www']), err)
-
-            # now reset and save the locations of the webquiz files and URL
-            self['webquiz_url'] = ''
-            self['webquiz_www'] = ''
-            self.write_webquizrc()
-
-        else:
-            self.webquiz_error('uninstall: no webwquiz files are installed on your web server??')
-
-        for rfile in ['system', 'user']:
-            rcfile = getattr(self, rfile+'_rcfile')
-            if os.path.isfile(rcfile):
-                rm = input('Remove {} rcfile {}\n[Y/no] '.format(rfile, rcfile))
-                if rm != 'no':
-                    try:
-                        os.remove(rcfile)
-                    except (OSError, PermissionError) as err:
-                        self.webquiz_error('There was a problem deleting {}'.format(rcfile), err)
+                output, status, seconds, records, report = quiz.result()
+            except Exception as err:
+                # the worker process died
+                output, records = 'WebQuiz error: {}\n'.format(err), None
+                report = dict(quiz=quizzes[quiz], status='failed', phase='worker',
+                              message='{}: {}'.format(type(err).__name__, err), seconds=0)
+
+            webquiz_trace.add_worker_records(records)
+            sys.stdout.write(output)
+            sys.stdout.flush()
+            reports[quizzes[quiz]] = report
+
+    reports = [reports[quiz_file] for quiz_file in quiz_files]
+    quiz_reports.extend(reports)
+    print_summary(options, reports, jobs, time.time()-start)
+    return reports
+
+def print_summary(options, reports, jobs, seconds):
+    r'''
+    Print a summary of the time taken to make each quiz in `reports`, using
+    `jobs` jobs, and of the quizzes that failed
+    '''
+    if options.quiet < 3:
+        failures = len([report for report in reports if report['status'] == 'failed'])
+        width = max(len(report['quiz']) for report in reports)
+        dash = '-'*max(50, width+20)
+        print('{dash}\nWebQuiz made {} quizzes using {} job{} in {:.1f}s{}\n{dash}'.format(
+                len(reports), jobs, '' if jobs == 1 else 's', seconds,
+                ': {} failed'.format(failures) if failures>0 else '',
+                dash=dash)
+        )
+        for report in reports:
+            print('  {:<{width}}  {:>7.1f}s  {}'.format(
+                    report['quiz'], report['seconds'],
+                    'ok' if report['status'] != 'failed'
+                    else 'FAILED ({})'.format(report['phase']) if report['phase'] else 'FAILED',
+                    width=width)
+            )
+        print(dash)
 
+def write_report(filename, reports, seconds):
+    r'''
+    Write the reports on making the quizzes to `filename` as json, together
+    with the number of quizzes that were made, were up to date and failed
+    and, when --optimise-images is used, the bytes saved by optimising the images
+    '''
+    statuses = collections.Counter(report['status'] for report in reports)
+    summary = dict(quizzes=len(reports),
+                   made=statuses['made'],
+                   up_to_date=statuses['up to date'],
+                   failed=statuses['failed'],
+                   seconds=round(seconds, 3))
+    if any('image_bytes_saved' in report for report in reports):
+        summary['image_bytes_saved'] = sum(report.get('image_bytes_saved', 0) for report in reports)
+    try:
+        with open(filename, 'w') as report_file:
+            json.dump(dict(summary, reports=reports), report_file, indent=2)
+    except OSError as err:
+        print('WebQuiz: unable to write the report {}: {}'.format(filename, err))
 
-# =====================================================
 if __name__ == '__main__':
     try:
-        settings = WebQuizSettings()
-
         # parse the command line options
         parser = argparse.ArgumentParser(description=metadata.description)
 
@@ -805,6 +417,75 @@ if __name__ == '__main__':
             default=0,
             help='Suppress tex4ht messages (also -qq etc)')
 
+        parser.add_argument(
+            '-j',
+            '--jobs',
+            action='store',
+            type=int,
+            default=1,
+            metavar='N',
+            help='Make N quizzes at the same time (0 = number of CPUs)')
+
+        parser.add_argument(
+            '-f',
+            '--force',
+            action='store_true',
+            default=False,
+            help='Make the quizzes even if they are unchanged')
+
+        parser.add_argument(
+            '-k',
+            '--keep-going',
+            action='store_true',
+            default=False,
+            help='Keep making the other quizzes when a quiz fails')
+
+        parser.add_argument(
+            '--report',
+            action='store',
+            default=None,
+            metavar='FILE',
+            help='Write a json report on making each quiz to FILE')
+
+        parser.add_argument(
+            '-w',
+            '--watch',
+            action='store_true',
+            default=False,
+            help='Rebuild the quizzes when they change and preview them in a web browser')
+
+        parser.add_argument(
+            '--port',
+            action='store',
+            type=int,
+            default=8000,
+            help='Port for the web server used by --watch (default 8000)')
+
+        parser.add_argument(
+            '--serve',
+            action='store',
+            nargs='?',
+            const='8100',
+            default=None,
+            metavar='ADDRESS',
+            help='Run a build server on a localhost port or a unix socket (default port 8100)')
+
+        parser.add_argument(
+            '--trace',
+            action='store',
+            default=None,
+            metavar='FILE',
+            help='Write a Chrome trace of the time spent making the quizzes to FILE')
+
+        parser.add_argument(
+            '--memory-report',
+            action='store',
+            nargs='?',
+            const='webquiz-memory.json',
+            default=None,
+            metavar='FILE',
+            help='Report the memory used when making the quizzes and save it to FILE (default webquiz-memory.json)')
+
         parser.add_argument(
             '-d', '--draft',
             action='store_true',
@@ -823,7 +504,7 @@ if __name__ == '__main__':
             '--latex',
             action='store_const',
             const='latex',
-            default=settings['engine'],
+            default=None,
             dest='engine',
             help='Use latex to compile document with make4ht (default)')
         engine.add_argument(
@@ -841,6 +522,32 @@ if __name__ == '__main__':
             dest='engine',
             help='Use xelatex to compile the quiz')
 
+        parser.add_argument(
+            '--optimise-images',
+            action='store_true',
+            default=False,
+            help='Losslessly compress the png images and minify the svg images in the quizzes')
+
+        parser.add_argument(
+            '--responsive-images',
+            action='store_true',
+            default=False,
+            help='Add smaller and webp copies of the png and jpeg images using picture and srcset')
+
+        parser.add_argument(
+            '--no-format',
+            action='store_false',
+            default=True,
+            dest='use_format',
+            help='Do not use a precompiled format for the webquiz preamble')
+
+        parser.add_argument(
+            '--xml-backend',
+            action='store',
+            choices=['auto', 'expat', 'etree', 'lxml', 'sax'],
+            default='auto',
+            help='xml parser used to read the quiz (default: lxml if installed, otherwise expat)')
+
         parser.add_argument(
             '-r',
             '--rcfile',
@@ -883,7 +590,7 @@ if __name__ == '__main__':
             action='store',
             type=str,
             dest='make4ht_options',
-            default=settings['make4ht'],
+            default=None,
             help=argparse.SUPPRESS
         )
 
@@ -892,7 +599,7 @@ if __name__ == '__main__':
             action='store',
             type=str,
             dest='webquiz_layout',
-            default=settings['webquiz_layout'],
+            default=None,
             help=argparse.SUPPRESS
         )
 
@@ -918,8 +625,8 @@ if __name__ == '__main__':
 
         parser.add_argument(
             '--version',
-            action='version',
-            version='%(prog)s version {}'.format(metadata.version),
+            action='store_true',
+            default=False,
             help=argparse.SUPPRESS)
 
         parser.add_argument(
@@ -939,14 +646,29 @@ if __name__ == '__main__':
         options = parser.parse_args()
         options.prog = parser.prog
 
-        # set debugging mode from options
-        settings.debugging = options.debugging
+        # print the version and exit, without reading the settings
+        if options.version:
+            print('{} version {}'.format(parser.prog, metadata.version))
+            sys.exit()
+
+        # read the settings from the system and user webquizrc files
+        settings = webquiz_settings.WebQuizSettings()
 
         # read the rcfile and throw an error if we are not adjusting the settings
         if options.rcfile is not None:
             rcfile = os.path.expanduser(options.rcfile)
             settings.read_webquizrc(rcfile)
 
+        # the options that default to the settings
+        for option, setting in [('engine', 'engine'),
+                                ('make4ht_options', 'make4ht'),
+                                ('webquiz_layout', 'webquiz_layout')]:
+            if getattr(options, option) is None:
+                setattr(options, option, settings[setting])
+
+        # set debugging mode from options
+        settings.debugging = options.debugging
+
         if options.uninstall:
             # uninstall web files and exit
             settings.uninstall_webquiz()
@@ -984,108 +706,89 @@ if __name__ == '__main__':
             sys.exit()
 
         # if no filename then exit
-        if options.quiz_file==[]:
+        if options.quiz_file==[] and options.serve is None:
             if settings.have_initialised:
                 sys.exit()
             else:
                 parser.print_help()
                 sys.exit(1)
 
+        # the settings used to make the quizzes, which cannot be changed from now on
+        settings = settings.freeze()
+
+        # the modules for making quizzes: make_one_quiz() and
+        # make_quizzes_in_parallel() import the modules that they use
+        import webquiz_api
+        import webquiz_format
+        import webquiz_makequiz
+        import webquiz_serve
+        import webquiz_watch
+
         # import the local page formatter
-        mod_dir, mod_layout = os.path.split(options.webquiz_layout)
-        if mod_dir != '':
-            sys.path.insert(0, mod_dir)
-        options.write_web_page = __import__(mod_layout).write_web_page
-
-        # run() is a shorthand for executing system commands depending on the quietness
-        #       - we need to use shell=True because otherwise pst2pdf gives an error
-        # options.talk() is a shorthand for letting the user know what is happening
-        if options.quiet == 0:
-            options.run = lambda cmd: subprocess.call(cmd, shell=True)
-            options.talk = lambda msg: print(msg)
-        elif options.quiet == 1:
-            options.run  = lambda cmd: subprocess.call(cmd, shell=True, stdout=open(os.devnull, 'wb'))
-            options.talk = lambda msg: print(msg)
-        else:
-            options.run  = lambda cmd: subprocess.call(cmd, shell=True, stdout=open(os.devnull, 'wb'), stderr=open(os.devnull, 'wb'))
-            options.talk = lambda msg: None
+        layout = webquiz_api.load_layout(options.webquiz_layout)
+        # layouts that only define write_web_page are written in one piece
+        options.stream_web_page = getattr(layout, 'stream_web_page', None)
+        options.write_web_page = getattr(layout, 'write_web_page', None)
 
-        # run through the list of quizzes and make them
-        for quiz_file in options.quiz_file:
-            if len(options.quiz_file) > 1 and options.quiet < 3:
-                print('Making web page for {}'.format(quiz_file))
-            # quiz_file is assumed to be a tex file if no extension is given
-            if not '.' in quiz_file:
-                quiz_file += '.tex'
+        # record the time spent in each phase of making the quizzes
+        if options.trace is not None:
+            webquiz_trace.start_tracing()
+        if options.memory_report is not None:
+            webquiz_trace.start_memory_report()
 
-            if not os.path.isfile(quiz_file):
-                print('WebQuiz error: cannot read file {}'.format(quiz_file))
+        # set the options.run() and options.talk() short-cuts
+        set_run_and_talk(options)
 
+        start = time.time()
+        try:
+            # use a precompiled format for the webquiz preamble when making tex files
+            options.tex_format = None
+            if options.use_format and (options.serve is not None
+                                       or any(not '.' in quiz_file or quiz_file.endswith('.tex')
+                                              for quiz_file in options.quiz_file)):
+                with webquiz_trace.span('tex format'):
+                    options.tex_format = webquiz_format.tex_format(options.engine, options.talk)
+
+            # make quizzes on demand, in worker processes that are forked
+            # from this process
+            if options.serve is not None:
+                webquiz_serve.serve(options, settings, make_quiz_in_worker)
+                sys.exit()
+
+            # make the quizzes and then rebuild them whenever they change
+            if options.watch:
+                webquiz_watch.watch_quizzes(options, settings, make_quiz)
+                sys.exit()
+
+            # run through the list of quizzes and make them, using a pool of
+            # worker processes if --jobs is bigger than 1
+            if options.jobs != 1 and len(options.quiz_file) > 1:
+                with webquiz_trace.span('make quizzes', jobs=options.jobs):
+                    make_quizzes_in_parallel(options, settings, options.quiz_file)
             else:
+                for quiz_file in options.quiz_file:
+                    make_quiz(options, settings, quiz_file)
+                if options.keep_going and len(options.quiz_file) > 1:
+                    print_summary(options, quiz_reports, 1, time.time()-start)
 
-                # the quiz name and the quiz_file will be if pst2pdf is used
-                quiz_name = quiz_file
-                if options.quiet < 2:
-                    print('WebQuiz generating web page for {}'.format(quiz_file))
-
-                # If the pst2podf option is used then we need to preprocess
-                # the latex file BEFORE passing it to MakeWebQuiz. Set
-                # options.pst2pdf = True if pst2pdf is given as an option to
-                # the webquiz documentclass
-                with codecs.open(quiz_file, 'r', encoding='utf8') as q_file:
-                    doc = q_file.read()
-
-                options.pst2pdf = False
-                try:
-                    brac = doc.index(r'\documentclass[') + 15  # start of class options
-                    if 'pst2pdf' in [
-                            opt.strip()
-                            for opt in doc[brac:brac+doc[brac:].index(']')].split(',')
-                    ]:
-                        preprocess_with_pst2pdf(options, quiz_file[:-4])
-                        options.pst2pdf = True
-                        # now run webquiz on the modified tex file
-                        quiz_file = quiz_file[:-4] + '-pdf-fixed.tex'
-                except ValueError:
-                    pass
-
-                # the file exists and is readable so make the quiz
-                webquiz_makequiz.MakeWebQuiz(quiz_name, quiz_file, options, settings, metadata)
-
-                quiz_name = quiz_name[:quiz_name.index('.')]  # remove the extension
-
-                # move the css file into the directory for the quiz
-                css_file = os.path.join(quiz_name, quiz_name + '.css')
-                if os.path.isfile(quiz_name + '.css'):
-                    if os.path.isfile(css_file):
-                        os.remove(css_file)
-                    shutil.move(quiz_name + '.css', css_file)
-
-                # now clean up unless debugging
-                if not options.debugging:
-                    for ext in ['4ct', '4tc', 'dvi', 'idv', 'lg', 'log',
-                        'ps', 'pdf', 'tmp', 'xml', 'xref'
-                    ]:
-                        if os.path.isfile(quiz_name + '.' + ext):
-                            os.remove(quiz_name + '.' + ext)
-
-                    # files created when using pst2pdf
-                    if options.pst2pdf:
-                        for file in glob.glob(quiz_name + '-pdf.*'):
-                            os.remove(file)
-                        for file in glob.glob(quiz_name + '-pdf-fixed.*'):
-                            os.remove(file)
-                        for extention in ['.preamble', '.plog', '-tmp.tex',
-                                '-pst.tex', '-fig.tex'
-                        ]:
-                            if os.path.isfile(quiz_name + extention):
-                                os.remove(quiz_name + extention)
-                        if os.path.isdir(os.path.join(quiz_name, quiz_name)):
-                            shutil.rmtree(os.path.join(quiz_name, quiz_name))
+            if any(report['status'] == 'failed' for report in quiz_reports):
+                sys.exit(1)
+
+        finally:
+            if options.report is not None:
+                write_report(options.report, quiz_reports, time.time()-start)
+            if options.trace is not None:
+                webquiz_trace.write_trace(options.trace)
+            if options.memory_report is not None:
+                webquiz_trace.write_memory_report(options.memory_report)
 
         if settings.initialise_warning != '':
             print(webquiz_templates.text_initialise_warning)
 
+    except webquiz_util.WebQuizError as err:
+        webquiz_util.webquiz_error(settings.debugging if 'settings' in globals() else True,
+            err.message, err.err)
+
     except Exception as err:
 
         # there is a small chance that there is an error before we the
@@ -0,0 +1,289 @@
+r'''
+-----------------------------------------------------------------------------
+    webquiz_api | make quizzes from python programs, without using the
+                | webquiz command line
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+
+    The functions in this module make quizzes without changing the current
+    directory and without exiting when there is a problem, so they can be
+    used by other programs, such as a web service that makes quizzes in a
+    pool of threads. For example:
+
+        import webquiz_api
+        result = webquiz_api.build_quiz('/courses/maths/quiz1.tex', '/var/www/maths')
+        print(result.web_page, result.files)
+
+    The quiz can be a latex file, the xml file for a quiz or a quiz that has
+    already been read using webquiz_xml.ReadWebQuizXmlFile. Errors are raised
+    as webquiz_util.WebQuizError. Unlike the webquiz command, the quizzes are
+    always made, rather than checking whether they are up to date, and the
+    output from make4ht is returned in the result rather than printed.
+'''
+
+# -*- encoding: utf-8 -*-
+
+import argparse
+import codecs
+import importlib
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# imports of webquiz code
+import webquiz_format
+import webquiz_makequiz
+import webquiz_settings
+import webquiz_trace
+import webquiz_util
+
+# the auxiliary files that make4ht creates, which are removed after the quiz is made
+auxiliary_extensions = ['4ct', '4tc', 'dvi', 'idv', 'lg', 'log', 'ps', 'pdf', 'tmp', 'xml', 'xref']
+
+# the settings used when build_quiz is not given any, which are read when they are first needed
+default_settings = None
+settings_lock = threading.Lock()
+
+# make4ht writes its files next to the latex file, so each latex file is
+# only made by one thread at a time
+source_locks = {}
+
+def source_lock(quiz_file):
+    r'''
+    Return the lock for making the latex file `quiz_file`
+    '''
+    with settings_lock:
+        return source_locks.setdefault(quiz_file, threading.Lock())
+
+def read_settings(rcfile=None):
+    r'''
+    Return the settings from the system and user webquizrc files, which are
+    only read once, as webquiz_settings.QuizSettings. If `rcfile` is given
+    then the settings in this webquizrc file override these settings.
+    '''
+    global default_settings
+    with settings_lock:
+        if default_settings is None:
+            default_settings = webquiz_settings.WebQuizSettings().freeze(debugging=False)
+    if rcfile is None:
+        return default_settings
+    return default_settings.override('rcfile', **webquiz_settings.read_rcfile(rcfile))
+
+def load_layout(webquiz_layout):
+    r'''
+    Return the layout module `webquiz_layout`, which is either the name of a
+    module or a path to one without the .py extension. The layout must
+    define stream_web_page or write_web_page.
+    '''
+    mod_dir, mod_layout = os.path.split(webquiz_layout)
+    if mod_dir != '' and mod_dir not in sys.path:
+        sys.path.insert(0, mod_dir)
+    try:
+        layout = importlib.import_module(mod_layout)
+    except ImportError as err:
+        raise webquiz_util.WebQuizError('unable to import the webquiz layout {}'.format(webquiz_layout), err)
+
+    if getattr(layout, 'stream_web_page', None) is None and getattr(layout, 'write_web_page', None) is None:
+        raise webquiz_util.WebQuizError(
+            'the webquiz layout {} does not define write_web_page or stream_web_page'.format(webquiz_layout))
+    return layout
+
+def uses_pst2pdf(quiz_file):
+    r'''
+    Return `True` if pst2pdf is an option of the webquiz documentclass in the
+    latex file `quiz_file`
+    '''
+    with codecs.open(quiz_file, 'r', encoding='utf8') as q_file:
+        doc = q_file.read()
+
+    try:
+        brac = doc.index(r'\documentclass[') + 15  # start of class options
+        return 'pst2pdf' in [opt.strip() for opt in doc[brac:brac+doc[brac:].index(']')].split(',')]
+    except ValueError:
+        return False
+
+def quiz_options(settings, log, **options):
+    r'''
+    Return the options for making a quiz, which are the defaults for the
+    webquiz command line options updated by `options`. The output of the
+    commands that are run, and the progress messages, are appended to the
+    list `log`.
+    '''
+    quiz_options = argparse.Namespace(
+        debugging=settings.debugging,
+        draft=False,
+        engine=settings['engine'],
+        make4ht_options=settings['make4ht'],
+        optimise_images=False,
+        quiet=0,
+        responsive_images=False,
+        shell_escape=False,
+        use_format=True,
+        webquiz_layout=settings['webquiz_layout'],
+        xml_backend='auto',
+    )
+    for option in options:
+        if not hasattr(quiz_options, option):
+            raise webquiz_util.WebQuizError('unknown option {}'.format(option))
+        setattr(quiz_options, option, options[option])
+
+    def run(cmd, **kwargs):
+        with tempfile.TemporaryFile() as output:
+            returncode = webquiz_trace.call(cmd, **kwargs,
+                stdin=subprocess.DEVNULL,
+                stdout=output if quiz_options.quiet == 0 else subprocess.DEVNULL,
+                stderr=subprocess.STDOUT if quiz_options.quiet == 0
+                       else output if quiz_options.quiet == 1
+                       else subprocess.DEVNULL
+            )
+            output.seek(0)
+            log.append(output.read().decode('utf8', errors='replace'))
+        return returncode
+
+    quiz_options.run = webquiz_trace.traced_command(run)
+    quiz_options.talk = lambda msg: log.append(msg + '\n')
+
+    layout = load_layout(quiz_options.webquiz_layout)
+    quiz_options.stream_web_page = getattr(layout, 'stream_web_page', None)
+    quiz_options.write_web_page = getattr(layout, 'write_web_page', None)
+    return quiz_options
+
+
+class QuizResult(object):
+    r'''
+    The result of making a quiz. The attributes are:
+        quiz_name         the name of the quiz
+        web_page          the path to the web page for the quiz
+        quiz_directory    the directory with the css, javascript and images for the quiz
+        files             the files that were written
+        title             the title of the quiz
+        number_questions  the number of questions in the quiz
+        log               the output from making the quiz
+        seconds           the time taken to make the quiz
+        image_bytes_saved the bytes saved by the optimise_images option
+    '''
+
+    def __init__(self, quiz, output_directory, log, seconds):
+        self.quiz_name = quiz.quiz_name
+        self.web_page = os.path.join(output_directory, quiz.quiz_name + '.html')
+        self.quiz_directory = quiz.quiz_directory
+        self.title = quiz.quiz.title
+        self.number_questions = quiz.number_questions
+        self.log = ''.join(log)
+        self.seconds = seconds
+        self.image_bytes_saved = quiz.image_bytes_saved
+
+        self.files = [self.web_page]
+        if quiz.quiz.quiz_index != []:
+            self.files.append(os.path.join(output_directory, 'quizindex.js'))
+        for (directory, subdirs, files) in os.walk(self.quiz_directory):
+            self.files.extend(os.path.join(directory, file) for file in sorted(files))
+
+    def __repr__(self):
+        return 'QuizResult({})'.format(self.web_page)
+
+
+def build_quiz(source, output_directory=None, settings=None, quiz_name=None, **options):
+    r'''
+    Make the web page for the quiz `source` in `output_directory` and return
+    a QuizResult. The `source` is one of:
+        - the path to a latex file, which is processed by make4ht in its own
+          directory, where the auxiliary files are created and removed
+        - the path to the xml file for a quiz
+        - a quiz read using webquiz_xml.ReadWebQuizXmlFile, in which case
+          `quiz_name` must be given
+    The output directory defaults to the directory containing `source`.
+    If `settings` is not given then the settings in the webquizrc files are
+    used; different settings can be given using read_settings() and
+    QuizSettings.override(). The keyword arguments set the options for
+    making the quiz, which are the webquiz command line options: draft,
+    engine, make4ht_options, optimise_images, quiet, responsive_images,
+    shell_escape, use_format, webquiz_layout and xml_backend. Errors are raised as
+    webquiz_util.WebQuizError.
+    '''
+    start = time.time()
+    if settings is None:
+        settings = read_settings()
+    elif isinstance(settings, webquiz_settings.WebQuizSettings):
+        settings = settings.freeze()
+
+    log = []
+    options = quiz_options(settings, log, **options)
+    if options.debugging != settings.debugging:
+        settings = settings.override('options', debugging=options.debugging)
+    metadata = webquiz_settings.metadata
+
+    if isinstance(source, str):
+        quiz_file = os.path.abspath(source)
+        # quiz_file is assumed to be a tex file if no extension is given
+        if not '.' in os.path.basename(quiz_file):
+            quiz_file += '.tex'
+        if not os.path.isfile(quiz_file):
+            raise webquiz_util.WebQuizError('cannot read file {}'.format(quiz_file))
+
+        directory, quiz_file = os.path.split(quiz_file)
+        quiz_name, extension = os.path.splitext(quiz_file)
+        if extension not in ['.tex', '.xml']:
+            raise webquiz_util.WebQuizError('{} is not a latex or xml file'.format(quiz_file))
+        if extension == '.tex' and uses_pst2pdf(os.path.join(directory, quiz_file)):
+            raise webquiz_util.WebQuizError('the pst2pdf option is only supported by the webquiz command')
+        quiz = None
+
+    else:
+        if quiz_name is None:
+            raise webquiz_util.WebQuizError('quiz_name must be given when making a quiz from an xml quiz')
+        if output_directory is None:
+            raise webquiz_util.WebQuizError('output_directory must be given when making a quiz from an xml quiz')
+        directory = output_directory
+        quiz_file = quiz_name + '.xml'
+        quiz = source
+
+    output_directory = directory if output_directory is None else os.path.abspath(output_directory)
+    try:
+        os.makedirs(output_directory, exist_ok=True)
+    except OSError as err:
+        raise webquiz_util.WebQuizError('unable to create the directory {}'.format(output_directory), err)
+
+    # use a precompiled format for the webquiz preamble when making tex files
+    options.tex_format = None
+    if quiz is None and quiz_file.endswith('.tex') and options.use_format:
+        options.tex_format = webquiz_format.tex_format(options.engine, options.talk)
+
+    with webquiz_trace.span('make quiz', quiz_file=quiz_file), source_lock(os.path.join(directory, quiz_file)):
+        try:
+            made_quiz = webquiz_makequiz.MakeWebQuiz(quiz_name, quiz_file, options, settings, metadata,
+                                                     directory=directory,
+                                                     output_directory=output_directory,
+                                                     quiz=quiz)
+        finally:
+            if quiz is None and quiz_file.endswith('.tex') and not options.debugging:
+                remove_auxiliary_files(directory, quiz_name, output_directory)
+
+    return QuizResult(made_quiz, output_directory, log, time.time() - start)
+
+def remove_auxiliary_files(directory, quiz_name, output_directory):
+    r'''
+    Remove the auxiliary files that make4ht created for `quiz_name` in
+    `directory`. When the web page is written to a different directory the
+    html file made by make4ht, which is the xml for the quiz, and the css
+    file are removed too.
+    '''
+    extensions = list(auxiliary_extensions)
+    if os.path.realpath(directory) != os.path.realpath(output_directory):
+        extensions += ['html', 'css']
+    for ext in extensions:
+        aux_file = os.path.join(directory, quiz_name + '.' + ext)
+        if os.path.isfile(aux_file):
+            os.remove(aux_file)
@@ -0,0 +1,222 @@
+r'''
+-----------------------------------------------------------------------------
+    webquiz_cache | build cache that allows webquiz to skip unchanged quizzes
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+'''
+
+# -*- encoding: utf-8 -*-
+
+import codecs
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+
+# imports of webquiz code
+import webquiz_util
+
+# latex commands that pull in other files: \input, \include and \includegraphics
+tex_inputs = re.compile(r'\\(input|includegraphics|include)(?![A-Za-z@])\s*(?:\[[^\]]*\])?\s*(?:\{([^}]*)\}|([^\s{}\\%]+))')
+# extensions to try when a file is included without one
+input_extensions = {
+    'input': ['', '.tex'],
+    'include': ['.tex'],
+    'includegraphics': ['', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.pdf', '.eps', '.ps'],
+}
+# the files from the webquiz latex installation that are used to build every quiz
+webquiz_latex_files = ['webquiz.cls', 'webquiz.cfg', 'webquiz.mk4', 'webquiz-ini.code.tex', 'webquiz.ini']
+# the python modules that are used to generate the web page for a quiz
+webquiz_python_files = ['webquiz_images.py', 'webquiz_makequiz.py', 'webquiz_templates.py', 'webquiz_util.py',
+                        'webquiz_xml.py']
+# options that change the web page that is produced
+build_options = ['engine', 'draft', 'shell_escape', 'make4ht_options', 'webquiz_layout', 'optimise_images',
+                 'responsive_images']
+
+def file_hash(filename):
+    r'''
+    Return the sha256 hash of the contents of `filename`, or `None` if the
+    file does not exist.
+    '''
+    try:
+        sha = hashlib.sha256()
+        with open(filename, 'rb') as file:
+            for block in iter(lambda: file.read(1 << 16), b''):
+                sha.update(block)
+        return sha.hexdigest()
+
+    except OSError:
+        return None
+
+def file_modified(filename):
+    r'''
+    Return the modification time and size of `filename`, or `None` if the
+    file does not exist.
+    '''
+    try:
+        stat = os.stat(filename)
+        return (stat.st_mtime, stat.st_size)
+
+    except OSError:
+        return None
+
+def tex_dependencies(tex_file, dependencies=None, hashed=True):
+    r'''
+    Return a dictionary of the files that are pulled into `tex_file` by
+    \input, \include and \includegraphics, including `tex_file` itself.
+    Files are searched for relative to the directory of `tex_file` and
+    latex files are scanned recursively. The value of each file is its hash
+    or, if `hashed` is `False`, its modification time and size, which are
+    much quicker to find. Files that cannot be found are included with value
+    `None` so that they are rebuilt when they appear.
+    '''
+    if dependencies is None:
+        dependencies = {}
+    file_key = file_hash if hashed else file_modified
+    dependencies[tex_file] = file_key(tex_file)
+    try:
+        with codecs.open(tex_file, 'r', encoding='utf8', errors='replace') as tex:
+            # remove comments, but not \%
+            source = re.sub(r'(?<!\\)%.*', '', tex.read())
+    except OSError:
+        return dependencies
+
+    directory = os.path.dirname(tex_file)
+    for (command, braced, bare) in tex_inputs.findall(source):
+        name = (braced or bare).strip()
+        if name == '' or '#' in name:
+            continue
+        for extension in input_extensions[command]:
+            dependency = os.path.join(directory, name+extension)
+            if os.path.isfile(dependency):
+                break
+        else:
+            dependency = os.path.join(directory, name)
+            dependencies[dependency] = None
+            continue
+
+        if dependency not in dependencies:
+            if command == 'includegraphics':
+                dependencies[dependency] = file_key(dependency)
+            else:
+                tex_dependencies(dependency, dependencies, hashed)
+
+    return dependencies
+
+def quiz_language(tex_file, settings):
+    r'''
+    Return the language of the quiz, which is given by the language option of
+    the webquiz document class if it is used and otherwise by the settings.
+    '''
+    try:
+        with codecs.open(tex_file, 'r', encoding='utf8', errors='replace') as tex:
+            language = re.search(r'\\documentclass\s*\[[^\]]*\blanguage\s*=\s*([A-Za-z]+)', tex.read())
+        if language is not None:
+            return language.group(1).lower()
+
+    except OSError:
+        pass
+
+    return settings['language']
+
+
+class BuildCache(object):
+    r'''
+    Record of the last build of a quiz, which is used to skip rebuilding the
+    quiz when nothing has changed. The record contains a hash of:
+        - the quiz file and all files that it pulls in using \input,
+          \include and \includegraphics
+        - the webquiz class, configuration, ini and language files
+        - the webquiz settings, version, make4ht command and the options
+          that change the web page that is produced
+        - the python modules that generate the web page
+    together with hashes of the files that the build produced. The quiz is up
+    to date if all of these hashes are unchanged. The build records are kept
+    in the builds subdirectory of the webquiz cache directory.
+    '''
+
+    def __init__(self, quiz_file, options, settings, metadata):
+        self.quiz_file = os.path.abspath(quiz_file)
+        self.quiz_name = quiz_file.split('.')[0]
+        self.record_file = os.path.join(
+            webquiz_util.cache_directory('builds'),
+            hashlib.sha1(self.quiz_file.encode('utf8')).hexdigest() + '.json'
+        )
+        self.key = self.build_key(options, settings, metadata)
+
+    def build_key(self, options, settings, metadata):
+        r'''
+        Return a hash of everything that determines the web page for the quiz
+        '''
+        key = dict(
+            dependencies=tex_dependencies(self.quiz_file),
+            settings={setting: settings[setting] for setting in settings.keys()},
+            version=metadata.version,
+            options={option: '{}'.format(getattr(options, option, '')) for option in build_options},
+            make4ht=os.environ.get('WEBQUIZ_MAKE4HT', 'make4ht'),
+            python={module: file_hash(webquiz_util.webquiz_file(module)) for module in webquiz_python_files},
+        )
+
+        # the webquiz latex files and the language file for the quiz
+        latex_files = webquiz_latex_files + ['webquiz-{}.lang'.format(quiz_language(self.quiz_file, settings))]
+        for latex_file in latex_files:
+            try:
+                key[latex_file] = file_hash(webquiz_util.kpsewhich(latex_file))
+            except subprocess.CalledProcessError:
+                key[latex_file] = None
+
+        # the module used for the page layout
+        layout = getattr(getattr(options, 'write_web_page', None), '__module__', None)
+        if layout in sys.modules and hasattr(sys.modules[layout], '__file__'):
+            key['layout'] = file_hash(sys.modules[layout].__file__)
+
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf8')).hexdigest()
+
+    def outputs(self):
+        r'''
+        Return a dictionary of the hashes of the files produced when the quiz
+        was built: the web page and the files in the quiz directory.
+        '''
+        outputs = {self.quiz_name + '.html': file_hash(self.quiz_name + '.html')}
+        for (directory, subdirs, files) in os.walk(self.quiz_name):
+            for file in files:
+                outputs[os.path.join(directory, file)] = file_hash(os.path.join(directory, file))
+        return outputs
+
+    def up_to_date(self):
+        r'''
+        Return `True` if the quiz has been built before with the same
+        dependencies and settings and the files that were built are unchanged.
+        '''
+        try:
+            with open(self.record_file, 'r') as record_file:
+                record = json.load(record_file)
+        except (OSError, ValueError):
+            return False
+
+        return (record.get('key') == self.key
+                and os.path.isdir(self.quiz_name)
+                and record.get('outputs') == self.outputs())
+
+    def save(self):
+        r'''
+        Save the build record for the quiz. Any problems writing the record
+        are ignored because the only consequence is that the quiz will be
+        rebuilt the next time that webquiz is run.
+        '''
+        try:
+            with open(self.record_file, 'w') as record_file:
+                json.dump(dict(quiz_file=self.quiz_file, key=self.key, outputs=self.outputs()), record_file)
+        except OSError:
+            pass
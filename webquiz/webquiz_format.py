@@ -0,0 +1,147 @@
+r'''
+-----------------------------------------------------------------------------
+    webquiz_format | build and manage precompiled TeX formats for webquiz
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+'''
+
+# -*- encoding: utf-8 -*-
+
+import glob
+import hashlib
+import os
+import re
+import subprocess
+import threading
+
+# imports of webquiz code
+import webquiz_util
+
+# The packages loaded by webquiz.cls that do not depend on the document class
+# or on tex4ht are dumped into the format. These include pgfkeys and pgfmath,
+# which account for most of the time spent loading the class. The class
+# itself, the packages that tex4ht patches and the tex4ht hooks in webquiz.cfg
+# cannot be dumped because make4ht loads tex4ht when \documentclass is
+# processed, so they still need to be loaded by each quiz.
+format_packages = ['etoolbox', 'pgfopts', 'xparse', 'pgffor']
+
+format_driver = r'''\RequirePackage{{{packages}}}
+\dump
+'''
+
+# the ini-mode command and base format used by each of the webquiz engines
+format_engines = dict(
+    latex=('pdftex', 'latex'),
+    lua=('luatex', 'dvilualatex'),
+    xelatex=('xetex', 'xelatex'),
+)
+
+# files whose contents determine the format
+webquiz_latex_files = ['webquiz.cls', 'webquiz.cfg', 'webquiz-ini.code.tex', 'webquiz.ini']
+
+# the engines whose format could not be built, which are not tried again
+# during this run, and a lock so that threads in this process, such as those
+# using the python API, build each format only once
+failed_engines = set()
+format_lock = threading.Lock()
+
+def format_key(engine):
+    r'''
+    Return a hash that identifies the format for `engine`. This changes
+    whenever the webquiz latex files, the dumped packages or the base format
+    for the engine change, so that the format is rebuilt automatically.
+    '''
+    binary, base = format_engines[engine]
+    key = hashlib.sha256()
+    key.update(format_driver.format(packages=','.join(format_packages)).encode('utf8'))
+    key.update(engine.encode('utf8'))
+    files = webquiz_util.kpsewhich('-engine={} {} {}.fmt {}'.format(
+                 binary,
+                 ' '.join(webquiz_latex_files),
+                 base,
+                 ' '.join(package+'.sty' for package in format_packages)
+            )).split('\n')
+    if len(files) != len(webquiz_latex_files) + len(format_packages) + 1:
+        raise FileNotFoundError('kpsewhich was unable to find all of the files for the {} format'.format(engine))
+
+    for file in files:
+        key.update(file.encode('utf8'))
+        with open(file, 'rb') as contents:
+            key.update(hashlib.sha256(contents.read()).digest())
+
+    return key.hexdigest()[:16]
+
+def tex_format(engine, talk=print):
+    r'''
+    Return the path, without the .fmt extension, of the precompiled format
+    for `engine`, building the format if it does not already exist. The
+    formats live in the formats subdirectory of the webquiz cache directory
+    and out of date formats are removed. If the format cannot be built then
+    `None` is returned and the quizzes are compiled without it.
+    '''
+    if engine in failed_engines:
+        return None
+
+    with format_lock:
+        tex_format = build_tex_format(engine, talk)
+        if tex_format is None:
+            failed_engines.add(engine)
+        return tex_format
+
+def build_tex_format(engine, talk):
+    r'''
+    Return the path of the format for `engine`, building it if necessary,
+    or `None` if the format cannot be built: see `tex_format`.
+    '''
+    try:
+        formats = webquiz_util.cache_directory('formats')
+        jobname = 'webquiz-{}-{}'.format(engine, format_key(engine))
+        tex_format = os.path.join(formats, jobname)
+        if os.path.isfile(tex_format + '.fmt'):
+            return tex_format
+
+        talk('Building the {} format for webquiz'.format(engine))
+        # build the format with a temporary name and then rename it so that
+        # concurrent webquiz processes never see a partially written format
+        driver = '{}-{}-{}'.format(jobname, os.getpid(), threading.get_ident())
+        with open(os.path.join(formats, driver + '.ltx'), 'w') as ltx:
+            ltx.write(format_driver.format(packages=','.join(format_packages)))
+        binary, base = format_engines[engine]
+        subprocess.call('{binary} -ini -interaction=batchmode -jobname={driver} "&{base}" {driver}.ltx'.format(
+                            binary=binary, base=base, driver=driver),
+                        shell=True,
+                        cwd=formats,
+                        stdin=subprocess.DEVNULL,
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL
+        )
+        if not os.path.isfile(os.path.join(formats, driver + '.fmt')):
+            talk('Unable to build the {} format. See {}.log'.format(engine, os.path.join(formats, driver)))
+            return None
+
+        os.replace(os.path.join(formats, driver + '.fmt'), tex_format + '.fmt')
+
+        # remove the files used to build the format and any out of date
+        # formats, but not the files of formats that other processes are building
+        stale_format = re.compile(r'webquiz-{}-[0-9a-f]{{16}}\.fmt$'.format(engine))
+        for file in glob.glob(os.path.join(formats, 'webquiz-{}-*'.format(engine))):
+            name = os.path.basename(file)
+            if name.startswith(driver + '.') or (stale_format.match(name) and name != jobname + '.fmt'):
+                try:
+                    os.remove(file)
+                except OSError:
+                    pass
+
+        return tex_format
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
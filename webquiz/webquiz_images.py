@@ -0,0 +1,653 @@
+r'''
+-----------------------------------------------------------------------------
+    webquiz_images | image cache shared by quizzes and rebuilds
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+
+    The images in a quiz are made by make4ht using webquiz.mk4, which keeps
+    each image that it makes in the image cache directory under a hash of
+    the page of the idv file that it comes from, so images that have not
+    changed are copied from the cache rather than being made again.
+
+    Once an image has been moved into the quiz directory it is shared with
+    the identical images in other quizzes: the image cache directory has an
+    index, which records the images in the quizzes by the hash of their
+    contents, and an image that is the same as one that is already in the
+    index is replaced with a hard link to it. This saves disk space in the
+    web directory, and when the web directory is copied using a program
+    that keeps hard links, such as rsync -H.
+
+    The images can also be optimised, using --optimise-images, before they
+    are shared. The png images are compressed again, using oxipng or optipng
+    if either is installed and otherwise by compressing their image data
+    with the best zlib compression, and their text and time chunks are
+    removed. The svg images are minified by removing comments, metadata and
+    white space, by writing coordinates with at most svg_precision decimal
+    places and by merging consecutive paths that are only stroked, unless
+    they are translucent or the second path starts with a relative move. Apart
+    from the rounding of the coordinates, which is far too small to see,
+    this does not change the images. The images are optimised in parallel
+    and the optimised images are kept in the image cache under the hash of
+    the original image, so each image is only optimised once.
+
+    With --responsive-images, smaller copies of the png and jpeg images, and
+    webp copies of them, are made using Pillow, if it is installed, and the
+    img tags for these images are replaced with picture and srcset markup
+    so that browsers on small screens download less. The img tags are also
+    given the width and height of the image, which is read from the image
+    even if Pillow is not installed, so that browsers can reserve the space
+    for an image before it has been loaded. The copies are also kept in the
+    image cache.
+
+    The image cache is the images subdirectory of the webquiz cache
+    directory. This can be changed by setting the environment variable
+    WEBQUIZ_IMAGE_CACHE, and the image cache is not used if this is empty.
+'''
+
+# -*- encoding: utf-8 -*-
+
+import concurrent.futures
+import contextlib
+import filecmp
+import hashlib
+import io
+import os
+import re
+import shutil
+import struct
+import subprocess
+import tempfile
+import time
+import xml.etree.ElementTree as ElementTree
+import zlib
+
+try:
+    import PIL.Image
+except ImportError:
+    PIL = None
+
+# imports of webquiz code
+import webquiz_cache
+import webquiz_util
+
+# the version of the image optimisation, which is part of the key of the
+# optimised images in the cache, so it must change when the optimisation does
+optimisation_version = '2'
+
+# the png chunks that are removed because they do not change the image
+png_metadata_chunks = {b'tEXt', b'zTXt', b'iTXt', b'tIME'}
+png_signature = b'\x89PNG\r\n\x1a\n'
+
+# the png optimisers that are used if they are installed, in order of preference
+png_optimisers = dict(
+    oxipng=['oxipng', '--quiet', '--opt', '2', '--strip', 'safe', '--out', '{output}', '{input}'],
+    optipng=['optipng', '-quiet', '-o2', '-strip', 'all', '-out', '{output}', '{input}'],
+)
+
+# the number of decimal places used for svg coordinates
+svg_precision = 3
+svg_namespace = 'http://www.w3.org/2000/svg'
+xlink_namespace = 'http://www.w3.org/1999/xlink'
+# attributes whose numbers are coordinates, which are rounded
+svg_coordinates = {'d', 'points', 'x', 'y', 'x1', 'y1', 'x2', 'y2', 'cx', 'cy', 'r', 'rx', 'ry',
+                   'width', 'height', 'viewBox', 'stroke-width'}
+# elements whose text is part of the image
+svg_text_elements = {'text', 'tspan', 'textPath', 'style', 'script', 'title', 'desc'}
+# the attributes of a path that stop it being merged with the next path
+svg_unmergeable = {'id', 'style', 'class', 'opacity', 'stroke-opacity', 'marker-start', 'marker-mid',
+                   'marker-end', 'clip-path', 'mask', 'filter'}
+# the attributes of an element that stop the paths inside it being merged,
+# because the overlaps of merged paths are only painted once
+svg_translucent = {'opacity', 'stroke-opacity', 'filter'}
+svg_translucent_style = re.compile(r'opacity|filter')
+svg_translucent_colour = re.compile(r'rgba|hsla|transparent|#(?:[0-9a-fA-F]{4}|[0-9a-fA-F]{8})\b')
+# the widths, in pixels, of the smaller copies of the raster images that are
+# made for --responsive-images, and the version of these copies in the cache
+responsive_widths = [480, 960, 1440]
+variants_version = '1'
+img_attribute = re.compile(r'([-:\w]+)="([^"]*)"')
+
+svg_number = re.compile(r'-?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?')
+
+def image_cache():
+    r'''
+    Return the image cache directory, creating it if necessary, or `None`
+    if the image cache is not used or cannot be created.
+    '''
+    directory = os.environ.get('WEBQUIZ_IMAGE_CACHE')
+    if directory == '':
+        return None
+    try:
+        if directory is None:
+            return webquiz_util.cache_directory('images')
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    except OSError:
+        return None
+
+@contextlib.contextmanager
+def index_lock(index, timeout=10, stale=60):
+    r'''
+    Lock the index file `index`, using a lock file, so that webquiz processes
+    that share images at the same time, such as those used by --jobs, do not
+    lose each other's changes to the index. A lock file that is older than
+    `stale` seconds was left by a process that died, so it is removed. If
+    the index cannot be locked within `timeout` seconds then it is used
+    without the lock, which at worst loses an entry from the index.
+    '''
+    lock = index + '.lock'
+    start = time.time()
+    while True:
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) > stale:
+                    os.remove(lock)
+                    continue
+            except OSError:
+                continue
+            if time.time() - start > timeout:
+                lock = None
+                break
+            time.sleep(0.01)
+
+        except OSError:
+            lock = None
+            break
+
+    try:
+        yield
+
+    finally:
+        if lock is not None:
+            try:
+                os.remove(lock)
+            except OSError:
+                pass
+
+def share_image(image, cache):
+    r'''
+    Replace `image` with a hard link to an identical image in another quiz,
+    using the index in the image cache directory `cache`, and add `image` to
+    the index. Return the number of bytes that are saved, which is zero if
+    there is no identical image or if it is on a different file system.
+    '''
+    digest = webquiz_cache.file_hash(image)
+    if digest is None:
+        return 0
+
+    image = os.path.abspath(image)
+    index = os.path.join(cache, 'index', digest[:2], digest)
+    try:
+        os.makedirs(os.path.dirname(index), exist_ok=True)
+    except OSError:
+        return 0
+
+    with index_lock(index):
+        return share_indexed_image(image, index)
+
+def share_indexed_image(image, index):
+    r'''
+    Share `image` using the locked `index` file of the images with the same
+    contents: see `share_image`.
+    '''
+    try:
+        with open(index, 'r', encoding='utf8') as index_file:
+            paths = [path for path in index_file.read().split('\n') if path != '']
+    except OSError:
+        paths = []
+
+    # images that have been removed are dropped from the index
+    indexed = [path for path in paths if os.path.isfile(path)]
+
+    saved = 0
+    for path in indexed:
+        if path == image:
+            continue
+        link = '{}.{}.link'.format(image, os.getpid())
+        try:
+            if os.path.samefile(path, image):
+                break
+            if filecmp.cmp(path, image, shallow=False):
+                os.link(path, link)
+                os.replace(link, image)
+                saved = os.path.getsize(image)
+                break
+
+        except OSError:
+            if os.path.lexists(link):
+                os.remove(link)
+
+    if image not in indexed:
+        indexed.append(image)
+    if indexed != paths:
+        try:
+            with open(index + '.{}'.format(os.getpid()), 'w', encoding='utf8') as index_file:
+                index_file.write(''.join(path + '\n' for path in indexed))
+            os.replace(index + '.{}'.format(os.getpid()), index)
+        except OSError:
+            pass
+
+    return saved
+
+def share_images(images, cache=None):
+    r'''
+    Share the files in the list `images` with the identical images in other
+    quizzes, using share_image(), and return the number of images that are
+    shared and the number of bytes that are saved.
+    '''
+    if cache is None:
+        cache = image_cache()
+    shared = saved = 0
+    if cache is not None:
+        for image in images:
+            size = share_image(image, cache)
+            if size > 0:
+                shared += 1
+                saved += size
+    return shared, saved
+
+def png_optimiser():
+    r'''
+    Return the name of the png optimiser that is used, which is the first
+    of png_optimisers that is installed, or 'zlib'.
+    '''
+    for optimiser in png_optimisers:
+        if shutil.which(optimiser) is not None:
+            return optimiser
+    return 'zlib'
+
+def png_chunk(kind, body):
+    r'''
+    Return the png chunk of type `kind` with contents `body`
+    '''
+    return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+def optimise_png(data):
+    r'''
+    Return the png image `data` with its image data compressed using the
+    best zlib compression, in one IDAT chunk, and without the chunks in
+    png_metadata_chunks. If `data` is not a png image that can be read
+    then it is returned unchanged.
+    '''
+    if not data.startswith(png_signature):
+        return data
+
+    chunks, idat = [], []
+    position = len(png_signature)
+    while position + 12 <= len(data):
+        length, kind = struct.unpack('>I4s', data[position:position+8])
+        body = data[position+8:position+8+length]
+        position += 12 + length
+        if kind == b'IDAT':
+            if idat == []:
+                chunks.append((kind, None))
+            idat.append(body)
+        elif kind not in png_metadata_chunks:
+            chunks.append((kind, body))
+        if kind == b'IEND':
+            break
+
+    try:
+        image = zlib.decompress(b''.join(idat))
+    except zlib.error:
+        return data
+
+    # the filtered strategy is often better for the rows of a png image
+    compressed = []
+    for strategy in [zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED]:
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        compressed.append(compressor.compress(image) + compressor.flush())
+    compressed = min(compressed, key=len)
+
+    return png_signature + b''.join(png_chunk(kind, compressed if body is None else body)
+                                    for (kind, body) in chunks)
+
+def run_png_optimiser(optimiser, data):
+    r'''
+    Return the png image `data` optimised using the program `optimiser`, or
+    `data` if this does not work.
+    '''
+    with tempfile.TemporaryDirectory(prefix='webquiz-png-') as directory:
+        original = os.path.join(directory, 'original.png')
+        optimised = os.path.join(directory, 'optimised.png')
+        with open(original, 'wb') as png:
+            png.write(data)
+        command = [argument.format(input=original, output=optimised) for argument in png_optimisers[optimiser]]
+        try:
+            subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+            with open(optimised, 'rb') as png:
+                return png.read()
+        except (OSError, subprocess.CalledProcessError):
+            return data
+
+def short_number(match):
+    r'''
+    Return the number in `match` with at most svg_precision decimal places,
+    and without trailing zeros or a leading zero, if this is shorter
+    '''
+    try:
+        number = '{:.{}f}'.format(float(match.group()), svg_precision)
+    except ValueError:
+        return match.group()
+    number = number.rstrip('0').rstrip('.')
+    if number in ['-0', '']:
+        number = '0'
+    elif number.startswith('0.'):
+        number = number[1:]
+    elif number.startswith('-0.'):
+        number = '-' + number[2:]
+    return number if len(number) < len(match.group()) else match.group()
+
+def mergeable_path(path, fill):
+    r'''
+    Return `True` if `path` is a path that is only stroked, when it inherits
+    the fill `fill`, which has none of the svg_unmergeable attributes and
+    whose data starts with an absolute moveto, so that it does not depend
+    on where the previous path ends
+    '''
+    return (isinstance(path.tag, str) and path.tag.split('}')[-1] == 'path' and len(path) == 0
+            and path.get('fill', fill) == 'none' and not svg_unmergeable.intersection(path.attrib)
+            and path.get('d', '').lstrip().startswith('M'))
+
+def translucent_element(element):
+    r'''
+    Return `True` if `element` sets an opacity or a filter, which apply to
+    the paths inside it as a group, or a stroke colour that is translucent
+    '''
+    return (not svg_translucent.isdisjoint(element.attrib)
+            or svg_translucent_style.search(element.get('style', '')) is not None
+            or svg_translucent_colour.search(element.get('stroke', '')) is not None)
+
+def minify_svg_element(element, fill, translucent=False):
+    r'''
+    Minify the svg `element` and its children, where `fill` is the fill that
+    the element inherits from its parent. The paths are not merged if
+    `translucent` is `True`, when an ancestor sets an opacity or a filter.
+    '''
+    tag = element.tag.split('}')[-1]
+    fill = element.get('fill', fill)
+    translucent = translucent or translucent_element(element)
+    if tag not in svg_text_elements and element.text is not None and element.text.strip() == '':
+        element.text = None
+
+    for attribute, value in element.attrib.items():
+        if attribute in svg_coordinates:
+            element.set(attribute, svg_number.sub(short_number, value))
+
+    previous = None
+    for child in list(element):
+        # comments, processing instructions and metadata are removed
+        if not isinstance(child.tag, str) or child.tag.split('}')[-1] == 'metadata':
+            element.remove(child)
+            continue
+        if tag not in svg_text_elements and child.tail is not None and child.tail.strip() == '':
+            child.tail = None
+        minify_svg_element(child, fill, translucent)
+
+        # consecutive paths that are only stroked, and which have the same
+        # attributes, are drawn in the same way as one path
+        if (translucent or not mergeable_path(child, fill) or translucent_element(child)
+                or child.tail is not None):
+            previous = None
+        elif (previous is not None and {key: value for key, value in child.attrib.items() if key != 'd'}
+                  == {key: value for key, value in previous.attrib.items() if key != 'd'}):
+            previous.set('d', previous.get('d', '') + ' ' + child.get('d', ''))
+            element.remove(child)
+        else:
+            previous = child
+
+def minify_svg(data):
+    r'''
+    Return the svg image `data` minified, or `data` if it cannot be read
+    '''
+    ElementTree.register_namespace('', svg_namespace)
+    ElementTree.register_namespace('xlink', xlink_namespace)
+    try:
+        svg = ElementTree.fromstring(data)
+    except ElementTree.ParseError:
+        return data
+    # a style sheet could make the paths translucent
+    minify_svg_element(svg, None, svg.find('.//{{{}}}style'.format(svg_namespace)) is not None)
+    # ElementTree escapes > in text and attributes, so this only changes empty elements
+    return ElementTree.tostring(svg, encoding='utf-8').replace(b' />', b'/>')
+
+def write_cached_file(cached, data):
+    r'''
+    Write `data` to the file `cached` in the image cache, using a temporary
+    file so that other processes never read a partly written file
+    '''
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        with open(cached + '.{}'.format(os.getpid()), 'wb') as cached_file:
+            cached_file.write(data)
+        os.replace(cached + '.{}'.format(os.getpid()), cached)
+    except OSError:
+        pass
+
+def optimise_image(image, cache, optimiser):
+    r'''
+    Optimise the image file `image`, using `optimiser` for png images, and
+    return its size before and after it was optimised. The optimised image
+    is only used if it is smaller. When `cache` is not `None` the optimised
+    image is kept in the cache directory `cache`, under the hash of the
+    original image.
+    '''
+    with open(image, 'rb') as image_file:
+        data = image_file.read()
+
+    extension = os.path.splitext(image)[1].lower()
+    key = hashlib.sha256(data + '\0{}\0{}'.format(optimisation_version, optimiser).encode('utf8')).hexdigest()
+    cached = None if cache is None else os.path.join(cache, 'optimised', key[:2], key + extension)
+
+    # an empty file in the cache means that the image cannot be made smaller
+    optimised = None
+    if cached is not None and os.path.isfile(cached):
+        with open(cached, 'rb') as cached_file:
+            optimised = cached_file.read() or data
+
+    if optimised is None:
+        if extension == '.png':
+            optimised = optimise_png(data) if optimiser == 'zlib' else run_png_optimiser(optimiser, data)
+        else:
+            optimised = minify_svg(data)
+        if len(optimised) >= len(data):
+            optimised = data
+        if cached is not None:
+            write_cached_file(cached, optimised if optimised is not data else b'')
+
+    if len(optimised) < len(data):
+        with open(image + '.optimised', 'wb') as image_file:
+            image_file.write(optimised)
+        os.replace(image + '.optimised', image)
+    return len(data), len(optimised)
+
+def optimise_images(images, cache=None):
+    r'''
+    Optimise the png and svg files in the list `images`, using at most
+    WEBQUIZ_IMAGE_JOBS threads at the same time (default: one for each CPU),
+    and return the total size of these images before and after they were
+    optimised. The other images are not changed.
+    '''
+    if cache is None:
+        cache = image_cache()
+    images = [image for image in images if os.path.splitext(image)[1].lower() in ['.png', '.svg']]
+    if images == []:
+        return 0, 0
+
+    optimiser = png_optimiser()
+    try:
+        jobs = max(1, int(os.environ.get('WEBQUIZ_IMAGE_JOBS', '')))
+    except ValueError:
+        jobs = os.cpu_count() or 1
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(jobs, len(images))) as pool:
+        sizes = list(pool.map(lambda image: optimise_image(image, cache, optimiser), images))
+    return sum(size[0] for size in sizes), sum(size[1] for size in sizes)
+
+def image_size(image):
+    r'''
+    Return the width and height, in pixels, of the png, jpeg or gif file
+    `image`, which are read from its header, or `None` if they cannot be
+    read.
+    '''
+    try:
+        with open(image, 'rb') as image_file:
+            header = image_file.read(26)
+            if header.startswith(png_signature) and header[12:16] == b'IHDR':
+                return struct.unpack('>II', header[16:24])
+            if header[:6] in [b'GIF87a', b'GIF89a']:
+                return struct.unpack('<HH', header[6:10])
+            if header[:2] != b'\xff\xd8':
+                return None
+
+            # the size of a jpeg is in its start of frame segment
+            image_file.seek(2)
+            while True:
+                marker = image_file.read(4)
+                if len(marker) < 4 or marker[0] != 0xff:
+                    return None
+                length = struct.unpack('>H', marker[2:])[0]
+                if 0xc0 <= marker[1] <= 0xcf and marker[1] not in [0xc4, 0xc8, 0xcc]:
+                    height, width = struct.unpack('>xHH', image_file.read(5))
+                    return width, height
+                image_file.seek(length - 2, os.SEEK_CUR)
+
+    except (OSError, struct.error):
+        return None
+
+def resized_image(data, width, extension):
+    r'''
+    Return the image `data` resized to `width` pixels wide, keeping its
+    aspect ratio, and saved in the format given by `extension`, which is
+    .webp, .png or .jpg. Raises OSError if Pillow cannot read the image.
+    '''
+    with PIL.Image.open(io.BytesIO(data)) as image:
+        lossless = image.format == 'PNG'
+        if width < image.width:
+            image = image.resize((width, max(1, round(image.height*width/image.width))), PIL.Image.LANCZOS)
+        if extension == '.jpg' and image.mode not in ['RGB', 'L']:
+            image = image.convert('RGB')
+        elif image.mode not in ['RGB', 'RGBA', 'L', 'LA']:
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        output = io.BytesIO()
+        if extension == '.webp':
+            image.save(output, 'WEBP', lossless=lossless, quality=80, method=4)
+        elif extension == '.png':
+            image.save(output, 'PNG', optimize=True)
+        else:
+            image.save(output, 'JPEG', quality=85, optimize=True, progressive=True)
+        return output.getvalue()
+
+def image_variants(image, directory, cache=None):
+    r'''
+    Write the responsive variants of the raster image `image` into
+    `directory`: copies that are responsive_widths pixels wide, for the
+    widths that are smaller than the image, in its own format and as webp,
+    and a webp copy of the full image. Return the width and height of the
+    image, the list of (file name, width) for the copies in the same format
+    and the list of (file name, width) for the webp copies, where the file
+    names are relative to `directory`. The file names contain the start of
+    the hash of the image, so images with the same name in different
+    directories have different variants. Only the size is returned if Pillow
+    is not installed, or if the image cannot be read. The variants are kept
+    in the image cache, under the hash of the image, so they are only made
+    once.
+    '''
+    size = image_size(image)
+    if size is None or PIL is None:
+        return size, [], []
+
+    if cache is None:
+        cache = image_cache()
+    stem, extension = os.path.splitext(os.path.basename(image))
+    extension = '.jpg' if extension.lower() in ['.jpg', '.jpeg'] else '.png'
+    with open(image, 'rb') as image_file:
+        data = image_file.read()
+    digest = hashlib.sha256(data).hexdigest()
+
+    variants = [(width, extension) for width in responsive_widths if width < size[0]]
+    variants = [(width, '.webp') for (width, ext) in variants] + variants + [(size[0], '.webp')]
+    sources, webp = [], []
+    try:
+        for (width, ext) in variants:
+            name = '{}-{}{}{}'.format(stem, digest[:8], '' if width == size[0] else '-{}w'.format(width), ext)
+            key = hashlib.sha256('{}\0{}\0{}\0{}'.format(digest, variants_version, width, ext).encode('utf8')).hexdigest()
+            cached = None if cache is None else os.path.join(cache, 'variants', key[:2], key + ext)
+            if cached is not None and os.path.isfile(cached):
+                with open(cached, 'rb') as cached_file:
+                    variant = cached_file.read()
+            else:
+                variant = resized_image(data, width, ext)
+                if cached is not None:
+                    write_cached_file(cached, variant)
+
+            # a webp copy of the full image is only used if it is smaller
+            if width == size[0] and len(variant) >= len(data):
+                continue
+            # the old variant may be a hard link to a variant in another quiz,
+            # made by share_images(), so it is replaced rather than overwritten
+            path = os.path.join(directory, name)
+            with open(path + '.{}'.format(os.getpid()), 'wb') as variant_file:
+                variant_file.write(variant)
+            os.replace(path + '.{}'.format(os.getpid()), path)
+            (webp if ext == '.webp' else sources).append((name, width))
+
+    except (OSError, ValueError):
+        return size, [], []
+
+    return size, sources, webp
+
+def picture_markup(tag, src, size, sources, webp, prefix):
+    r'''
+    Return the markup for the img `tag`, whose image `src` is `size[0]` by
+    `size[1]` pixels, using the variants `sources` and `webp` returned by
+    image_variants(), whose urls start with `prefix`. The img is given a
+    width and height, so that the browser can reserve space for it, and a
+    srcset of the smaller copies of the image. When there are webp copies
+    the img is put inside a picture, which offers these first.
+    '''
+    attributes = dict(img_attribute.findall(tag))
+    style = attributes.get('style', '')
+    width, height = attributes.get('width'), attributes.get('height')
+    if re.search(r'(^|;)\s*(width|height)\s*:', style) is None:
+        try:
+            if width is None and height is None:
+                width, height = size
+            elif width is None:
+                width = round(float(height)*size[0]/size[1])
+            elif height is None:
+                height = round(float(width)*size[1]/size[0])
+        except (ValueError, ZeroDivisionError):
+            pass
+
+    extra = ''
+    if 'width' not in attributes and width is not None:
+        extra += ' width="{}"'.format(width)
+    if 'height' not in attributes and height is not None:
+        extra += ' height="{}"'.format(height)
+
+    sizes = '{}px'.format(width) if width is not None and str(width).isdigit() and int(width) < size[0] \
+            else '(max-width: {0}px) 100vw, {0}px'.format(size[0])
+    srcset = lambda variants: ', '.join('{} {}w'.format(url, width) for (url, width) in variants)
+    if sources != []:
+        extra += ' srcset="{}" sizes="{}"'.format(srcset([(prefix + name, w) for (name, w) in sources]
+                                                          + [(src, size[0])]), sizes)
+
+    img = re.sub(r'\s*/?>$', lambda end: extra + end.group(), tag, count=1)
+    if webp == []:
+        return img
+    return '<picture><source type="image/webp" srcset="{}" sizes="{}" />{}</picture>'.format(
+                srcset([(prefix + name, w) for (name, w) in webp]), sizes, img)
@@ -31,6 +31,7 @@ from webquiz_templates import no_script
 #   quiz.javascript = javascript includes for quiz
 #   quiz.quiz_header = HTMK for quiz title and navigation arrows
 #   quiz.quiz_questions = html for quiz
+#   quiz.stream_quiz_questions() = html for quiz, generated in chunks
 #   quiz.side_menu = HTML for side menu, including navigation buttons
 #   quiz.title = web page title from \title{...} command
 #   quiz.unit_code = unit code from \UnitCode
@@ -38,18 +39,29 @@ from webquiz_templates import no_script
 #   quiz.unit_url = unit url from \UnitURL
 #   quiz.webquiz_init = javascript for initialising quiz page.
 #          This MUST appear tow<M-C-D-A>rds the end of HTML body
+#
+# A layout must define either write_web_page(quiz), which returns the web
+# page as a string, or stream_web_page(quiz), which generates the web page
+# in chunks. With stream_web_page, the questions are written to the web page
+# as they are generated, so the whole page is never held in memory.
 
-def write_web_page(quiz):
-  return quiz_page.format(
+def stream_web_page(quiz):
+  page_start, page_end = quiz_page.split('{quiz_questions}')
+  page = dict(
     title=quiz.quiz.title,  # page title
     htmlpreamble=quiz.header + quiz.javascript + quiz.css,  # header material
     breadcrumbs=quiz.breadcrumbs,  # bread crumb constructed above
     side_menu=quiz.side_menu,  # navigation menu for quiz
     quiz_header=quiz.quiz_header,  # quiz title + navigation arrows
-    quiz_questions=quiz.quiz_questions,  # html for quiz
     no_script=no_script,  # error when javascript is not enabled
     webquiz_init=quiz.webquiz_init  # parting javascript callsWebQuizInt
   )
+  yield page_start.format(**page)
+  yield from quiz.stream_quiz_questions()  # html for quiz
+  yield page_end.format(**page)
+
+def write_web_page(quiz):
+  return ''.join(stream_web_page(quiz))
 
 
 quiz_page = r'''<!DOCTYPE HTML>
@@ -21,10 +21,43 @@ import shutil
 import os
 import re
 
+import webquiz_images
 import webquiz_templates
+import webquiz_trace
 import webquiz_util
 import webquiz_xml
 
+# the language files that have been read, indexed by their filename and
+# modification time, which are shared by the quizzes made by this process
+language_files = {}
+
+def read_language(language):
+    r'''
+    Return the MetaData for the webquiz language file for `language`, which
+    is only read if it has not already been read by this process. Raises
+    subprocess.CalledProcessError if kpsewhich cannot find the language file
+    and OSError if it cannot be read.
+    '''
+    language_file = webquiz_util.kpsewhich('webquiz-{}.lang'.format(language))
+    language_key = (language_file, os.stat(language_file).st_mtime_ns)
+    if language_key not in language_files:
+        language_files[language_key] = webquiz_util.MetaData(language_file)
+    return language_files[language_key]
+
+def build_file(quiz_file, make4ht_options):
+    r'''
+    Return the make4ht option that uses the webquiz build file, webquiz.mk4,
+    which converts all of the images in a quiz together. This is not used if
+    the quiz has its own build file, `quiz_file`.mk4, if a build file is given
+    in `make4ht_options` or if kpsewhich cannot find webquiz.mk4.
+    '''
+    if os.path.isfile(quiz_file + '.mk4') or re.search(r'(^|\s)(-e|--build-file)\b', make4ht_options):
+        return ''
+    try:
+        return '-e "{}"'.format(webquiz_util.kpsewhich('webquiz.mk4'))
+    except subprocess.CalledProcessError:
+        return ''
+
 #################################################################################
 class MakeWebQuiz(object):
     """
@@ -37,59 +70,141 @@ class MakeWebQuiz(object):
       3. Spit out the html version
 
     The HTMl is constructed using the template strings in webquiz_templates
+
+    The `settings` are normally webquiz_settings.QuizSettings, which cannot be
+    changed, so quizzes can be made at the same time with different settings.
+
+    The quiz file is processed in `directory`, which is where make4ht is run,
+    and the web page and the quiz directory are written to `output_directory`,
+    which defaults to `directory`. Both default to the current directory. If
+    `quiz` is given then it is used as the quiz, instead of reading it from
+    the quiz file. Errors are raised as webquiz_util.WebQuizError.
     """
     # attributes that will form part of the generated web page
     header         = ''  # page header: title, meta data, links
     css            = ''  # css specifications
     javascript     = ''  # javascript code
-    quiz_questions = ''  # the main quiz page
+    quiz_index     = ''  # the index of the quizzes in the directory
+    discussions    = ''  # the discussions, which come before the questions
     side_menu      = ''  # the left hand quiz menu
 
-    def __init__(self, quiz_name, quiz_file, options, settings, metadata):
+    def __init__(self, quiz_name, quiz_file, options, settings, metadata,
+                 directory='', output_directory=None, quiz=None):
         self.options = options
         self.settings = settings
         self.metadata = metadata
         self.quiz_name = quiz_name.split('.')[0]
         self.quiz_file, extension = quiz_file.split('.')
+        self.directory = directory
+        self.output_directory = directory if output_directory is None else output_directory
+        self.quiz_directory = os.path.join(self.output_directory, self.quiz_name)
         self.webquiz_url = settings['webquiz_url']
         if  self.webquiz_url[-1] == '/':
             self.webquiz_url =  self.webquiz_url[:len(self.webquiz_url)-1]
 
-        # run htlatex only if quiz_file has a .tex extension
-        if extension == 'tex':
-            self.htlatex_quiz_file()
+        # images created by make4ht that need to be moved into quiz_name
+        self.images = []
+        # the number of bytes saved by --optimise-images
+        self.image_bytes_saved = 0
+        # the smaller and webp copies of the images made for --responsive-images
+        self.image_variants = []
 
-        self.read_xml_file()
+        if quiz is not None:
+            self.quiz = quiz
 
-        # use kpsewhich to fine the webquiz language file
-        try:
-            language_file = webquiz_util.kpsewhich('webquiz-{}.lang'.format(self.quiz.language))
-        except subprocess.CalledProcessError:
-            self.webquiz_error(
-                'kpsewhich is unable to find language file for "{}"'.format(self.quiz.language)
-            )
-        # read the language file and store as a dictonary
-        self.language = webquiz_util.MetaData(language_file)
+        else:
+            # run htlatex only if quiz_file has a .tex extension
+            if extension == 'tex':
+                with webquiz_trace.phase('htlatex_quiz_file'):
+                    self.htlatex_quiz_file()
+
+            with webquiz_trace.phase('read_xml_file'):
+                self.read_xml_file()
+
+            with webquiz_trace.phase('move_images'):
+                self.move_images()
+
+        # the quiz can turn on debugging, which is added as a layer of the
+        # settings for this quiz so that the settings of other quizzes are unchanged
+        if getattr(self.quiz, 'debugging', False) is True and not self.settings.debugging:
+            self.settings = self.settings.override('quiz', debugging=True)
+
+        with webquiz_trace.phase('read_language_file'):
+            self.read_language_file()
 
         # initialise number of quiz and discussion items
         self.number_discussions = len(self.quiz.discussion_list)
         self.number_questions = len(self.quiz.question_list)
 
         # build the different components of the quiz web page
-        self.add_meta_data()
-        self.add_question_javascript()
-        self.add_side_menu()
-        self.add_quiz_header_and_questions()
-        self.add_breadcrumbs()
+        for add_component in [self.add_meta_data,
+                              self.add_question_javascript,
+                              self.add_side_menu,
+                              self.add_quiz_header_and_questions,
+                              self.add_breadcrumbs]:
+            with webquiz_trace.phase(add_component.__name__):
+                add_component()
 
         # add the initialisation warning if webquiz has not been initialised
         if self.settings.initialise_warning != '':
             self.breadcrumbs = self.settings.initialise_warning + self.breadcrumbs
 
         # now write the quiz to the html file
-        with codecs.open(self.quiz_name + '.html', 'w', encoding='utf8', errors='replace') as file:
-            # write the quiz in the specified format
-            file.write(self.options.write_web_page(self))
+        with webquiz_trace.phase('write_web_page'):
+            self.write_web_page()
+
+    @property
+    def quiz_questions(self):
+        r'''
+        The html for the main part of the quiz page, as a string. This is
+        used by layouts that define write_web_page rather than stream_web_page.
+        '''
+        return ''.join(self.stream_quiz_questions())
+
+    def stream_quiz_questions(self):
+        r'''
+        Generate the html for the main part of the quiz page: the quiz index,
+        the discussions and then the questions, which are rendered one at a
+        time so that the questions never need to be held in memory together.
+        '''
+        yield self.quiz_index
+        yield self.discussions
+        question_wrapper = self.templates['question_wrapper']
+        for (qnum, quiz_question) in enumerate(self.quiz.question_list):
+            # in paged mode, the images and math in the questions after the
+            # first are only loaded when the question is shown
+            lazy = qnum > 0 and not self.quiz.one_page
+            yield question_wrapper.format(
+                    qnum=qnum + 1,
+                    lazy_start=webquiz_templates.lazy_start if lazy else '',
+                    lazy_end=webquiz_templates.lazy_end if lazy else '',
+                    question_number='{} {}. '.format(self.language.question, qnum+1)
+                                    if self.quiz.one_page else '',
+                    question=self.print_question(quiz_question, qnum + 1),
+                    feedback=self.print_feedback(quiz_question, qnum + 1)
+                )
+
+    def write_web_page(self):
+        r'''
+        Write the quiz web page using the layout. If the layout defines
+        stream_web_page then the page is written in chunks, as they are
+        generated, into a buffered file, and otherwise the page returned by
+        write_web_page is written. An incomplete page is removed if there is
+        an error.
+        '''
+        stream_web_page = getattr(self.options, 'stream_web_page', None)
+        web_page = os.path.join(self.output_directory, self.quiz_name + '.html')
+        try:
+            with codecs.open(web_page, 'w', encoding='utf8', errors='replace', buffering=1 << 16) as file:
+                if stream_web_page is None:
+                    file.write(self.options.write_web_page(self))
+                else:
+                    for chunk in stream_web_page(self):
+                        file.write(chunk)
+        except BaseException:
+            if os.path.isfile(web_page):
+                os.remove(web_page)
+            raise
 
     def webquiz_debug(self, msg):
         r'''
@@ -99,9 +214,16 @@ class MakeWebQuiz(object):
 
     def webquiz_error(self, msg, err=None):
         r'''
-            Customised eror message for the makequiz module
+            Customised eror message for the makequiz module, which is raised
+            as a WebQuizError
         '''
-        webquiz_util.webquiz_error(self.settings.debugging, 'makequiz: '+msg, err)
+        raise webquiz_util.WebQuizError('makequiz: '+msg, err)
+
+    def source_path(self, file_name):
+        r'''
+        Return the path to `file_name` in the directory where make4ht is run
+        '''
+        return os.path.join(self.directory, file_name)
 
     def add_breadcrumbs(self):
         r'''
@@ -186,70 +308,207 @@ class MakeWebQuiz(object):
         with markup specifying the different elements of the quiz page.
         '''
         # at the minimum we put a css file into a <quiz_name> subdirectory
-        if not os.path.exists(self.quiz_name):
-            os.makedirs(self.quiz_name)
+        if not os.path.exists(self.quiz_directory):
+            os.makedirs(self.quiz_directory)
 
         try:
             self.options.talk('Processing {}.tex with TeX4ht'.format(self.quiz_name))
             # there is a slightly torturous process to convert the engine
             # settings into a command line option that make4ht understands
-            cmd = 'make4ht --utf8 --config webquiz.cfg {draft} {engine} {escape} {make4ht_options} {quiz_file}.tex'.format(
+            # the precompiled format for the webquiz preamble, if available,
+            # is given to latex using the "latex options" argument of make4ht
+            # the make4ht command can be changed, for example to the stand-in
+            # in benchmarks/fake-texlive, using the WEBQUIZ_MAKE4HT environment variable
+            # unless the quiz has its own build file, webquiz.mk4 is used to
+            # convert all of the images together
+            cmd = '{make4ht} --utf8 --config webquiz.cfg {build_file} {draft} {engine} {escape} {make4ht_options} {quiz_file}.tex{tex_format}'.format(
+                make4ht=os.environ.get('WEBQUIZ_MAKE4HT', 'make4ht'),
+                build_file=build_file(self.source_path(self.quiz_file), self.options.make4ht_options),
                 draft='--mode draft' if self.options.draft else '',
                 engine=self.settings.settings['engine']['values'][self.options.engine],
                 escape='--shell-escape' if self.options.shell_escape else '',
                 make4ht_options=self.options.make4ht_options,
-                quiz_file=self.quiz_file
+                quiz_file=self.quiz_file,
+                tex_format=' "" "" "" "-fmt={}"'.format(self.options.tex_format)
+                               if getattr(self.options, 'tex_format', None) else ''
             )
-            self.options.run(cmd)
+            # webquiz.mk4 keeps the images that it makes in the image cache
+            image_cache = webquiz_images.image_cache()
+            environment = dict(os.environ, WEBQUIZ_IMAGE_CACHE='' if image_cache is None else image_cache)
+            if self.directory == '':
+                self.options.run(cmd, env=environment)
+            else:
+                self.options.run(cmd, cwd=self.directory, env=environment)
 
             # move the css file into the quiz_file subdirectory
-            if os.path.exists(self.quiz_file + '.css'):
+            if os.path.exists(self.source_path(self.quiz_file + '.css')):
                 shutil.move(
-                    self.quiz_file + '.css',
-                    os.path.join(self.quiz_name, self.quiz_name + '.css'))
-
-            # Now move any images that were created into the quiz_name
-            # subdirectory and update the links in the html file As htlatex
-            # generates an html file, we rename this as an xml file at the same
-            # time - in the cfg file, \Preamable{ext=xml} should lead to an xml
-            # file being created but this doesn't seem to work ??
+                    self.source_path(self.quiz_file + '.css'),
+                    os.path.join(self.quiz_directory, self.quiz_name + '.css'))
+
+            # The html file generated by make4ht is really the xml file for
+            # the quiz. In the cfg file, \Preamable{ext=xml} should lead to an
+            # xml file being created but this doesn't seem to work ?? The xml
+            # is streamed into the xml reader by read_xml_file(), which
+            # updates the links to the images as it goes
             try:
-                fix_img = re.compile(r'^(|.* )\b(data|src)="([-0-9a-zA-Z]*\.(?:png|svg))" (.*)$')
-                with codecs.open(self.quiz_file + '.html', 'r', encoding='utf8', errors='replace') as make4ht_file:
-                    with codecs.open(self.quiz_name + '.xml', 'w', encoding='utf8', errors='replace') as xml_file:
-                        for line in make4ht_file:
-                            match = fix_img.match(line)
-                            if match is None:
-                                xml_file.write(line)
-                            else:
-                                # update html link and move file
-                                start, src, image, rest_of_line = match.groups()
-                                xml_file.write(r'{}{}="{}/{}" {}'.format(
-                                    start, src, self.quiz_name, image, rest_of_line))
-                                shutil.move(image, os.path.join(self.quiz_name, image))
-
+                self.make4ht_file = codecs.open(self.source_path(self.quiz_file + '.html'), 'r',
+                                                encoding='utf8', errors='replace')
             except OSError as err:
-                self.webquiz_error(
-                    'there was a problem moving the image files for {}'.format(
+                self.webquiz_error('unable to read the html file generated by make4ht for {}'.format(
                         self.quiz_name), err)
 
+        except webquiz_util.WebQuizError:
+            raise
+
         except Exception as err:
             self.webquiz_error( 'something went wrong when running htlatex on {}'.format(self.quiz_file), err)
 
+    def fix_image_links(self, make4ht_file):
+        r'''
+        A generator that yields the lines of `make4ht_file`, updating the links
+        to the images created by make4ht so that they point into the quiz_name
+        subdirectory. The images are recorded in `self.images` so that they can
+        be moved into this directory once the xml has been read. With
+        --responsive-images, the img tags for raster images are replaced by
+        the markup from responsive_image(). As tex4ht splits img tags over
+        several lines, the lines of an img tag are collected before it is
+        replaced. When debugging, the xml is also written to <quiz_name>.xml.
+        '''
+        fix_img = re.compile(r'^(|.* )\b(data|src)="([-0-9a-zA-Z]*\.(?:png|svg))" (.*)$')
+        raster_img = re.compile(r'<img\b[^>]*\bsrc="([^":]+\.(?:png|jpe?g))"[^>]*>', re.IGNORECASE)
+        open_img = re.compile(r'<img\b[^>]*$', re.IGNORECASE)
+        responsive = getattr(self.options, 'responsive_images', False)
+        xml_file = codecs.open(self.source_path(self.quiz_name + '.xml'), 'w', encoding='utf8', errors='replace') \
+                        if self.options.debugging else None
+        img_lines = ''   # the lines of an img tag that is not yet closed
+        try:
+            for line in make4ht_file:
+                match = fix_img.match(line)
+                if match is not None:
+                    # update html link and remember the file
+                    start, src, image, rest_of_line = match.groups()
+                    line = r'{}{}="{}/{}" {}'.format(start, src, self.quiz_name, image, rest_of_line)
+                    self.images.append(image)
+                if responsive:
+                    line = img_lines + line
+                    if open_img.search(line) is not None:
+                        img_lines = line
+                        continue
+                    img_lines = ''
+                    line = raster_img.sub(self.responsive_image, line)
+                if xml_file is not None:
+                    xml_file.write(line)
+                yield line
+
+            # an img tag that is never closed is left alone
+            if img_lines != '':
+                if xml_file is not None:
+                    xml_file.write(img_lines)
+                yield img_lines
+
+        finally:
+            if xml_file is not None:
+                xml_file.close()
+
+    def responsive_image(self, match):
+        r'''
+        Return the markup for the img tag in `match`, for --responsive-images,
+        using the variants of its image that webquiz_images.image_variants()
+        writes into the quiz directory. These are recorded in
+        `self.image_variants`.
+        '''
+        tag, src = match.group(), match.group(1)
+        quiz_prefix = self.quiz_name + '/'
+        # the images made by make4ht are only moved into the quiz directory later
+        image = self.source_path(src[len(quiz_prefix):] if src.startswith(quiz_prefix) else src)
+        size, sources, webp = webquiz_images.image_variants(image, self.quiz_directory)
+        if size is None:
+            return tag
+        self.image_variants.extend(os.path.join(self.quiz_directory, name) for (name, width) in sources + webp)
+        return webquiz_images.picture_markup(tag, src, size, sources, webp, quiz_prefix)
+
+    def move_images(self):
+        r'''
+        Move the images created by make4ht into the quiz_name subdirectory,
+        optimise them if --optimise-images is used, and share them with the
+        identical images in other quizzes
+        '''
+        try:
+            for image in self.images:
+                # the old image may be a hard link to an image in another
+                # quiz, so it is removed rather than overwritten, which
+                # shutil.move does when the quiz directory is on a different
+                # file system
+                destination = os.path.join(self.quiz_directory, image)
+                if os.path.lexists(destination):
+                    os.remove(destination)
+                shutil.move(self.source_path(image), destination)
+
+        except OSError as err:
+            self.webquiz_error(
+                'there was a problem moving the image files for {}'.format(
+                    self.quiz_name), err)
+
+        images = [os.path.join(self.quiz_directory, image) for image in self.images]
+        if getattr(self.options, 'optimise_images', False):
+            try:
+                with webquiz_trace.phase('optimise_images'):
+                    before, after = webquiz_images.optimise_images(images)
+            except OSError as err:
+                self.webquiz_error('there was a problem optimising the images for {}'.format(self.quiz_name), err)
+
+            self.image_bytes_saved = before - after
+            if before > 0:
+                self.options.talk('Optimised the images for {}: {} bytes saved ({:.0f}%)'.format(
+                    self.quiz_name, before - after, 100*(before - after)/before))
+
+        shared, saved = webquiz_images.share_images(images + self.image_variants)
+        if shared > 0:
+            self.options.talk('Shared {} images ({} bytes) with other quizzes'.format(shared, saved))
+
     def read_xml_file(self):
         r'''
         Read in the webquiz xml file for the quiz and store the xml document
-        tree in ``self.quiz``.
+        tree in ``self.quiz``. If make4ht has just been run then its output is
+        streamed into the xml reader, otherwise the quiz file is read directly.
         '''
         try:
-            # read in the xml version of the quiz
-            if not os.path.isfile(self.quiz_name + '.xml'):
-                self.webquiz_error('{}.xml does not exist!?'.format(self.quiz_name))
-            self.quiz = webquiz_xml.ReadWebQuizXmlFile(self.quiz_name + '.xml', self.settings)
+            if hasattr(self, 'make4ht_file'):
+                with self.make4ht_file:
+                    self.quiz = webquiz_xml.ReadWebQuizXmlFile(self.fix_image_links(self.make4ht_file), self.settings,
+                                                               backend=getattr(self.options, 'xml_backend', 'auto'))
+
+            else:
+                # read in the xml version of the quiz
+                if not os.path.isfile(self.source_path(self.quiz_name + '.xml')):
+                    self.webquiz_error('{}.xml does not exist!?'.format(self.quiz_name))
+                self.quiz = webquiz_xml.ReadWebQuizXmlFile(self.source_path(self.quiz_name + '.xml'), self.settings,
+                                                           backend=getattr(self.options, 'xml_backend', 'auto'))
+
+        except webquiz_util.WebQuizError:
+            raise
+
         except Exception as err:
             self.webquiz_error('error reading the xml generated for {}. Please check your latex source.'
                 .format(self.quiz_name), err)
 
+    def read_language_file(self):
+        r'''
+        Read the language file for the quiz and store it as a dictionary in
+        ``self.language``
+        '''
+        # use kpsewhich to fine the webquiz language file and store it as a
+        # dictonary, unless it has already been read for another quiz
+        try:
+            self.language = read_language(self.quiz.language)
+        except subprocess.CalledProcessError:
+            self.webquiz_error(
+                'kpsewhich is unable to find language file for "{}"'.format(self.quiz.language)
+            )
+        except OSError as err:
+            self.webquiz_error('unable to read the language file for "{}"'.format(self.quiz.language), err)
+
     def add_meta_data(self):
         """ add the meta data for the web page to self.header """
         # meta tags`
@@ -317,9 +576,9 @@ class MakeWebQuiz(object):
         """
 
         try:
-            os.makedirs(self.quiz_name, exist_ok=True)
-            os.chmod(self.quiz_name, mode=0o755)
-            with codecs.open(os.path.join(self.quiz_name, 'wq-' + self.quiz_name + '.js'), 'w',
+            os.makedirs(self.quiz_directory, exist_ok=True)
+            os.chmod(self.quiz_directory, mode=0o755)
+            with codecs.open(os.path.join(self.quiz_directory, 'wq-' + self.quiz_name + '.js'), 'w',
                              encoding='utf8', errors='replace') as quiz_specs:
                 if self.number_discussions > 0:
                     for (i, d) in enumerate(self.quiz.discussion_list):
@@ -393,7 +652,7 @@ class MakeWebQuiz(object):
         # index for quiz
         if self.quiz.quiz_index != []:
             # add index to the web page
-            self.quiz_questions += webquiz_templates.quiz_index_div.format(
+            self.quiz_index = webquiz_templates.quiz_index_div.format(
                 title=self.quiz.title if self.quiz.title!='' else self.quiz.unit_name,
                 quiz_index='\n          '.join(
                     webquiz_templates.index_item.format(
@@ -404,7 +663,8 @@ class MakeWebQuiz(object):
                 **self.language)
             # write a javascript file for displaying the menu
             # quizmenu = the index file for the quizzes in this directory
-            with codecs.open('quizindex.js', 'w', encoding='utf8', errors='replace') as quizmenu:
+            with codecs.open(os.path.join(self.output_directory, 'quizindex.js'), 'w',
+                             encoding='utf8', errors='replace') as quizmenu:
                 quizmenu.write('var QuizTitles = [\n{titles}\n];\n'.format(
                     titles=',\n'.join("  ['{}', '{}']".format(
                              '{} {}. {}'.format(self.language['quiz'],num+1,q.title) 
@@ -421,7 +681,7 @@ class MakeWebQuiz(object):
             dnum = 0
             for d in self.quiz.discussion_list:
                 dnum += 1
-                self.quiz_questions += webquiz_templates.discussion.format(
+                self.discussions += webquiz_templates.discussion.format(
                     dnum=dnum,
                     discussion=d,
                     display='inline' if self.quiz.one_page else 'none',
@@ -429,18 +689,48 @@ class MakeWebQuiz(object):
                             if self.quiz.one_page else ''
                 )
 
-        # finally we print the questions
-        if self.quiz.question_list != []:
-            self.quiz_questions += ''.join(
-                webquiz_templates.question_wrapper.format(
-                    qnum=qnum + 1,
-                    question_number='{} {}. '.format(self.language.question, qnum+1)
-                                    if self.quiz.one_page else '',
-                    display='inline' if self.quiz.one_page else 'none',
-                    question=self.print_question(quiz_question, qnum + 1),
-                    feedback=self.print_feedback(quiz_question, qnum + 1)
-                )
-                for (qnum, quiz_question) in enumerate(self.quiz.question_list))
+        # finally the questions, which are rendered by stream_quiz_questions
+        # when the web page is written
+        self.bind_question_templates()
+
+    def bind_question_templates(self):
+        r'''
+        Compile the templates used for each question and bind the fields that
+        are the same for every question in the quiz, such as those from the
+        language file, so that only the fields that depend on the question
+        are rendered for each question.
+        '''
+        def bind(template, **constants):
+            return webquiz_templates.compiled_template(template).bind(**constants)
+
+        self.templates = dict(
+            question_wrapper=bind(webquiz_templates.question_wrapper,
+                                  display='inline' if self.quiz.one_page else 'none'),
+            question_text=bind(webquiz_templates.question_text,
+                               nextquestion='' if self.quiz.one_page
+                                 else webquiz_templates.nextquestion.format(**self.language),
+                               **self.language),
+            input_answer=bind(webquiz_templates.input_answer),
+            choice_answer=bind(webquiz_templates.choice_answer),
+            single_item=bind(webquiz_templates.single_item),
+            multiple_item=bind(webquiz_templates.multiple_item),
+            feedback_right=bind(webquiz_templates.tf_feedback_text,
+                                feedback='true',
+                                correct_answer=self.language.correct,
+                                answer2=''),
+            feedback_wrong=bind(webquiz_templates.tf_feedback_text,
+                                feedback='false',
+                                correct_answer=self.language.incorrect,
+                                answer2=self.language.try_again),
+            single_feedback=bind(webquiz_templates.single_feedback, **self.language),
+            multiple_feedback=bind(webquiz_templates.multiple_feedback, **self.language),
+            multiple_feedback_correct=bind(webquiz_templates.multiple_feedback_correct, **self.language),
+            multiple_feedback_answer=bind(webquiz_templates.multiple_feedback_answer),
+        )
+        # the feedback for correct and incorrect choices in single and multiple choice questions
+        self.single_answer = dict(true=self.language.correct, false=self.language.incorrect)
+        self.multiple_answer = dict(true=self.language.true.capitalize(),
+                                    false=self.language.false.capitalize())
 
     def print_question(self, question, qnum):
         r'''Here:
@@ -449,26 +739,24 @@ class MakeWebQuiz(object):
         '''
         if question.type == 'input':
             self.webquiz_debug('Q{}: after_text={}.'.format(qnum, question.after_text))
-            question_options = webquiz_templates.input_answer.format(
+            question_options = self.templates['input_answer'].format(
                                  size=5+len('{}'.format(question.answer)),
                                  after_text=question.after_text,
                                  qnum=qnum,
                                  answer=self.language['answer']+':' if question.prompt else ''
             )
         elif question.type in ['single', 'multiple']:
-            question_options = webquiz_templates.choice_answer.format(
+            question_options = self.templates['choice_answer'].format(
                     after_text=question.after_text,
                     choices='\n'.join(self.print_choices(qnum, question, choice)
                         for choice in range(len(question.items)))
             )
         else:
             self.webquiz_error('Unknown question type "{}" in question {}'.format(question.type, qnum))
-        return webquiz_templates.question_text.format(
+        return self.templates['question_text'].format(
             qnum=qnum,
             question_text=question.text,
-            nextquestion='' if self.quiz.one_page else webquiz_templates.nextquestion.format(**self.language),
-            question_options=question_options,
-            **self.language)
+            question_options=question_options)
 
     def print_choices(self, qnum, question, part):
         r'''
@@ -482,9 +770,9 @@ class MakeWebQuiz(object):
         choice = question.items[part]
         item = '<tr>' if question.columns == 1 or (part % question.columns) == 0 else '<td>&nbsp;</td>'
         if question.type == 'single':
-            item += webquiz_templates.single_item.format(choice=choice.symbol, qnum=qnum, text=choice.text)
+            item += self.templates['single_item'].format(choice=choice.symbol, qnum=qnum, text=choice.text)
         elif question.type == 'multiple':
-            item += webquiz_templates.multiple_item.format(
+            item += self.templates['multiple_item'].format(
                 choice=choice.symbol,
                 qnum=qnum,
                 optnum=part,
@@ -505,45 +793,39 @@ class MakeWebQuiz(object):
         answers a question.
         '''
         if question.type == 'input':
-            feedback = webquiz_templates.tf_feedback_text.format(
+            feedback = self.templates['feedback_right'].format(
                 choice=qnum,
-                feedback='true',
-                correct_answer=self.language.correct,
-                answer2='',
                 text=question.feedback_right)
-            feedback += webquiz_templates.tf_feedback_text.format(
+            feedback += self.templates['feedback_wrong'].format(
                 choice=qnum,
-                feedback='false',
-                correct_answer=self.language.incorrect,
-                answer2=self.language.try_again,
                 text=question.feedback_wrong)
         elif question.type == "single":
+            single_feedback = self.templates['single_feedback']
             feedback = '\n' + '\n'.join(
-                webquiz_templates.single_feedback.format(
+                single_feedback.format(
                     qnum=qnum,
                     part=snum + 1,
-                    correct_answer=self.language.correct if s.correct == 'true' else self.language.incorrect,
+                    correct_answer=self.single_answer['true'] if s.correct == 'true' else self.single_answer['false'],
                     alpha_choice=self.language.choice.format(s.symbol),
-                    feedback=s.feedback,
-                    **self.language)
+                    feedback=s.feedback)
                 for (snum, s) in enumerate(question.items))
         elif question.type == "multiple":
-            feedback = '\n' + '\n'.join(webquiz_templates.multiple_feedback.format(
+            multiple_feedback = self.templates['multiple_feedback']
+            multiple_feedback_answer = self.templates['multiple_feedback_answer']
+            feedback = '\n' + '\n'.join(multiple_feedback.format(
                 qnum=qnum,
                 part=snum + 1,
-                correct_answer=getattr(self.language, s.correct).capitalize(),
+                correct_answer=self.multiple_answer[s.correct],
                 feedback=s.feedback,
                 multiple_choice_opener=self.language.multiple_incorrect.
-                format(s.symbol),
-                **self.language)
+                format(s.symbol))
                 for (snum, s) in enumerate(question.items)
             )
-            feedback += webquiz_templates.multiple_feedback_correct.format(
+            feedback += self.templates['multiple_feedback_correct'].format(
                 qnum=qnum,
-                feedback='\n'.join(webquiz_templates.multiple_feedback_answer.format(
-                                        correct_answer=getattr(self.language, s.correct).capitalize(),
-                                        reason=s.feedback) for s in question.items),
-                                    **self.language)
+                feedback='\n'.join(multiple_feedback_answer.format(
+                                        correct_answer=self.multiple_answer[s.correct],
+                                        reason=s.feedback) for s in question.items))
         else:
             self.webquiz_error('Unknown question type "{}" in question {}'.format(question.type, qnum))
 
@@ -0,0 +1,442 @@
+r'''
+-----------------------------------------------------------------------------
+    webquiz_serve | build server that makes quizzes on demand using a pool
+                  | of worker processes
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+
+    The build server is started by webquiz --serve and accepts jobs over
+    http, either on a localhost port or on a unix socket. The settings,
+    layout, language files and kpsewhich results are loaded once by the
+    server and the worker processes are forked from the server, so each job
+    only pays for making the quiz. The jobs are queued and run by a fixed
+    number of worker processes. The api is:
+
+        POST /jobs             {"quiz_file": "/path/quiz.tex", "force": false}
+                               queue a job and return its id (202), or 503
+                               if the queue is full
+        GET  /jobs             the status of all of the jobs
+        GET  /jobs/<id>        the status, exit code, error and output files of a job
+        GET  /jobs/<id>/log    the output from making the quiz
+        GET  /status           the number of workers and of queued and
+                               running jobs
+
+    The job requests must be sent with Content-Type: application/json, which
+    stops web pages from submitting jobs. The unix socket can only be used by
+    the user running the server. On a port, every request must have the Host
+    localhost:<port>, or 127.0.0.1:<port>, and the header
+
+        Authorization: Bearer <token>
+
+    where the token is generated when the server starts and is written to a
+    file, which only the user running the server can read, in the webquiz
+    cache directory.
+'''
+
+# -*- encoding: utf-8 -*-
+
+import collections
+import concurrent.futures
+import hmac
+import http.server
+import json
+import multiprocessing
+import os
+import queue
+import secrets
+import signal
+import socketserver
+import threading
+import time
+
+# imports of webquiz code
+import webquiz_cache
+import webquiz_makequiz
+import webquiz_util
+
+class Job(object):
+    r'''
+    A request to make the quiz `quiz_file`
+    '''
+
+    def __init__(self, job_id, quiz_file, force):
+        self.id = job_id
+        self.quiz_file = quiz_file
+        self.force = force
+        self.status = 'queued'
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.exit_status = None
+        self.log = ''
+        self.outputs = []
+        self.error = None
+
+    def summary(self):
+        r'''
+        Return a dictionary describing the job, for the api
+        '''
+        return dict(id=self.id,
+                    quiz_file=self.quiz_file,
+                    force=self.force,
+                    status=self.status,
+                    submitted=self.submitted,
+                    started=self.started,
+                    finished=self.finished,
+                    seconds=self.finished - self.started if self.finished and self.started else None,
+                    exit_status=self.exit_status,
+                    error=self.error,
+                    outputs=self.outputs)
+
+
+def run_job(make_quiz_in_worker, quiz_file, force):
+    r'''
+    Make `quiz_file` in a worker process, using `make_quiz_in_worker(quiz_file,
+    force)`. The quiz is made in its own directory, which is where the web
+    page and the quiz directory are written. Return the output from making
+    the quiz, the exit status, the files that were made and, if the quiz
+    failed, the phase that failed and the error message.
+    '''
+    directory, quiz = os.path.split(quiz_file)
+    os.chdir(directory)
+    output, status, seconds, records, report = make_quiz_in_worker(quiz, force)
+    quiz_name = quiz.split('.')[0]
+    outputs = [os.path.join(directory, output_file) for output_file in [quiz_name + '.html', quiz_name]
+                    if os.path.exists(os.path.join(directory, output_file))]
+    error = dict(phase=report['phase'], message=report['message']) if report['status'] == 'failed' else None
+    return dict(log=output, exit_status=status, outputs=outputs, error=error)
+
+
+class BuildQueue(object):
+    r'''
+    A bounded queue of jobs that are run by a pool of `workers` worker
+    processes, which are forked from the server. At most `queue_size` jobs
+    can be waiting and the last `history` jobs are kept so that their status
+    can be reported.
+    '''
+
+    def __init__(self, make_quiz_in_worker, workers, queue_size=100, history=1000):
+        self.make_quiz_in_worker = make_quiz_in_worker
+        self.workers = workers
+        self.history = history
+        self.jobs = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.last_id = 0
+        self.waiting = queue.Queue(maxsize=queue_size)
+        self.free_workers = threading.Semaphore(workers)
+        self.pool = self.worker_pool()
+        threading.Thread(target=self.dispatch, daemon=True).start()
+
+    def worker_pool(self):
+        r'''
+        Return a new pool of worker processes. The worker processes are forked
+        straight away, rather than when the first job arrives, so that they
+        are forked before the server starts handling requests. Control-C is
+        ignored by the workers because it stops the server, which stops them.
+        '''
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers,
+                   mp_context=multiprocessing.get_context('fork'),
+                   initializer=signal.signal, initargs=(signal.SIGINT, signal.SIG_IGN))
+        pool.submit(os.getpid).result()
+        return pool
+
+    def submit(self, quiz_file, force=False):
+        r'''
+        Queue a job to make `quiz_file` and return it. Raises queue.Full if
+        there are too many jobs waiting.
+        '''
+        with self.lock:
+            self.last_id += 1
+            job = Job(str(self.last_id), quiz_file, force)
+            self.waiting.put_nowait(job)
+            self.jobs[job.id] = job
+            # forget the oldest jobs that have finished
+            while len(self.jobs) > self.history:
+                oldest = next(iter(self.jobs.values()))
+                if oldest.finished is None:
+                    break
+                del self.jobs[oldest.id]
+        return job
+
+    def dispatch(self):
+        r'''
+        Send the waiting jobs to the worker processes as they become free
+        '''
+        while True:
+            job = self.waiting.get()
+            if job is None:
+                return
+            self.free_workers.acquire()
+            with self.lock:
+                job.status = 'running'
+                job.started = time.time()
+                pool = self.pool
+            try:
+                future = pool.submit(run_job, self.make_quiz_in_worker, job.quiz_file, job.force)
+            except RuntimeError as err:
+                # the pool is broken or has been shut down
+                future = concurrent.futures.Future()
+                future.set_exception(err)
+            future.add_done_callback(lambda future, job=job, pool=pool: self.finished(job, future, pool))
+
+    def finished(self, job, future, pool):
+        r'''
+        Record the result of a job, which was run using `pool`, and free its
+        worker
+        '''
+        try:
+            result = future.result()
+        except Exception as err:
+            result = dict(log='WebQuiz error: {}\n'.format(err), exit_status=1, outputs=[],
+                          error=dict(phase='worker', message='{}: {}'.format(type(err).__name__, err)))
+            # if a worker process died then the pool is broken and is replaced
+            if isinstance(err, concurrent.futures.BrokenExecutor):
+                with self.lock:
+                    if self.pool is pool:
+                        self.pool = self.worker_pool()
+
+        with self.lock:
+            job.log = result['log']
+            job.exit_status = result['exit_status']
+            job.outputs = result['outputs']
+            job.error = result['error']
+            job.status = 'finished' if job.exit_status == 0 else 'failed'
+            job.finished = time.time()
+        self.free_workers.release()
+
+    def status(self):
+        r'''
+        Return a summary of the build queue, for the api
+        '''
+        with self.lock:
+            statuses = collections.Counter(job.status for job in self.jobs.values())
+        return dict(workers=self.workers,
+                    queued=statuses['queued'],
+                    running=statuses['running'],
+                    finished=statuses['finished'],
+                    failed=statuses['failed'])
+
+    def shutdown(self):
+        self.waiting.put(None)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class BuildRequestHandler(http.server.BaseHTTPRequestHandler):
+    r'''
+    Request handler for the build server api
+    '''
+
+    def send_json(self, code, data):
+        body = json.dumps(data, indent=2).encode('utf8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def authorised(self):
+        r'''
+        Return `True` if the request is allowed. Requests on a port must be
+        for the server's host and must give the server's token, and
+        otherwise an error is sent and `False` is returned. Requests on a
+        unix socket are always allowed because only the user running the
+        server can use the socket.
+        '''
+        token = getattr(self.server, 'token', None)
+        if token is None:
+            return True
+
+        if self.headers.get('Host', '') not in self.server.hosts:
+            self.send_json(403, dict(error='unknown host'))
+            return False
+
+        if not hmac.compare_digest(self.headers.get('Authorization', '').encode('utf8'),
+                                   'Bearer {}'.format(token).encode('utf8')):
+            self.send_json(401, dict(error='the request must give the token in {}'.format(self.server.token_file)))
+            return False
+
+        return True
+
+    def do_GET(self):
+        if not self.authorised():
+            return
+
+        path = self.path.split('?')[0].rstrip('/').split('/')[1:]
+        builds = self.server.builds
+        if path == ['status']:
+            self.send_json(200, builds.status())
+        elif path == ['jobs']:
+            with builds.lock:
+                self.send_json(200, [job.summary() for job in builds.jobs.values()])
+        elif len(path) in [2, 3] and path[0] == 'jobs' and path[1] in builds.jobs:
+            job = builds.jobs[path[1]]
+            if len(path) == 2:
+                with builds.lock:
+                    self.send_json(200, job.summary())
+            elif path[2] == 'log':
+                log = job.log.encode('utf8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; charset=utf-8')
+                self.send_header('Content-Length', str(len(log)))
+                self.end_headers()
+                self.wfile.write(log)
+            else:
+                self.send_json(404, dict(error='unknown url {}'.format(self.path)))
+        else:
+            self.send_json(404, dict(error='unknown url {}'.format(self.path)))
+
+    def do_POST(self):
+        if not self.authorised():
+            return
+
+        if self.path.rstrip('/') != '/jobs':
+            self.send_json(404, dict(error='unknown url {}'.format(self.path)))
+            return
+
+        if self.headers.get('Content-Type', '').split(';')[0].strip() != 'application/json':
+            self.send_json(415, dict(error='jobs must be sent as application/json'))
+            return
+
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf8'))
+            quiz_file = os.path.abspath(request['quiz_file'])
+            force = bool(request.get('force', False))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.send_json(400, dict(error='the job must be a json object with a quiz_file'))
+            return
+
+        # quiz_file is assumed to be a tex file if no extension is given
+        if not '.' in os.path.basename(quiz_file):
+            quiz_file += '.tex'
+        if not os.path.isfile(quiz_file):
+            self.send_json(400, dict(error='cannot read file {}'.format(quiz_file)))
+            return
+
+        try:
+            job = self.server.builds.submit(quiz_file, force)
+        except queue.Full:
+            self.send_json(503, dict(error='there are too many jobs waiting'))
+            return
+
+        self.send_json(202, job.summary())
+
+    def address_string(self):
+        # unix sockets do not have a client address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BuildHTTPServer(http.server.ThreadingHTTPServer):
+    r'''
+    Build server that listens on a localhost port. Other users can connect to
+    the port, so the requests must give a token, which is written to
+    `token_file` where only the user running the server can read it.
+    '''
+    daemon_threads = True
+
+    def __init__(self, port, handler):
+        super().__init__(('localhost', port), handler)
+        self.hosts = ['localhost:{}'.format(port), '127.0.0.1:{}'.format(port)]
+        self.token = secrets.token_urlsafe(32)
+        self.token_file = os.path.join(webquiz_util.cache_directory('serve'), '{}.token'.format(port))
+        if os.path.exists(self.token_file):
+            os.remove(self.token_file)
+        with os.fdopen(os.open(self.token_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), 'w') as token:
+            token.write(self.token)
+
+
+class BuildUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    r'''
+    Build server that listens on a unix socket, which only the user running
+    the server can use
+    '''
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        # the socket is created with the permissions given by the umask, so
+        # it is never accessible to other users, even briefly
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+
+def warm_up(settings):
+    r'''
+    Load the files that are used to make every quiz, so that the worker
+    processes inherit them from the server: the kpsewhich results for the
+    webquiz latex files and the language file for the default language.
+    '''
+    for latex_file in webquiz_cache.webquiz_latex_files:
+        try:
+            webquiz_util.kpsewhich(latex_file)
+        except Exception:
+            pass
+    try:
+        webquiz_makequiz.read_language(settings['language'])
+    except Exception:
+        pass
+
+
+def serve(options, settings, make_quiz_in_worker, queue_size=100):
+    r'''
+    Run the build server on `options.serve`, which is either a port on
+    localhost or the path to a unix socket, until it is stopped using
+    control-C. The jobs are made using `make_quiz_in_worker(quiz_file,
+    force)`, in `options.jobs` worker processes.
+    '''
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        webquiz_util.webquiz_error(settings.debugging, 'the build server is not supported on this platform')
+    if not hasattr(socketserver, 'UnixStreamServer') and not options.serve.isdigit():
+        webquiz_util.webquiz_error(settings.debugging, 'unix sockets are not supported on this platform')
+
+    warm_up(settings)
+    workers = options.jobs if options.jobs > 0 else os.cpu_count()
+    builds = BuildQueue(make_quiz_in_worker, workers, queue_size)
+
+    try:
+        if options.serve.isdigit():
+            server = BuildHTTPServer(int(options.serve), BuildRequestHandler)
+            address = 'http://localhost:{}, using the token in {},'.format(options.serve, server.token_file)
+        else:
+            server = BuildUnixServer(os.path.abspath(options.serve), BuildRequestHandler)
+            address = 'unix socket {}'.format(server.server_address)
+    except OSError as err:
+        builds.shutdown()
+        webquiz_util.webquiz_error(settings.debugging,
+            'unable to start the build server on {}'.format(options.serve), err)
+
+    server.builds = builds
+
+    # control-C stops the server
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    if options.quiet < 3:
+        print('WebQuiz build server listening on {} with {} worker{}'.format(
+                  address, workers, '' if workers == 1 else 's'))
+        print('Press control-C to stop')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        builds.shutdown()
+        if isinstance(server, BuildUnixServer) and os.path.exists(server.server_address):
+            os.remove(server.server_address)
+        if isinstance(server, BuildHTTPServer) and os.path.exists(server.token_file):
+            os.remove(server.token_file)
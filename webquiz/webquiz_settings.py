@@ -0,0 +1,856 @@
+r'''
+-----------------------------------------------------------------------------
+    webquiz_settings | the webquiz settings, which are read from the system
+                     | and user webquizrc files, and the webquiz meta data
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+'''
+
+# -*- encoding: utf-8 -*-
+
+import codecs
+import os
+import shutil
+import subprocess
+import sys
+import types
+
+# imports of webquiz code
+import webquiz_templates
+import webquiz_util
+
+#################################################################################
+def read_metadata():
+    r'''
+    Read in basic meta data such as author, version, ... and set debugging=False
+    '''
+    try:
+        return webquiz_util.MetaData(webquiz_util.kpsewhich('webquiz.ini'), debugging=False)
+    except subprocess.CalledProcessError:
+        # check to see if we are running from the zip file
+        ini_file = os.path.join(webquiz_util.webquiz_file(''), '..', 'latex', 'webquiz.ini')
+        try:
+            return webquiz_util.MetaData(ini_file, debugging=False)
+        except (FileNotFoundError, subprocess.CalledProcessError):
+            print('webquiz installation error: unable to find webquiz.ini -> {}'.format(ini_file))
+            sys.exit(1)
+
+# the meta data is only read when it is first used
+metadata = webquiz_util.LazyMetaData(read_metadata)
+
+def read_rcfile(rcfile):
+    r'''
+    Return a dictionary of the settings in the webquizrc file `rcfile`.
+    Raises a WebQuizError if the file cannot be read or if it contains an
+    unknown setting.
+    '''
+    values = {}
+    try:
+        with codecs.open(rcfile, 'r', encoding='utf8') as webquizrc:
+            for line in webquizrc:
+                if '#' in line:  # remove comments
+                    line = line[:line.index('#')]
+                if '=' in line:
+                    key, value = line.split('=')
+                    key = key.strip().lower().replace('-','_')
+                    if key in WebQuizSettings.settings:
+                        values[key] = value.strip()
+                    elif key != '':
+                        raise webquiz_util.WebQuizError('settings: unknown setting "{}" in {}'.format(key, rcfile))
+
+    except OSError as err:
+        raise webquiz_util.WebQuizError('settings: there was a problem reading the rc-file {}'.format(rcfile), err)
+
+    except webquiz_util.WebQuizError:
+        raise
+
+    except Exception as err:
+        raise webquiz_util.WebQuizError('settings: there was an error reading the webquizrc file,', err)
+
+    return values
+
+class WebQuizSettings:
+    r'''
+    Class for initialising webquiz. This covers both reading and writing the
+    webquizrc file and copying files into the web directories during
+    initialisation. The descriptions and defaults of the settings are stored
+    in the class attribute settings, which is a dictionary that is never
+    changed. The values of the settings are read in layers: the defaults, the
+    system and user webquizrc files, the rc-file given on the command line and
+    finally any settings that are changed. A setting takes its value from the
+    last layer that sets it. The class reads and writes the settings to the
+    webquizrc file and the values of the settings are available as items:
+        >>> wq = WebQuizSettings()
+        >>> wq['webquiz_url']
+        ... /WebQuiz
+        >>> wq['webquiz_url'] = '/new_url'
+    The settings used to make quizzes are given by freeze(), which returns
+    QuizSettings that cannot be changed.
+    '''
+
+    # default of settings for the webquizrc file - a dictionary of dictionaries
+    # the 'help' field is for printing descriptions of the settings to help the
+    # user - they are also printed in the webquizrc file
+    settings = dict(
+        webquiz_url={
+            'default': '',
+            'advanced': False,
+            'help': 'Relative URL for the webquiz web directory',
+        },
+        webquiz_www={
+            'default': '',
+            'advanced': False,
+            'help': 'Full path to WebQuiz web directory',
+        },
+        language={
+            'default': 'english',
+            'advanced': False,
+            'help': 'Default language used on web pages'
+        },
+        engine = {
+            'default': 'latex',
+            'advanced': False,
+            'help': 'Default TeX engine used to compile web pages',
+            'values': dict(latex='', lua='--lua', xelatex='--xetex')
+        },
+        theme={
+            'default': 'default',
+            'advanced': False,
+            'help': 'Default colour theme used on web pages'
+        },
+        breadcrumbs={
+            'default': '',
+            'advanced': False,
+            'help': 'Breadcrumbs at the top of quiz page',
+        },
+        department={
+            'default': '',
+            'advanced': False,
+            'help': 'Name of department',
+        },
+        department_url={
+            'default': '/',
+            'advanced': False,
+            'help': 'URL for department',
+        },
+        institution={
+            'default': '',
+            'advanced': False,
+            'help': 'Institution or university',
+        },
+        institution_url={
+            'default': '/',
+            'advanced': False,
+            'help': 'URL for institution or university',
+        },
+        hide_side_menu={
+            'default': 'false',
+            'advanced': False,
+            'help': 'Do not display the side menu at start of quiz',
+        },
+        one_page={
+            'default': 'false',
+            'advanced': False,
+            'help': 'Display questions on one page',
+        },
+        random_order={
+            'default': 'false',
+            'advanced': False,
+            'help': 'Randomly order the quiz questions',
+        },
+        webquiz_layout={
+            'default': 'webquiz_layout',
+            'advanced': True,
+            'help': 'Name of python module that formats the quizzes',
+        },
+        make4ht={
+            'default': '',
+            'advanced': True,
+            'help': 'Build file for make4ht',
+        },
+        mathjax={
+            'default':
+            'https://cdnjs.cloudflare.com/ajax/libs/mathjax/2.7.1/MathJax.js',
+            'advanced':
+            True,
+            'help':
+            'URL for mathjax',
+        },
+        version={
+            'advanced': False,
+            'help': 'WebQuiz version number for webquizrc settings',
+        })
+
+    # by default we assume we don't need to print a initialisation warning
+    initialise_warning = ''
+
+    # turn debugging on by default because any error message that we hit before
+    # we process the command line options really should not happen
+    debugging = True
+
+    # keep track of whether we have initialised
+    have_initialised = False
+
+    def __init__(self):
+        '''
+        First read the system webquizrc file and then read the
+        to use some system settings and to override others.
+
+        By default, there is no webquiz initialisation file. We first
+        look for webquizrc in the webquiz source directory and then
+        for .webquizrc file in the users home directory.
+        '''
+        # the layers of values for the settings, starting with the defaults
+        self.layers = dict(default={key: self.default(key) for key in self.settings})
+
+        # define user and system rc file and load the ones that exist
+
+        self.system_rcfile = os.path.join(webquiz_util.kpsewhich('-var-value TEXMFLOCAL'),
+                                           'tex',
+                                           'latex',
+                                           'webquiz',
+                                           'webquizrc'
+        )
+        self.read_webquizrc(self.system_rcfile, layer='system')
+
+        # the user rc file defaults to:
+        #   ~/.dotfiles/config/webquizrc if .dotfiles/config exists
+        #   ~/.config/webquizrc if .config exists
+        # and otherwise to ~/.webquizrc
+        if os.path.isdir(os.path.join(os.path.expanduser('~'), '.dotfiles', 'config')):
+            self.user_rcfile = os.path.join(os.path.expanduser('~'), '.dotfiles', 'config', 'webquizrc')
+        elif os.path.isdir(os.path.join(os.path.expanduser('~'), '.config')):
+            self.user_rcfile = os.path.join(os.path.expanduser('~'), '.config', 'webquizrc')
+        else:
+            self.user_rcfile = os.path.join(os.path.expanduser('~'), '.webquizrc')
+
+        self.read_webquizrc(self.user_rcfile, layer='user')
+
+    def webquiz_debug(self, msg):
+        r'''
+            Customised debugging message for the MakeSettings module
+        '''
+        webquiz_util.webquiz_debug(self.debugging, 'main: '+msg)
+
+    def webquiz_error(self, msg, err=None):
+        r'''
+            Customised error messages for the Module, which are raised as a
+            WebQuizError
+        '''
+        raise webquiz_util.WebQuizError('settings: '+msg, err)
+
+    def default(self, key):
+        r'''
+        Return the default value of the setting `key`
+        '''
+        return metadata.version if key == 'version' else self.settings[key]['default']
+
+    def __getitem__(self, key):
+        r'''
+        Return the value of the corresponding setting, from the last layer
+        that sets it, and an error if the key is unknown.
+        '''
+        if key in self.settings:
+            for layer in reversed(list(self.layers.values())):
+                if key in layer:
+                    return layer[key]
+
+        self.webquiz_error('getitem: unknown setting "{}" in webquizrc.'.format(key))
+
+    def __setitem__(self, key, value):
+        r'''
+        Set the value of the corresponding setting, in the layer of settings
+        that have been changed, and an error if the key is unknown.
+        '''
+        if key in self.settings:
+            self.layers.setdefault('changed', {})[key] = value
+        else:
+            self.webquiz_error('setitem: unknown setting "{}" in webquizrc'.format(key))
+
+    def read_webquizrc(self, rcfile, must_exist=False, layer='rcfile'):
+        r'''
+        Read the settings from the specified webquizrc file - if it exists, in
+        which case set self.rcfile equal to this directory and use the settings
+        in the file as the layer of settings `layer`. If the file does not
+        exist then return without changing the current settings.
+        '''
+        if os.path.isfile(rcfile):
+            self.layers[layer] = read_rcfile(rcfile)
+            # record the rcfile for later use
+            self.rcfile = rcfile
+
+        elif must_exist:
+            # this is only an error if we have been asked to read this file
+            self.webquiz_error('the rc-file "{}" does not exist'.format(rcfile))
+
+    def keys(self):
+        r'''
+        Return a list of keys for all settings, ordered alphabetically with the
+        advanced options last/
+        '''
+        return sorted(self.settings.keys(), key=lambda k: '{}{}'.format(self.settings[k]['advanced'], k))
+
+    def freeze(self, debugging=None):
+        r'''
+        Return the current settings as QuizSettings, which cannot be changed,
+        for making quizzes. The debugging flag defaults to self.debugging.
+        '''
+        return QuizSettings(self.layers.items(),
+                            debugging=self.debugging if debugging is None else debugging,
+                            initialise_warning=self.initialise_warning)
+
+    def override(self, layer, debugging=None, **values):
+        r'''
+        Return QuizSettings for the current settings with the extra layer of
+        settings `values`: see QuizSettings.override()
+        '''
+        return self.freeze().override(layer, debugging, **values)
+
+    def write_webquizrc(self):
+        r'''
+        Write the settings to the webquizrc file, defaulting to the user
+        rcfile if unable to write to the system rcfile
+        '''
+        if not hasattr(self, 'rcfile'):
+            # when initialising an rcfile will not exist yet
+            self.rcfile = self.system_rcfile
+
+        file_not_written = True
+        while file_not_written:
+            try:
+                dire = os.path.dirname(self.rcfile)
+                if dire != '' and not os.path.isdir(dire):
+                    os.makedirs(dire, exist_ok=True)
+                with codecs.open(self.rcfile, 'w', encoding='utf8') as rcfile:
+                    for key in self.keys():
+                        # Only save settings in the rcfile if they have changed
+                        # Note that changed means changed from the last read
+                        # rcfile rather than from the default (of course, the
+                        # defaults serve as the "initial rcfile")
+                        if key == 'version' or self.default(key)!=self[key]:
+                            rcfile.write('# {}\n{:<17} = {}\n'.format(
+                                           self.settings[key]['help'],
+                                           key.replace('_','-'),
+                                           self[key])
+                            )
+
+                print('\nWebQuiz settings saved in {}\n'.format( self.rcfile))
+                input('Press RETURN to continue... ')
+                file_not_written = False
+
+            except (OSError, PermissionError) as err:
+                # if writing to the system_rcfile then try to write to user_rcfile
+                alt_rcfile = self.user_rcfile if self.rcfile != self.user_rcfile else self.system_rcfile
+                response = input(
+                    webquiz_templates.rc_permission_error.format(
+                        error=err,
+                        rcfile=self.rcfile,
+                        alt_rcfile=alt_rcfile))
+                if response.startswith('2'):
+                    self.rcfile = alt_rcfile
+                elif response.startswith('3'):
+                    rcfile = input('WebQuiz rc-file: ')
+                    print('\nTo access this rc-file you will need to use: webquiz --rcfile {} ...'.format(rcfile))
+                    self.rcfile = os.path.expanduser(rcfile)
+                elif not response.startswith('1'):
+                    print('exiting...')
+                    sys.exit(1)
+
+    def list_settings(self, setting='all'):
+        r'''
+        Print the non-default settings for webquiz from the webquizrc
+        '''
+        if not hasattr(self, 'rcfile'):
+            print(
+                'Please initialise WebQuiz using the command: webquiz --initialise\n'
+            )
+
+        if setting not in ['all', 'verbose', 'help']:
+            setting = setting.replace('-', '_')
+            if setting in self.settings:
+                print(self[setting])
+            else:
+                self.webquiz_error('{} is an invalid setting'.format(setting))
+
+        elif setting=='all':
+            dash = '-'*len('WebQuiz rc-file: {}'.format(self.rcfile))
+            print('{dash}\nWebQuiz rc-file: {rcfile}\n{dash}'.format(rcfile=self.rcfile, dash=dash))
+            for key in self.keys():
+                print('{:<17} = {}'.format(key.replace('_', '-'), self[key]))
+            print('{dash}'.format(dash=dash))
+
+        elif setting=='help':
+            for key in self.keys():
+                print('{:<17} {}'.format(key.replace('_', '-'), self.settings[key]['help'].lower()))
+
+        else:
+            print('WebQuiz settings from {}'.format(self.rcfile))
+            for key in self.keys():
+                print('# {}{}\n{:<17} = {:<17}  {}'.format(
+                        self.settings[key]['help'],
+                        ' (advanced)' if self.settings[key]['advanced'] else '',
+                        key.replace('_', '-'),
+                        self[key],
+                        '(default)' if self[key]==self.default(key) else ''
+                        )
+                )
+
+    def initialise_webquiz(self, need_to_initialise=False, developer=False):
+        r'''
+        Set the root for the WebQuiz web directory and copy the www files into
+        this directory. Once this is done save the settings to webquizrc.
+        This method should only be used when WebQuiz is being set up.
+
+        If `need_to_initialise` is `True` then this is a forced initialisation.
+        '''
+
+        # keep track of whether we have initialised
+        self.have_initialised = True
+
+        if need_to_initialise:
+            self.initialise_warning = webquiz_templates.web_initialise_warning
+            initialise = input(webquiz_templates.initialise_invite)
+            if initialise!='' and initialise.strip().lower()[0]!='y':
+                self['webquiz_url'] = 'http://www.maths.usyd.edu.au/u/mathas/WebQuiz'
+                return
+
+        if self['webquiz_url']=='':
+            self['webquiz_url'] = '/WebQuiz'
+
+        # prompt for directory and copy files - are these reasonable defaults
+        # for each OS?
+        if sys.platform == 'darwin':
+            default_root = '/Library/WebServer/Documents/WebQuiz'
+            platform = 'Mac OSX'
+        elif sys.platform.startswith('win'):
+            default_root = ' c:\inetpub\wwwroot\WebQuiz'
+            platform = 'Windows'
+        else:
+            default_root = '/var/www/html/WebQuiz'
+            platform = sys.platform.capitalize()
+
+        if self['webquiz_www'] != '':
+            webquiz_root = self['webquiz_www']
+        else:
+            webquiz_root = default_root
+
+        print(webquiz_templates.initialise_introduction)
+        input('Press RETURN to continue... ')
+
+        print(webquiz_templates.webroot_request.format(
+                platform=platform,
+                webquiz_dir = webquiz_root)
+        )
+        input('Press RETURN to continue... ')
+
+        files_copied = False
+        while not files_copied:
+            web_dir = input('\nWebQuiz web directory:\n[{}] '.format(webquiz_root))
+            if web_dir == '':
+                web_dir = webquiz_root
+            else:
+                web_dir = os.path.expanduser(web_dir)
+
+            print('Web directory set to {}'.format(web_dir))
+            if web_dir=='SMS':
+                # undocumented: allow links to SMS web pages
+                self['webquiz_www'] = 'SMS'
+                self['webquiz_url'] = 'http://www.maths.usyd.edu.au/u/mathas/WebQuiz'
+
+            else:
+                try:
+                    # ...remove the doc directory
+                    web_doc = os.path.join(web_dir, 'doc')
+                    if os.path.isfile(web_doc) or os.path.islink(web_doc):
+                        os.remove(web_doc)
+                    elif os.path.isdir(web_doc):
+                        shutil.rmtree(web_doc)
+
+                    # Need to locate the www directory, which should be a subdirectory
+                    # of the webquiz doc directory. First try using texdoc
+                    webquiz_doc = ''
+                    try:
+                        webquiz_pdf = webquiz_util.shell_command('texdoc --list --machine webquiz.pdf').split()[-1]
+                        if webquiz_pdf.endswith('webquiz.pdf'):
+                            webquiz_doc = os.path.dirname(webquiz_pdf)
+                    except subprocess.CalledProcessError:
+                        pass
+
+                    # if texdoc failed then try using TEXMFMAIN
+                    if webquiz_doc=='':
+                        try:
+                            webquiz_doc = os.path.join(webquiz_util.kpsewhich('-var-value TEXMFMAIN'), 'doc','latex', 'webquiz')
+                        except subprocess.CalledProcessError:
+                            pass
+
+                    # if we still don't have webquiz_doc then try working backwards from webquiz.cls
+                    # unlikely to work if TEXMFMAIN doesn't
+                    if not os.path.isdir(webquiz_doc):
+                        parent = os.path.dirname
+                        try:
+                            texdist_dir = parent(parent(parent(parent(parent(webquiz_util.kpsewhich('webquiz.cls'))))))
+                        except subprocess.CalledProcessError:
+                            print(webquiz_templates.not_installed.format(metadata.repository))
+                            sys.exit(1)
+
+                        webquiz_doc = os.path.join(texdist_dir, 'doc', 'latex', 'webquiz')
+
+                    # get the root directory of the source code for developer
+                    # mode and just in case webquiz_www still does not exist
+                    webquiz_src = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+                    webquiz_www = os.path.join(webquiz_doc, 'www')
+                    if not os.path.isdir(webquiz_www):
+                        webquiz_www = os.path.join(webquiz_src, 'doc', 'www')
+
+                    if developer and os.path.isdir(os.path.join(webquiz_src, 'doc')):
+                        # this is a development version so add links from the
+                        # web directory to the css,doc and js directories
+                        print('\nInstalling files for development version')
+                        print('Linking web files {} -> {} ...\n'.format(web_dir, webquiz_src))
+                        if not os.path.exists(web_dir):
+                            os.makedirs(web_dir)
+
+                        for (src, target) in [('javascript', 'js'), ('css', 'css'), ('doc', 'doc')]:
+                            newlink = os.path.join(web_dir, target)
+                            try:
+                                os.remove(newlink)
+                            except FileNotFoundError:
+                                pass
+                            try:
+                                os.symlink(os.path.join(webquiz_src,src), newlink)
+                            except OSError as err:
+                                print('There was a problem linking {}: {}'.format(newlink, err))
+
+                    else:
+                        # loop until we find some files to install or exit
+                        while not os.path.isdir(webquiz_www) or webquiz_www=='':
+                            print('\nUnable to find the WebQuiz web files')
+                            webquiz_www = input('Please enter the location of the WebQuiz www directory\nor press RETURN to exit: ')
+                            webquiz_www = os.path.expanduser(webquiz_www)
+                            if webquiz_www=='':
+                                sys.exit()
+                            if not (webquiz_www.endswith('www/') or webquiz_www.endswith('www')):
+                                print('\nThe webquiz web directory is called www, so\n  {}\ncannot be the right directory.'.format(
+                                      webquiz_www)
+                                )
+                                webquiz_www = False
+
+
+                        # the www directory exists so we copy it to web_dir
+                        print('\nCopying web files to {} ...'.format(web_dir))
+                        webquiz_util.copytree(webquiz_www, web_dir)
+
+                    self['webquiz_www'] = web_dir
+                    files_copied = True
+
+                except PermissionError:
+                    print(webquiz_templates.permission_error.format(web_dir))
+
+                except OSError as err:
+                    print(webquiz_templates.oserror_copying.format(web_dir=web_dir, err=err))
+
+        if self['webquiz_www']!='SMS':
+            # now prompt for the relative url
+            webquiz_url = input(webquiz_templates.webquiz_url_message.format(self['webquiz_url']))
+            if webquiz_url != '':
+                # removing trailing slashes from webquiz_url
+                while webquiz_url[-1] == '/':
+                    webquiz_url = webquiz_url[:len(webquiz_url) - 1]
+
+                if webquiz_url[0] != '/':  # force URL to start with /
+                    webquiz_url = '/' + webquiz_url
+
+                if not web_dir.endswith(webquiz_url):
+                    print(webquiz_templates.webquiz_url_warning)
+                    input('Press RETURN to continue... ')
+
+                self['webquiz_url'] = webquiz_url
+
+        # save the settings and exit
+        self.write_webquizrc()
+        print(webquiz_templates.initialise_ending.format(web_dir=self['webquiz_www']))
+
+    def edit_settings(self):
+        r'''
+        Change current default values for the WebQuiz settings
+        '''
+        advanced_not_started = True
+        for key in self.keys():
+            if key not in ['webquiz_www', 'version']:
+                if advanced_not_started and self.settings[key]['advanced']:
+                    print(webquiz_templates.advanced_settings)
+                    advanced_not_started = False
+
+                skey = '{}'.format(self[key])
+                setting = input('{}{}[{}]: '.format(
+                                    self.settings[key]['help'],
+                                    ' ' if len(skey)<40 else '\n',
+                                    skey
+                          )
+                ).strip()
+                if setting != '':
+                    if key == 'webquiz_url' and setting[0] != '/':
+                        print("  ** prepending '/' to webquiz_url **")
+                        setting = '/' + setting
+
+                    elif key == 'webquiz_layout':
+                        setting = os.path.expanduser(setting)
+                        if setting.endswith('.py'):
+                            print("  ** removing .py extension from webquiz_layout **")
+                            setting = setting[:-3]
+
+                    elif key == 'engine' and setting not in self.settings['engine'].values:
+                        print('setting not changed: {} is not a valid TeX engine'.format(setting))
+                        setting = self['engine']
+
+                    elif key in ['hide_side_menu', 'random_order']:
+                        setting = setting.lower()
+                        if setting not in ['true', 'false']:
+                            print('setting not changed: {} must be True or False'.format(key))
+                            setting = self[key]
+
+                    elif setting=='NONE':
+                        setting = ''
+
+                    self[key] = setting
+
+        # save the settings, print them and exit
+        self.write_webquizrc()
+        self.list_settings()
+
+    def tex_install(self):
+        r'''
+        Install the tex files into the standard locations in TEXMFMAIN:
+            scripts -> TEXMFMAIN/scripts/webquiz
+            doc     -> TEXMFMAIN/doc/latex/webquiz
+            latex   -> TEXMFMAIN/tex/latex/webquiz
+        It is assumed that this is run from the zipfile installation. There
+        is little in the way of error checking or debugging.
+
+        Undocumented feature - useful for debugging initialisation routine
+        '''
+        webquiz_top = os.path.abspath(webquiz_util.webquiz_file('..'))
+        texmf = webquiz_util.kpsewhich('-var-value TEXMFMAIN')
+        for (src, target) in [('scripts', 'scripts'),
+                         ('latex', 'tex/latex'),
+                         ('doc', 'doc/latex')]:
+            try:
+                webquiz_util.copytree(os.path.join(webquiz_top,src), os.path.join(texmf, target, 'webquiz'))
+
+            except (FileExistsError,FileNotFoundError):
+                continue
+
+            except PermissionError as err:
+                print(webquiz_templates.insufficient_permissions.format(err))
+                sys.exit(1)
+
+        try:
+
+            # add a link to webquiz.py
+            texbin = os.path.dirname(webquiz_util.shell_command('which pdflatex').split()[-1])
+            os.symlink(os.path.join(texmf,'scripts','webquiz','webquiz.py'), os.path.join(texbin, 'webquiz'))
+            subprocess.call('mktexlsr', shell=True)
+
+        except (FileExistsError,FileNotFoundError):
+            pass
+
+        except PermissionError as err:
+            print(webquiz_templates.insufficient_permissions.format(err))
+            sys.exit(1)
+
+        except subprocess.CalledProcessError as err:
+            print('There was a problem running mktexlsr')
+            sys.exit(1)
+
+    def tex_uninstall(self):
+        r'''
+        UnInstall the tex files into TEXMFMAIN. It is assumed that the files
+        are installed in the natural locations in the TEXMFMAIN tree, namely:
+            scripts -> TEXMFMAIN/scripts/webquiz
+            doc     -> TEXMFMAIN/doc/latex/webquiz
+            latex   -> TEXMFMAIN/tex/latex/webquiz
+        There is little in the way of error checking or debugging.
+
+        Undocumented feature - useful for debugging initialisation routine
+        '''
+        webquiz_top = os.path.abspath(webquiz_util.webquiz_file('..'))
+        texmf = webquiz_util.kpsewhich('-var-value TEXMFMAIN')
+        for target in ['scripts', 'tex/latex', 'doc/latex']:
+            try:
+                shutil.rmtree(os.path.join(texmf, target, 'webquiz'))
+
+            except (FileExistsError,FileNotFoundError):
+                pass
+
+            except PermissionError as err:
+                print(webquiz_templates.insufficient_permissions.format(err))
+                sys.exit(1)
+
+        try:
+            # remove link from texbin to webquiz.py
+            texbin = os.path.dirname(webquiz_util.shell_command('which pdflatex').split()[-1])
+            os.remove(os.path.join(texbin, 'webquiz'))
+
+        except (FileExistsError,FileNotFoundError):
+            pass
+
+        except PermissionError as err:
+            print(webquiz_templates.insufficient_permissions.format(err))
+            sys.exit(1)
+
+        # remove any rcfiles that exist in obvious places
+        try:
+            if os.path.isfile(self.system_rcfile):
+                os.remove(self.system_rcfile)
+            if os.path.isfile(self.user_rcfile):
+                os.remove(self.user_rcfile)
+            if os.path.isfile(self.rcfile):
+                os.remove(self.rcfile)
+        except PermissionError:
+            print(webquiz_templates.insufficient_permissions.format(err))
+            sys.exit(1)
+
+        # remove link to webquiz.py
+        texbin = os.path.dirname(webquiz_util.shell_command('which pdflatex').split()[-1])
+        webquiz = os.path.join(texbin,'webquiz')
+        try:
+            target = os.readlink(webquiz)
+            if target==os.path.join(texmf,'scripts','webquiz','webquiz.py'):
+                os.remove(webquiz)
+
+        except (FileExistsError,FileNotFoundError):
+            pass
+
+        except OSError as err:
+            print('There was a problem removing the link to webquiz: {}'.format(err))
+
+    def uninstall_webquiz(self):
+        r'''
+        Remove all of the webquiz files from the webserver
+        '''
+
+        if os.path.isdir(self['webquiz_www']):
+            remove = input('Do you really want to remove the WebQuiz from your web server [N/yes]? ')
+            if remove != 'yes':
+                print('WebQuiz unistall aborted!')
+                return
+
+            try:
+                shutil.rmtree(self['webquiz_www'])
+                print('WebQuiz files successfully removed from {}'.format(self['webquiz_www']))
+
+            except PermissionError as err:
+                print(webquiz_templates.insufficient_permissions.format(err))
+                sys.exit(1)
+
+            except OSError as err:
+                self.webquiz_error('There was a problem removing webquiz files from {}'.format(self['webquiz_www']), err)
+
+            # now reset and save the locations of the webquiz files and URL
+            self['webquiz_url'] = ''
+            self['webquiz_www'] = ''
+            self.write_webquizrc()
+
+        else:
+            self.webquiz_error('uninstall: no webwquiz files are installed on your web server??')
+
+        for rfile in ['system', 'user']:
+            rcfile = getattr(self, rfile+'_rcfile')
+            if os.path.isfile(rcfile):
+                rm = input('Remove {} rcfile {}\n[Y/no] '.format(rfile, rcfile))
+                if rm != 'no':
+                    try:
+                        os.remove(rcfile)
+                    except (OSError, PermissionError) as err:
+                        self.webquiz_error('There was a problem deleting {}'.format(rcfile), err)
+
+
+# =====================================================
+
+
+class QuizSettings(object):
+    r'''
+    The settings used to make a quiz, which cannot be changed once they have
+    been created, so quizzes that are made at the same time, for example by
+    different threads, can safely use different settings. The settings are
+    given by a sequence of layers, such as the defaults, the system and user
+    webquizrc files, the command line and the quiz, and each setting takes
+    its value from the last layer that sets it. New layers are added using
+    override(), which returns new QuizSettings:
+        >>> quiz_settings = WebQuizSettings().freeze()
+        >>> maths = quiz_settings.override('department', department='Mathematics')
+        >>> maths['department'], quiz_settings['department']
+        ('Mathematics', '')
+    '''
+
+    # the descriptions and defaults of the settings
+    settings = WebQuizSettings.settings
+
+    __slots__ = ['layers', 'values', 'debugging', 'initialise_warning']
+
+    def __init__(self, layers, debugging=False, initialise_warning=''):
+        layers = tuple((name, types.MappingProxyType(dict(values))) for (name, values) in layers)
+        values = {}
+        for (name, layer) in layers:
+            for key in layer:
+                if key not in self.settings:
+                    raise webquiz_util.WebQuizError(
+                        'settings: unknown setting "{}" in the {} settings'.format(key, name))
+            values.update(layer)
+
+        object.__setattr__(self, 'layers', layers)
+        object.__setattr__(self, 'values', types.MappingProxyType(values))
+        object.__setattr__(self, 'debugging', debugging)
+        object.__setattr__(self, 'initialise_warning', initialise_warning)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('quiz settings cannot be changed: use override() to change them')
+
+    def __getitem__(self, key):
+        r'''
+        Return the value of the setting `key` and an error if the key is unknown
+        '''
+        try:
+            return self.values[key]
+        except KeyError:
+            raise webquiz_util.WebQuizError('settings: unknown setting "{}"'.format(key)) from None
+
+    def __contains__(self, key):
+        return key in self.values
+
+    def keys(self):
+        r'''
+        Return a list of keys for all settings, ordered as in WebQuizSettings.keys()
+        '''
+        return sorted(self.values.keys(), key=lambda k: '{}{}'.format(self.settings[k]['advanced'], k))
+
+    def layer(self, key):
+        r'''
+        Return the name of the layer that sets the value of the setting `key`
+        '''
+        for (name, layer) in reversed(self.layers):
+            if key in layer:
+                return name
+
+    def override(self, layer, debugging=None, **values):
+        r'''
+        Return new QuizSettings with the extra layer of settings `values`,
+        which is called `layer`, and with debugging turned on or off if
+        `debugging` is not `None`.
+        '''
+        return QuizSettings(self.layers + ((layer, values),),
+                            debugging=self.debugging if debugging is None else debugging,
+                            initialise_warning=self.initialise_warning)
+
+    def __repr__(self):
+        return 'QuizSettings({})'.format(', '.join(name for (name, layer) in self.layers))
@@ -16,6 +16,61 @@ r'''
 
 # -*- encoding: utf-8 -*-
 
+import functools
+import string
+
+class CompiledTemplate:
+    r'''
+    A template string that is parsed once so that the fields that do not
+    change while making a quiz, such as those from the language file, can be
+    rendered once with `bind` rather than for every question. The remaining
+    fields are rendered using `format`, exactly as for `str.format`.
+
+    Usage: compiled_template(template).bind(**constants).format(**fields)
+    '''
+    formatter = string.Formatter()
+
+    def __init__(self, template):
+        self.template = template
+        self.parts = list(self.formatter.parse(template))
+
+    @staticmethod
+    def escape(text):
+        return text.replace('{', '{{').replace('}', '}}')
+
+    def bind(self, **constants):
+        r'''
+        Return a new template with the fields in `constants` rendered
+        '''
+        template = []
+        for literal, field, format_spec, conversion in self.parts:
+            template.append(self.escape(literal))
+            if field is None:
+                continue
+            if field.split('.')[0].split('[')[0] in constants:
+                value, key = self.formatter.get_field(field, (), constants)
+                value = self.formatter.convert_field(value, conversion)
+                template.append(self.escape(self.formatter.format_field(value, format_spec)))
+            else:
+                template.append('{' + field
+                                + ('!' + conversion if conversion else '')
+                                + (':' + format_spec if format_spec else '') + '}')
+        return CompiledTemplate(''.join(template))
+
+    def format(self, **fields):
+        r'''
+        Render the template using `fields` for the fields that are not bound
+        '''
+        return self.template.format(**fields)
+
+@functools.lru_cache(maxsize=None)
+def compiled_template(template):
+    r'''
+    Return the CompiledTemplate for the string `template`, which is parsed
+    only the first time that it is needed
+    '''
+    return CompiledTemplate(template)
+
 ## The quiz web pages are built using the following "template" strings
 
 # html meta statements
@@ -143,12 +198,19 @@ quiz_index_div = r'''     <div class="quiz-index">
 index_item = r'''<li><a href={url}>{title}</a></li>'''
 
 # now we come to the question wrappers
-question_wrapper = r'''<div id="question{qnum}" class="question" style="display:{display};">
+question_wrapper = r'''<div id="question{qnum}" class="question" style="display:{display};">{lazy_start}
       <span class="question-label">{question_number}</span>{question}
-      {feedback}
+      {feedback}{lazy_end}
       </div>
 '''
 
+# The contents of the questions that are hidden when the page loads, and of
+# all of the feedback, are put inside a template element. Nothing inside a
+# template is loaded or typeset by the browser, or MathJax, until
+# showLazyContent() in webquiz.js copies it into the page.
+lazy_start = '<template class="webquiz-lazy">'
+lazy_end = '</template>'
+
 question_text = r'''  {question_text}
       <form id="Q{qnum}Form" onSubmit="return false;">
         {question_options}
@@ -173,26 +235,26 @@ multiple_item = '''<td><input type="checkbox" name="Q{qnum}option{optnum}"/></td
 '''
 
 tf_feedback_text = r'''
-        <div id="q{choice}{feedback}" class="feedback"><em class="dazzle">{correct_answer}</em> <em>{answer2}</em>
+        <div id="q{choice}{feedback}" class="feedback"><template class="webquiz-lazy"><em class="dazzle">{correct_answer}</em> <em>{answer2}</em>
            <div>{text}</div>
-        </div>'''
+        </template></div>'''
 single_feedback = r'''
-        <div id="q{qnum}feedback{part}" class="feedback">
+        <div id="q{qnum}feedback{part}" class="feedback"><template class="webquiz-lazy">
               <em>{alpha_choice} <span class="dazzle">{correct_answer}</span></em>
               <div>{feedback}</div>
-        </div>'''
+        </template></div>'''
 
 multiple_feedback = r'''
-        <div id="q{qnum}feedback{part}" class="feedback">
+        <div id="q{qnum}feedback{part}" class="feedback"><template class="webquiz-lazy">
             <em>{one_mistake}</em><br>{multiple_choice_opener} <span class="dazzle">{correct_answer}</span>.
             <div>{feedback}</div>
-        </div>'''
+        </template></div>'''
 multiple_feedback_correct = r'''
-        <div id="q{qnum}feedback0" class="feedback"><em class="dazzle">{correct}</em>
+        <div id="q{qnum}feedback0" class="feedback"><template class="webquiz-lazy"><em class="dazzle">{correct}</em>
             <ol>
 {feedback}
             </ol>
-        </div>'''
+        </template></div>'''
 multiple_feedback_answer = '              <li><em>{correct_answer}</em> {reason}</li>'
 
 initialise_invite = r'''WebQuiz needs to be initialised. In order to display quiz web pages
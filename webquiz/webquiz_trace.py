@@ -0,0 +1,269 @@
+r'''
+-----------------------------------------------------------------------------
+    webquiz_trace | record the time and memory used by each phase of making
+                  | a quiz as a Chrome/Perfetto trace and a memory report
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+
+    The trace is written in the Chrome trace-event format, which can be
+    viewed using https://ui.perfetto.dev or chrome://tracing. Each phase of
+    making a quiz is recorded as a complete event, with a start time and a
+    duration in microseconds, and the commands run using `options.run` are
+    recorded in the subprocess category. When the quizzes are made in
+    parallel, each worker process has its own track in the trace.
+
+    The memory report records the peak python memory used by each phase, as
+    measured by tracemalloc, and the peak resident set size of each command
+    run using `options.run`. Peak RSS is only available on unix systems.
+'''
+
+# -*- encoding: utf-8 -*-
+
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+# the trace events, or None when we are not tracing
+events = None
+# the process that started tracing
+main_process = None
+# the memory used by each phase, or None when there is no memory report
+memory = None
+# the phases that are being measured by the memory report
+memory_phases = []
+
+def now():
+    r'''
+    Return the current time in microseconds. The wall clock is used so that
+    the times are comparable between processes.
+    '''
+    return time.time_ns() // 1000
+
+def start_tracing():
+    r'''
+    Start recording trace events
+    '''
+    global events, main_process
+    events = []
+    main_process = os.getpid()
+
+def start_memory_report():
+    r'''
+    Start recording the memory used by each phase
+    '''
+    global memory
+    import tracemalloc  # only imported when needed as it is slow to import
+    memory = []
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def tracing():
+    r'''
+    Return `True` if trace events are being recorded
+    '''
+    return events is not None
+
+def start_worker():
+    r'''
+    Start recording the trace events and memory for a worker process. The
+    worker processes are forked, so the records of the main process are
+    discarded so that they are not returned to the main process twice.
+    '''
+    global events, memory
+    if events is not None:
+        events = []
+    if memory is not None:
+        memory = []
+
+def worker_records():
+    r'''
+    Return the trace events and memory records of a worker process
+    '''
+    return dict(events=events, memory=memory)
+
+def add_worker_records(records):
+    r'''
+    Add the trace events and memory records returned by a worker process
+    '''
+    if records is None:
+        return
+    if events is not None and records['events']:
+        events.extend(records['events'])
+    if memory is not None and records['memory']:
+        memory.extend(records['memory'])
+
+def current_quiz():
+    r'''
+    Return the quiz file for the phase that is being measured
+    '''
+    for phase in reversed(memory_phases):
+        if 'quiz_file' in phase['args']:
+            return phase['args']['quiz_file']
+    return ''
+
+def start_memory_phase(name, args):
+    r'''
+    Start measuring the python memory used by the phase `name`. The peak
+    memory is reset at the start and end of each phase, so the peak for the
+    enclosing phase is kept in `memory_phases`.
+    '''
+    import tracemalloc
+    current, peak = tracemalloc.get_traced_memory()
+    if memory_phases:
+        memory_phases[-1]['peak'] = max(memory_phases[-1]['peak'], peak)
+    tracemalloc.reset_peak()
+    memory_phases.append(dict(name=name, args=args, start=current, peak=current))
+
+def end_memory_phase():
+    r'''
+    Finish measuring the current phase and record the memory that it used
+    '''
+    import tracemalloc
+    current, peak = tracemalloc.get_traced_memory()
+    phase = memory_phases.pop()
+    peak = max(phase['peak'], peak)
+    if memory_phases:
+        memory_phases[-1]['peak'] = max(memory_phases[-1]['peak'], peak)
+    tracemalloc.reset_peak()
+    memory.append(dict(quiz=phase['args'].get('quiz_file', current_quiz()),
+                       phase=phase['name'],
+                       peak=peak,
+                       allocated=peak - phase['start'],
+                       retained=current - phase['start']))
+
+@contextlib.contextmanager
+def span(name, category='webquiz', **args):
+    r'''
+    Context manager that records the time spent inside it as a trace event
+    called `name`, and the memory that it uses if there is a memory report.
+    Any keyword arguments are shown with the event.
+    '''
+    if events is None and memory is None:
+        yield
+        return
+
+    begin = now()
+    measure = memory is not None and category != 'subprocess'
+    if measure:
+        start_memory_phase(name, args)
+    try:
+        yield
+    finally:
+        if measure:
+            end_memory_phase()
+        if events is not None:
+            events.append(dict(name=name, cat=category, ph='X', ts=begin, dur=now()-begin,
+                               pid=os.getpid(), tid=os.getpid(), args=args))
+
+@contextlib.contextmanager
+def phase(name, **args):
+    r'''
+    A span for the phase `name` of making a quiz. Errors raised inside the
+    phase are given the name of the phase, in their `phase` attribute, unless
+    they already have one, so that failures can be reported by phase.
+    '''
+    with span(name, **args):
+        try:
+            yield
+        except Exception as err:
+            if getattr(err, 'phase', None) is None:
+                try:
+                    err.phase = name
+                except AttributeError:
+                    pass
+            raise
+
+def call(cmd, **kwargs):
+    r'''
+    Run the shell command `cmd`, as in `subprocess.call(cmd, shell=True,
+    **kwargs)`, and return its exit code. When there is a memory report the
+    peak resident set size of the command, including the processes that it
+    runs, is recorded using os.wait4.
+    '''
+    if memory is None or not hasattr(os, 'wait4'):
+        return subprocess.call(cmd, shell=True, **kwargs)
+
+    process = subprocess.Popen(cmd, shell=True, **kwargs)
+    try:
+        pid, status, usage = os.wait4(process.pid, 0)
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on linux and in bytes on macos
+    memory.append(dict(quiz=current_quiz(),
+                       phase=cmd.split()[0] if cmd.strip() else cmd,
+                       command=cmd,
+                       rss=usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)))
+    return process.returncode
+
+def traced_command(run):
+    r'''
+    Return a version of the function `run(cmd, **kwargs)`, which runs the
+    shell command `cmd`, that records each command as a trace event in the
+    subprocess category.
+    '''
+    def traced_run(cmd, **kwargs):
+        with span(cmd.split()[0] if cmd.strip() else cmd, 'subprocess', command=cmd):
+            return run(cmd, **kwargs)
+
+    return traced_run
+
+def write_memory_report(filename):
+    r'''
+    Print a table of the memory used by each phase and write the memory
+    records to `filename` as json.
+    '''
+    if memory is None:
+        return
+
+    megabytes = lambda size: '{:.1f}'.format(size/(1 << 20))
+    width = max([len('Quiz')] + [len(record['quiz']) for record in memory])
+    phase_width = max([len('Phase')] + [len(record['phase']) for record in memory])
+    dash = '-'*(width + phase_width + 48)
+    print('{dash}\nWebQuiz memory report (MB)\n{dash}'.format(dash=dash))
+    print('{:<{width}}  {:<{phase_width}}  {:>10}  {:>10}  {:>10}  {:>10}'.format(
+              'Quiz', 'Phase', 'Peak', 'Allocated', 'Retained', 'Peak RSS',
+              width=width, phase_width=phase_width))
+    for record in memory:
+        if 'rss' in record:
+            sizes = ['', '', '', megabytes(record['rss'])]
+        else:
+            sizes = [megabytes(record['peak']), megabytes(record['allocated']), megabytes(record['retained']), '']
+        print('{:<{width}}  {:<{phase_width}}  {:>10}  {:>10}  {:>10}  {:>10}'.format(
+                  record['quiz'], record['phase'], *sizes, width=width, phase_width=phase_width))
+    print(dash)
+
+    with open(filename, 'w') as report:
+        json.dump(memory, report, indent=2)
+    print('Memory report written to {}'.format(filename))
+
+def write_trace(filename):
+    r'''
+    Write the trace events to `filename` as a Chrome trace-event json file
+    '''
+    if events is None:
+        return
+
+    processes = sorted(set(event['pid'] for event in events) | {main_process})
+    metadata = [dict(name='process_name', ph='M', pid=pid, tid=pid,
+                     args=dict(name='webquiz' if pid == main_process else 'webquiz worker {}'.format(pid)))
+                for pid in processes]
+    with open(filename, 'w') as trace_file:
+        json.dump(dict(traceEvents=metadata + sorted(events, key=lambda event: event['ts']),
+                       displayTimeUnit='ms'),
+                  trace_file)
@@ -14,11 +14,14 @@ r'''
 ------------------------------------------------------------------------------
 '''
 
+import json
 import os
 import subprocess
 import shutil
 import stat
 import sys
+import tempfile
+import threading
 import traceback
 
 # ---------------------------------------------------------------------------------------
@@ -34,8 +37,155 @@ def shell_command(cmd):
 def kpsewhich(search):
     r'''
     Short-cut to access kpsewhich output. usage: kpsewhich('-var-value=TEXMFLOCAL')
+
+    The results are cached, in memory and in the webquiz cache directory, so
+    that kpsewhich is only run when the TeX installation changes. See
+    `kpsewhich_cache`.
+    '''
+    cache = kpsewhich_cache()
+    with kpsewhich_lock:
+        result = cache['results'].get(search)
+    if result is not None and cached_kpsewhich_result_ok(search, result):
+        return result
+
+    result = subprocess.check_output('kpsewhich ' + search, stderr=subprocess.STDOUT, shell=True).decode('ascii').strip()
+    if result != '' and all(os.path.isabs(line) for line in result.split('\n')):
+        with kpsewhich_lock:
+            cache['results'][search] = result
+        save_kpsewhich_cache()
+    return result
+
+# the kpsewhich results for the TeX installation, which are read from the
+# cache directory the first time that kpsewhich is used, and a lock for the
+# threads that use the python API or that watch quizzes
+kpsewhich_results = None
+kpsewhich_lock = threading.RLock()
+
+def tex_installation_paths():
+    r'''
+    Return the files and directories that determine the results of
+    kpsewhich: the ls-R databases, the texmf.cnf files and the TEXMFHOME
+    trees, which are not indexed by ls-R databases. The lists are empty if
+    kpsewhich is not available.
+    '''
+    def kpsewhich_output(*arguments):
+        try:
+            output = subprocess.run(['kpsewhich', *arguments], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+        except OSError:
+            return ''
+        return output.decode('utf8', errors='replace').strip()
+
+    return dict(
+        databases=[os.path.join(path, 'ls-R') for path in kpsewhich_output('-expand-path=$TEXMFDBS').split(os.pathsep) if path != ''],
+        configuration=[path for path in kpsewhich_output('-all', 'texmf.cnf').split('\n') if path != ''],
+        home=[os.path.expanduser(path) for path in kpsewhich_output('-var-brace-value=TEXMFHOME').split(os.pathsep) if path != ''],
+    )
+
+def tex_installation_stamp(paths):
+    r'''
+    Return a stamp for the TeX installation that changes whenever the results
+    of kpsewhich could change: that is, when the kpsewhich program, the TeX
+    environment variables, the texmf.cnf files, the modification times of
+    the ls-R databases or the directories in the TEXMFHOME trees change. The
+    ls-R databases are updated by mktexlsr, and hence by tlmgr, whenever
+    files are added to, or removed from, the TeX installation. The `paths`
+    are given by `tex_installation_paths`.
+    '''
+    program = shutil.which('kpsewhich')
+    def mtime(filename):
+        try:
+            return os.stat(filename).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+    # adding or removing a file changes the modification time of its directory
+    home = {}
+    for tree in paths['home']:
+        home[tree] = mtime(tree)
+        for directory, subdirectories, files in os.walk(tree):
+            home.update((os.path.join(directory, sub), mtime(os.path.join(directory, sub))) for sub in subdirectories)
+
+    return dict(
+        kpsewhich=program,
+        kpsewhich_mtime=mtime(program),
+        environment={variable: os.environ[variable] for variable in sorted(os.environ)
+                        if variable.startswith(('TEX', 'KPSE', 'KPATHSEA'))},
+        databases={database: mtime(database) for database in paths['databases']},
+        configuration={cnf: mtime(cnf) for cnf in paths['configuration']},
+        home=home,
+    )
+
+def kpsewhich_cache():
+    r'''
+    Return the cache of kpsewhich results, reading it from the webquiz cache
+    directory the first time that it is needed. The cache is discarded if
+    the stamp of the TeX installation has changed since it was written.
+    '''
+    global kpsewhich_results
+    with kpsewhich_lock:
+        if kpsewhich_results is None:
+            try:
+                with open(os.path.join(cache_directory(), 'kpsewhich.json'), 'r') as cache_file:
+                    kpsewhich_results = json.load(cache_file)
+                if kpsewhich_results['stamp'] != tex_installation_stamp(kpsewhich_results['paths']):
+                    kpsewhich_results = None
+            except (OSError, ValueError, KeyError, TypeError):
+                kpsewhich_results = None
+
+            if kpsewhich_results is None:
+                paths = tex_installation_paths()
+                kpsewhich_results = dict(paths=paths,
+                                         stamp=tex_installation_stamp(paths),
+                                         results={})
+
+        return kpsewhich_results
+
+def save_kpsewhich_cache():
+    r'''
+    Save the kpsewhich cache in the webquiz cache directory. The cache is
+    written to a temporary file first so that webquiz processes running in
+    parallel never read a partial cache. Any problems writing the cache are
+    ignored because the only consequence is that kpsewhich is run again.
+    The cache is copied while holding `kpsewhich_lock` so that other threads
+    can add results while it is being written.
+    '''
+    with kpsewhich_lock:
+        results = dict(kpsewhich_results, results=dict(kpsewhich_results['results']))
+    try:
+        directory = cache_directory()
+        with tempfile.NamedTemporaryFile('w', dir=directory, suffix='.tmp', delete=False) as cache_file:
+            json.dump(results, cache_file)
+        os.replace(cache_file.name, os.path.join(directory, 'kpsewhich.json'))
+    except OSError:
+        pass
+
+def cached_kpsewhich_result_ok(search, result):
+    r'''
+    Return `True` if the cached `result` of kpsewhich for `search` can be
+    used: the files that it names must still exist and, as kpsewhich finds
+    files in the current directory first, none of the files being searched
+    for can be in the current directory.
+    '''
+    return (all(os.path.exists(line) for line in result.split('\n'))
+            and not any(os.path.isfile(name) for name in search.split() if not name.startswith('-')))
+
+def cache_directory(*subdirectories):
+    r'''
+    Return the path to the (sub)directory of the webquiz cache directory given
+    by `subdirectories`, creating it if necessary. The cache directory is
+    $XDG_CACHE_HOME/webquiz, or ~/.cache/webquiz if XDG_CACHE_HOME is not set,
+    and %LOCALAPPDATA%\webquiz on windows. It can be changed by setting the
+    environment variable WEBQUIZ_CACHE.
     '''
-    return subprocess.check_output('kpsewhich ' + search, stderr=subprocess.STDOUT, shell=True).decode('ascii').strip()
+    if 'WEBQUIZ_CACHE' in os.environ:
+        cache = os.environ['WEBQUIZ_CACHE']
+    elif sys.platform.startswith('win') and 'LOCALAPPDATA' in os.environ:
+        cache = os.path.join(os.environ['LOCALAPPDATA'], 'webquiz')
+    else:
+        cache = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'webquiz')
+    cache = os.path.join(cache, *subdirectories)
+    os.makedirs(cache, exist_ok=True)
+    return cache
 
 # ---------------------------------------------------------------------------------------
 class MetaData(dict):
@@ -66,27 +216,65 @@ class MetaData(dict):
                                 val.strip())
 
 
+class LazyMetaData(object):
+    r'''
+    A MetaData object that is only read, using the function `read`, when one
+    of its attributes or items is first used.
+
+    Usage: LazyMetaData(read)
+    '''
+
+    def __init__(self, read):
+        self._read = read
+        self._metadata = None
+
+    def _data(self):
+        if self._metadata is None:
+            self._metadata = self._read()
+        return self._metadata
+
+    def __getattr__(self, key):
+        return getattr(self._data(), key)
+
+    def __getitem__(self, key):
+        return self._data()[key]
+
+    def __contains__(self, key):
+        return key in self._data()
+
+    def keys(self):
+        return self._data().keys()
+
+
 #################################################################################
 def webquiz_debug(debugging, *arg):
     if debugging:
         sys.stderr.write(' '.join('{}'.format(a) for a in arg)+'\n')
 
 
+#################################################################################
+class WebQuizError(Exception):
+    r'''
+    Raised when a quiz cannot be made. The error message is `message` and
+    `err` is the exception that caused the error, if there is one. The
+    phase of making the quiz where the error happened is `phase`, which is
+    set by webquiz_trace.phase(). The command line reports these errors
+    using `webquiz_error`, whereas programs that make quizzes using
+    webquiz_api can catch them.
+    '''
+    def __init__(self, message, err=None, phase=None):
+        super().__init__(message)
+        self.message = message
+        self.err = err
+        self.phase = phase
+
 #################################################################################
 def webquiz_error(debugging, msg, err=None):
     r'''
     Consistent handling of errors in magthquiz: print the message `msg` and
     exist with error code `err.errno` if it is available.abs
     '''
-    print('{dash}WebQuiz error:\n  {msg}\n{dash}'.format(
-           msg=msg, dash='-'*40+'\n')
-    )
-
-    if err is not None:
-        trace = traceback.extract_tb(sys.exc_info()[2])
-        filename, lineno, fn, text = trace[-1]
-        print('File: {}, line number: {}\nError {} in {}: {}'.format(
-            filename, lineno, err, fn, text))
+    print_error(msg, err)
 
     if debugging and err is not None:
         raise
@@ -96,6 +284,23 @@ def webquiz_error(debugging, msg, err=None):
 
     sys.exit(1)
 
+def print_error(msg, err=None):
+    r'''
+    Print the error message `msg`, and where the error `err` happened, as
+    in `webquiz_error`, without exiting
+    '''
+    print('{dash}WebQuiz error:\n  {msg}\n{dash}'.format(
+           msg=msg, dash='-'*40+'\n')
+    )
+
+    if err is not None:
+        # use the traceback of err when it has one, which is the case when
+        # the error is reported after catching a WebQuizError
+        trace = traceback.extract_tb(getattr(err, '__traceback__', None) or sys.exc_info()[2])
+        filename, lineno, fn, text = trace[-1]
+        print('File: {}, line number: {}\nError {} in {}: {}'.format(
+            filename, lineno, err, fn, text))
+
 
 ###############################################################################
 def copytree(src, dst, symlinks=False, ignore=None):
@@ -0,0 +1,200 @@
+r'''
+-----------------------------------------------------------------------------
+    webquiz_watch | rebuild quizzes when they change and serve them locally
+                  | with live reloading of the quiz pages
+-----------------------------------------------------------------------------
+
+    Copyright (C) Andrew Mathas, University of Sydney
+
+    Distributed under the terms of the GNU General Public License (GPL)
+                  http://www.gnu.org/licenses/
+
+    This file is part of the WebQuiz system.
+
+    <Andrew.Mathas@sydney.edu.au>
+-----------------------------------------------------------------------------
+'''
+
+# -*- encoding: utf-8 -*-
+
+import http.server
+import os
+import signal
+import threading
+import time
+import urllib.parse
+
+# imports of webquiz code
+import webquiz_cache
+import webquiz_util
+
+# url used by the quiz pages to listen for reload events
+reload_url = '/webquiz-live-reload'
+
+# javascript added to the quiz pages so that they reload after each build
+reload_script = '''<script>
+  new EventSource('{url}').onmessage = function() {{ location.reload(); }};
+</script>
+'''.format(url=reload_url)
+
+class LiveReloadServer(http.server.ThreadingHTTPServer):
+    r'''
+    A local web server for previewing quizzes. Files are served from the
+    current directory, except that urls starting with the webquiz url are
+    served from the WebQuiz web directory, and the quiz pages are reloaded
+    in the browser whenever `reload()` is called.
+    '''
+    daemon_threads = True
+
+    def __init__(self, port, webquiz_url, webquiz_www):
+        self.webquiz_url = webquiz_url.rstrip('/')
+        self.webquiz_www = webquiz_www
+        self.builds = 0
+        self.build_finished = threading.Condition()
+        super().__init__(('localhost', port), LiveReloadHandler)
+
+    def reload(self):
+        r'''
+        Tell all of the open quiz pages to reload
+        '''
+        with self.build_finished:
+            self.builds += 1
+            self.build_finished.notify_all()
+
+
+class LiveReloadHandler(http.server.SimpleHTTPRequestHandler):
+    r'''
+    Request handler for the `LiveReloadServer` that adds the reload script
+    to html pages and sends reload events to the pages that are listening.
+    '''
+
+    def translate_path(self, path):
+        r'''
+        Serve the webquiz css and javascript from the WebQuiz web directory.
+        As in `SimpleHTTPRequestHandler`, empty, . and .. path segments are
+        dropped so that files outside the web directory cannot be served.
+        '''
+        url = path.split('?')[0].split('#')[0]
+        if self.server.webquiz_url.startswith('/') and url.startswith(self.server.webquiz_url + '/'):
+            words = [word for word in urllib.parse.unquote(url[len(self.server.webquiz_url)+1:]).split('/')
+                     if word not in ('', os.curdir, os.pardir)
+                        and os.path.dirname(word) == '' and os.path.splitdrive(word)[0] == '']
+            return os.path.join(self.server.webquiz_www, *words)
+        return super().translate_path(path)
+
+    def do_GET(self):
+        if self.path == reload_url:
+            self.send_reload_events()
+            return
+
+        path = self.translate_path(self.path)
+        if not path.endswith('.html') or not os.path.isfile(path):
+            super().do_GET()
+            return
+
+        # add the reload script to the end of html pages
+        with open(path, 'rb') as html:
+            page = html.read().replace(b'</body>', reload_script.encode('utf8') + b'</body>', 1)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(page)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(page)
+
+    def send_reload_events(self):
+        r'''
+        Send a server-sent event to the page whenever a build finishes
+        '''
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        builds = self.server.builds
+        try:
+            while True:
+                with self.server.build_finished:
+                    self.server.build_finished.wait_for(lambda: self.server.builds != builds, timeout=15)
+                if self.server.builds != builds:
+                    builds = self.server.builds
+                    self.wfile.write(b'data: reload\n\n')
+                else:
+                    # keep the connection alive and detect closed pages
+                    self.wfile.write(b': ping\n\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def quiz_dependencies(quiz_file):
+    r'''
+    Return a dictionary of the modification times and sizes of the quiz file
+    and of the files that it depends on. The files are not hashed because
+    they are polled repeatedly by `watch_quizzes`.
+    '''
+    return webquiz_cache.tex_dependencies(os.path.abspath(quiz_file), hashed=False)
+
+def watch_quizzes(options, settings, make_quiz, poll=0.5, debounce=0.3):
+    r'''
+    Make the quizzes in `options.quiz_file` and then watch the quizzes, and
+    the files they depend on, rebuilding each quiz when it changes. Several
+    changes in quick succession, such as when an editor saves a file, only
+    trigger one rebuild. A local web server, with live reloading, is started
+    so that the quizzes can be previewed. Here `make_quiz(options, settings,
+    quiz_file, record=False)` is used to make the quizzes, so that the
+    reports on the rebuilds do not accumulate while watching.
+    '''
+    quiz_files = [quiz_file if '.' in quiz_file else quiz_file + '.tex' for quiz_file in options.quiz_file]
+
+    def build(quiz_file):
+        try:
+            make_quiz(options, settings, quiz_file, record=False)
+        except SystemExit:
+            # webquiz_error() has already printed an error message
+            pass
+        except Exception as err:
+            print('WebQuiz error: {}'.format(err))
+
+    # control-C stops watching, rather than the build that is in progress
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    webquiz_www = settings['webquiz_www']
+    if not os.path.isdir(webquiz_www):
+        webquiz_www = os.path.join(webquiz_util.webquiz_file('..'), 'doc', 'www')
+    server = LiveReloadServer(options.port, settings['webquiz_url'], webquiz_www)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    dependencies = {}
+    changed = {}   # time of the last change to each quiz that needs rebuilding
+    try:
+        for quiz_file in quiz_files:
+            build(quiz_file)
+            dependencies[quiz_file] = quiz_dependencies(quiz_file)
+        print('WebQuiz is watching {} for changes. The quizzes can be viewed at'.format(', '.join(quiz_files)))
+        for quiz_file in quiz_files:
+            print('  http://localhost:{}/{}.html'.format(options.port, quiz_file.split('.')[0]))
+        print('Press control-C to stop')
+
+        while True:
+            time.sleep(poll)
+            for quiz_file in quiz_files:
+                modified = quiz_dependencies(quiz_file)
+                if modified != dependencies[quiz_file]:
+                    changed[quiz_file] = time.time()
+                    dependencies[quiz_file] = modified
+
+            # rebuild the quizzes that have not changed during the debounce period
+            for quiz_file in [quiz for quiz in changed if time.time() - changed[quiz] >= debounce]:
+                del changed[quiz_file]
+                build(quiz_file)
+                dependencies[quiz_file] = quiz_dependencies(quiz_file)
+                server.reload()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        server.shutdown()
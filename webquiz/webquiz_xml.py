@@ -17,40 +17,224 @@ r'''
 
 # -*- encoding: utf-8 -*-
 
+import xml.etree.ElementTree
+import xml.parsers.expat
 import xml.sax
 
+try:
+    import lxml.etree
+except ImportError:
+    lxml = None
+
 # imports of webquiz code
 import webquiz_util
 
 # ---------------------------------------------------------------------------------------
-def ReadWebQuizXmlFile(quizfile, defaults):
+def ReadWebQuizXmlFile(quizfile, defaults, backend='auto', chunk_size=1 << 16):
     r'''
-    Set up, call and then return the xml parser
-    for the quiz web page
+    Set up, call and then return the xml parser for the quiz web page.
+    Here `quizfile` is either the name of the xml file or an iterable, such
+    as a generator, that yields the xml line by line. In both cases the xml
+    is fed to the parser incrementally, in chunks of about `chunk_size`
+    characters.
+
+    The `backend` is one of the keys of `xml_backends`. Each backend passes
+    the same sequence of tags and text to a `QuizHandler`, so they all build
+    the same quiz. By default, lxml is used when it is installed and
+    otherwise expat is used directly.
     '''
-    parser = xml.sax.make_parser()
+    if backend == 'auto':
+        backend = 'lxml' if lxml is not None else 'expat'
+    elif backend == 'lxml' and lxml is None:
+        raise webquiz_util.WebQuizError('xml: the lxml backend requires the python lxml module')
+    elif backend not in xml_backends:
+        raise webquiz_util.WebQuizError('xml: unknown xml backend "{}"'.format(backend))
+
     quiz = QuizHandler(defaults)
+    xml_backends[backend](xml_chunks(quizfile, chunk_size), quiz)
+    return quiz
+
+def xml_chunks(quizfile, chunk_size):
+    r'''
+    A generator that yields the xml in `quizfile`, which is either a file
+    name or an iterable of lines, in chunks of about `chunk_size` characters.
+    '''
+    if isinstance(quizfile, str):
+        with open(quizfile, 'rb') as xml_file:
+            yield from iter(lambda: xml_file.read(chunk_size), b'')
+        return
+
+    chunk = []
+    size = 0
+    for line in quizfile:
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+    yield ''.join(chunk)
+
+def read_with_sax(chunks, quiz):
+    r'''
+    Read the quiz using the python sax parser
+    '''
+    parser = xml.sax.make_parser()
     parser.setContentHandler(quiz)
     parser.setErrorHandler(quiz)
     parser.setDTDHandler(quiz) # as far as I can see this does nothing...
-    parser.parse(quizfile)
+    for chunk in chunks:
+        parser.feed(chunk)
     parser.close()
-    return quiz
+
+def read_with_expat(chunks, quiz):
+    r'''
+    Read the quiz by passing the expat callbacks directly to the quiz handler,
+    which avoids the overheads of the sax interface.
+    '''
+    parser = xml.parsers.expat.ParserCreate()
+    parser.buffer_text = True
+    parser.buffer_size = 1 << 16
+    parser.StartElementHandler = quiz.startElement
+    parser.EndElementHandler = quiz.endElement
+    parser.CharacterDataHandler = quiz.characters
+    try:
+        for chunk in chunks:
+            parser.Parse(chunk, False)
+        parser.Parse(b'', True)
+    except xml.parsers.expat.ExpatError as err:
+        quiz.fatalError(err)
+
+def read_with_pull_parser(chunks, quiz, parser, parse_error, encode=False):
+    r'''
+    Read the quiz using an etree `XMLPullParser`, passing the tags and text to
+    the quiz handler in document order. The etree elements store the text
+    inside an element before its first child as the `text` of the element
+    and the text after an element as its `tail`, so the text before each
+    start tag and end tag is passed to the handler from these. The children
+    of each element are deleted once their text has been used, and each
+    element is emptied when it ends, so that the tree never holds more than
+    the current question. The parser may have read beyond the current event,
+    so the text is only taken from elements that the events have finished with.
+    '''
+    def characters(text):
+        if text:
+            quiz.characters(text)
+
+    def pass_text(element, children):
+        r'''
+        Pass the text of `element`, and the tails of its first `children`
+        children, to the quiz handler and then delete these children
+        '''
+        characters(element.text)
+        element.text = None
+        for child in element[:children]:
+            characters(child.tail)
+        del element[:children]
+
+    elements = []
+    try:
+        for chunk in chunks:
+            parser.feed(chunk.encode('utf8') if encode and isinstance(chunk, str) else chunk)
+            for (event, element) in parser.read_events():
+                if event == 'start':
+                    if elements:
+                        # the children of the parent before this one are finished
+                        parent = elements[-1]
+                        pass_text(parent, next(n for (n, child) in enumerate(parent) if child is element))
+                    elements.append(element)
+                    quiz.startElement(element.tag, element.attrib)
+                else:
+                    pass_text(element, len(element))
+                    elements.pop()
+                    quiz.endElement(element.tag)
+        parser.close()
+
+    except parse_error as err:
+        quiz.fatalError(err)
+
+def read_with_etree(chunks, quiz):
+    r'''
+    Read the quiz using the xml.etree pull parser
+    '''
+    read_with_pull_parser(chunks, quiz,
+                          xml.etree.ElementTree.XMLPullParser(events=('start', 'end')),
+                          xml.etree.ElementTree.ParseError)
+
+def read_with_lxml(chunks, quiz):
+    r'''
+    Read the quiz using the lxml pull parser
+    '''
+    read_with_pull_parser(chunks, quiz,
+                          lxml.etree.XMLPullParser(events=('start', 'end'), resolve_entities=False),
+                          lxml.etree.XMLSyntaxError,
+                          encode=True)
+
+# the available xml backends
+xml_backends = dict(
+    sax=read_with_sax,
+    expat=read_with_expat,
+    etree=read_with_etree,
+    lxml=read_with_lxml
+)
 
 
 # ---------------------------------------------------------------------------------------
-class Data(object):
+class Question(object):
     r'''
-    A wrapper object class that holds the data for the different
-    components of the quiz.
+    The data for a question in the quiz. Input questions set `answer`,
+    `comparison`, `prompt` and the feedback, whereas multiple choice questions
+    set `columns`, `correct` and the list of `items`.
     '''
-    def __init__(self, **args):
-        '''
-        Accepts key-value pairs, each of which is stored as an attribute
-        '''
-        self._items = args.items()
-        for key, val in args.items():
-            setattr(self, key, val)
+    __slots__ = ('text', 'type', 'after_text', 'answer', 'comparison', 'prompt',
+                 'feedback_right', 'feedback_wrong', 'columns', 'correct', 'items')
+
+    def __init__(self):
+        self.text = ''          # The text of the question
+        self.type = None        # input, or single or multiple choice
+        self.after_text = ''    # text at end of question
+        self.answer = None
+        self.comparison = None
+        self.prompt = False
+        self.feedback_right = ''
+        self.feedback_wrong = ''
+        self.columns = 1
+        self.correct = 0
+        self.items = None
+
+class Item(object):
+    r'''
+    An item in a multiple choice question
+    '''
+    __slots__ = ('correct', 'symbol', 'feedback', 'text')
+
+    def __init__(self, correct, symbol):
+        self.correct = correct
+        self.symbol = symbol
+        self.feedback = ''
+        self.text = ''
+
+class Discussion(object):
+    r'''
+    A discussion item in the quiz
+    '''
+    __slots__ = ('heading', 'short_heading', 'text')
+
+    def __init__(self):
+        self.heading = ''
+        self.short_heading = ''
+        self.text = ''  # The text of the discussion
+
+class IndexItem(object):
+    r'''
+    A quiz in a quiz index
+    '''
+    __slots__ = ('prompt', 'url', 'title')
+
+    def __init__(self, prompt, url):
+        self.prompt = prompt
+        self.url = url
+        self.title = ''
 
 
 class QuizHandler(xml.sax.ContentHandler):
@@ -61,10 +245,49 @@ class QuizHandler(xml.sax.ContentHandler):
         tag that is ot special to webquiz has its contents appended to
         `self.text`. Any tag that contains `DeFaUlT` is set to the system
         default using the `defaults` dictionary.
+
+        The text is accumulated as a list of the chunks passed to
+        `characters`, which are only joined when `self.text` is read, so that
+        the time taken to read the quiz is linear in the size of the xml file.
+
+        The `start_<tag>` and `end_<tag>` methods are found using the
+        dispatch tables `start_tags` and `end_tags`, which are built once for
+        each class by `build_dispatch_tables`.
     """
 
+    # the following tags have defaults set by `defaults`
+    setting_tags = frozenset([
+           'department',
+           'department_url',
+           'institution',
+           'institution_url',
+           'language',
+           'theme',
+    ])
+    # tags whose attribute sets a default
+    default_attribute_tags = frozenset(['department', 'institution', 'uni'])
+    # tags that set the headings of the discussion and the quiz title
+    discussion_tags = frozenset(['heading', 'short_heading'])
+    title_tags = frozenset(['breadcrumb', 'title', 'unit_code', 'unit_name'])
+
+    @classmethod
+    def build_dispatch_tables(cls):
+        r'''
+        Build the dictionaries `start_tags` and `end_tags` that map each tag to
+        the `start_<tag>` and `end_<tag>` methods of the class.
+        '''
+        cls.start_tags = {name[len('start_'):]: getattr(cls, name) for name in dir(cls) if name.startswith('start_')}
+        cls.end_tags = {name[len('end_'):]: getattr(cls, name) for name in dir(cls) if name.startswith('end_')}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.build_dispatch_tables()
+
     def __init__(self, defaults):
         self.defaults = defaults
+        # print debugging messages, which the quiz can also turn on, without
+        # changing the defaults, which may be shared with other quizzes
+        self.debug_messages = defaults.debugging
 
         # arrays for the different quiz components
         self.discussion_list = []
@@ -79,20 +302,11 @@ class QuizHandler(xml.sax.ContentHandler):
         # to add mathjs when an eval comparison is used
         self.mathjs = False
 
-        # the following tags have defaults set by `defaults`
-        self.setting_tags = [
-               'department',
-               'department_url',
-               'institution',
-               'institution_url',
-               'language',
-               'theme',
-        ]
         # quiz data
         for tag in self.setting_tags:
             setattr(self, tag, defaults[tag])
         self.breadcrumb = ''
-        self.text = ''
+        self.text_chunks = []
         self.after_text = ''
         self.title = ''
         self.unit_code = ''
@@ -101,17 +315,33 @@ class QuizHandler(xml.sax.ContentHandler):
         # keep track of current tags for debugging...
         self.current_tags=[]
 
-    def webquiz_debug(self, msg):
+    @property
+    def text(self):
+        r'''
+        The text accumulated since the text was last reset
+        '''
+        if len(self.text_chunks) != 1:
+            self.text_chunks = [''.join(self.text_chunks)]
+        return self.text_chunks[0]
+
+    @text.setter
+    def text(self, text):
+        self.text_chunks = [text] if text else []
+
+    def webquiz_debug(self, msg, *args):
         r'''
-            Customised debugging message for the xml module
+            Customised debugging message for the xml module. The message is
+            only formatted, using `msg.format(*args)`, when debugging.
         '''
-        webquiz_util.webquiz_debug(self.defaults.debugging, 'xml: '+msg)
+        if self.debug_messages:
+            webquiz_util.webquiz_debug(True, 'xml: '+msg.format(*args))
 
     def webquiz_error(self, msg, err=None):
         r'''
-            Customised error message for the xml module
+            Customised error message for the xml module, which is raised as
+            a WebQuizError
         '''
-        webquiz_util.webquiz_error(self.defaults.debugging, 'xml: '+msg, err)
+        raise webquiz_util.WebQuizError('xml: '+msg, err)
 
     def set_default_attribute(self, key, value):
         ''' Set the attribute `key` of self, using the default value if
@@ -121,7 +351,7 @@ class QuizHandler(xml.sax.ContentHandler):
             setattr(self, key, self.defaults[key])
         else:
             setattr(self, key, value)
-        self.webquiz_debug('Just set "{}" equal to "{}" from "{}"'.format(key, getattr(self, key), value))
+        self.webquiz_debug('Just set "{}" equal to "{}" from "{}"', key, getattr(self, key), value)
 
     #---- start of start elements --------------------------------------------
     def startElement(self, tag, attributes):
@@ -129,13 +359,15 @@ class QuizHandler(xml.sax.ContentHandler):
             At the start of each webquiz xml tag we need to pull out the
             attributes and place
         '''
-        self.webquiz_debug('Starting tag for '+tag)
+        if self.debug_messages:
+            self.webquiz_debug('Starting tag for {}', tag)
         self.current_tags.append(tag)
 
-        if hasattr(self, 'start_'+tag):
-            getattr(self, 'start_'+tag)(attributes)
+        start_tag = self.start_tags.get(tag)
+        if start_tag is not None:
+            start_tag(self, attributes)
 
-        elif tag in ['department', 'institution', 'uni']:
+        elif tag in self.default_attribute_tags:
             for key in attributes.keys():
                 self.set_default_attribute(tag, attributes.get(key))
 
@@ -155,7 +387,7 @@ class QuizHandler(xml.sax.ContentHandler):
         setattr(self, 'theme', self.theme.lower())
 
         # set debugging mode from the latex file...from this point on
-        self.defaults.debugging = self.defaults.debugging or self.debugging
+        self.debug_messages = self.debug_messages or self.debugging
 
     def start_link(self, attributes):
         r'''
@@ -188,22 +420,13 @@ class QuizHandler(xml.sax.ContentHandler):
         r'''
         Start element for tag="discussion"
         '''
-        discussion = Data(heading = '',
-                          short_heading = '',
-                          text = ''  # The text of the discussion
-        )
-        self.discussion_list.append(discussion)
+        self.discussion_list.append(Discussion())
 
     def start_question(self, attributes):
         r'''
         Start element for tag="question"
         '''
-        self.question_list.append(
-            Data(text = '',      # The text of the question
-                type = None,    # input, or single or multiple choice
-                after_text = '' # text at end of question
-            )
-        )
+        self.question_list.append(Question())
 
     def start_answer(self, attributes):
         r'''
@@ -245,11 +468,7 @@ class QuizHandler(xml.sax.ContentHandler):
         Start element for tag="item"
         '''
         self.question_list[-1].items.append(
-                Data(correct= attributes.get('correct'),
-                     symbol=attributes.get('symbol'),
-                     feedback='',
-                     text=''
-                    )
+                Item(correct=attributes.get('correct'), symbol=attributes.get('symbol'))
         )
         if attributes.get('correct')=='true':
             self.question_list[-1].correct += 1
@@ -258,11 +477,8 @@ class QuizHandler(xml.sax.ContentHandler):
         r'''
         Finally look after the index file
         '''
-        self.quiz_index.append(Data(
-                prompt=attributes.get('prompt')=='true',
-                url=attributes.get('url'),
-                title=''
-            )
+        self.quiz_index.append(
+                IndexItem(prompt=attributes.get('prompt')=='true', url=attributes.get('url'))
         )
 
     def start_when(self, attributes):
@@ -271,28 +487,30 @@ class QuizHandler(xml.sax.ContentHandler):
         '''
         if self.text.strip() != '':
             self.question_list[-1].after_text += ' '+self.text.strip()
-            self.webquiz_debug('After_text is now {}'.format(self.question_list[-1].after_text))
+            self.webquiz_debug('After_text is now {}', self.question_list[-1].after_text)
             self.text = ''
         self.current_tags[-1] = 'feedback_'+attributes.get('type')
 
     #---- end of start elements ---------------------------------------------
 
     def endElement(self, tag):
-        self.webquiz_debug('ending tag for {} (should be {})'.format(tag, self.current_tags[-1])) 
+        if self.debug_messages:
+            self.webquiz_debug('ending tag for {} (should be {})', tag, self.current_tags[-1])
 
         reset_text = True
-        if hasattr(self, 'end_'+tag):
-            getattr(self, 'end_'+tag)()
+        end_tag = self.end_tags.get(tag)
+        if end_tag is not None:
+            end_tag(self)
             self.text = ''
 
         elif tag in self.setting_tags:
             self.set_default_attribute(tag, self.text)
             self.text = ''
 
-        elif tag in ['heading', 'short_heading']:
+        elif tag in self.discussion_tags:
             setattr(self.discussion_list[-1], tag, self.text.strip())
 
-        elif tag in ['breadcrumb', 'title', 'unit_code', 'unit_name']:
+        elif tag in self.title_tags:
             setattr(self, tag, self.text.strip())
 
         else:
@@ -340,7 +558,7 @@ class QuizHandler(xml.sax.ContentHandler):
                 self.webquiz_error('Question {} does not have an \\answer or choice environment'.format(
                               len(self.question_list)+1))
 
-        elif hasattr(self.question_list[-1], 'items'):
+        elif self.question_list[-1].items is not None:
             if len(self.question_list[-1].items)==0:
                 self.webquiz_error('question {} has no multiple choice items'.format(
                               len(self.question_list)+1))
@@ -351,7 +569,7 @@ class QuizHandler(xml.sax.ContentHandler):
                                 self.question_list[-1].correct
                              )
                 )
-        elif not hasattr(self.question_list[-1], 'answer') or self.question_list[-1].answer=='':
+        elif not self.question_list[-1].answer:
             self.webquiz_error('question {} does have not an \answer or multiple choice'.format(
                           len(self.question_list)+1))
 
@@ -368,7 +586,7 @@ class QuizHandler(xml.sax.ContentHandler):
         r'''
         Process end tag when tag="index_item"
         '''
-        self.webquiz_debug('WHEN: Adding text to '+self.current_tags[-1])
+        self.webquiz_debug('WHEN: Adding text to {}', self.current_tags[-1])
         setattr(self.question_list[-1], self.current_tags[-1], self.text.strip())
 
     #---- end of end elements -----------------------------------------------
@@ -377,10 +595,12 @@ class QuizHandler(xml.sax.ContentHandler):
         r'''
         Append everything to `self.text`
         '''
-        self.text += text
+        self.text_chunks.append(text)
 
     def error(self, e):
         self.webquiz_error('unknown error', e)
 
     def fatalError(self, e):
         self.webquiz_error('unknown fatal error', e)
+
+QuizHandler.build_dispatch_tables()